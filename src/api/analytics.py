@@ -1,19 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, case, and_, or_, desc
 from typing import List, Optional
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime, date
 from decimal import Decimal
+from types import SimpleNamespace
 import math
-import io
-import csv
 
 from src.db import get_db
+from src.utils import analytics_cache, analytics_duckdb, graph_shape, history_archive
+from src.utils.export_stream import streaming_export
 from src.db.models import (
     Movement, Item, Lot, Material, PurchaseOrder, PurchaseOrderItem,
-    MaterialShape, MovementType, MaterialGroup, MaterialGroupMember
+    MaterialShape, MovementType, MaterialGroup, MaterialGroupMember, MaterialStock
 )
 
 router = APIRouter()
@@ -93,11 +93,145 @@ def _calculate_weight_kg(material: Material, length_mm: int, quantity: int) -> f
     weight_g = volume_cm3 * material.current_density
     return round((weight_g * quantity) / 1000, 3)
 
+def _weight_kg_expr(quantity):
+    """_calculate_weight_kg と同じ計算のSQL式（Lot・Material を結合したクエリで使用）"""
+    length_cm = Lot.length_mm / 10.0
+    half_cm = Material.diameter_mm / 20.0
+    side_cm = Material.diameter_mm / 10.0
+    volume_cm3 = case(
+        (Material.shape == MaterialShape.ROUND, math.pi * half_cm * half_cm * length_cm),
+        (Material.shape == MaterialShape.HEXAGON, (3 * math.sqrt(3) / 2) * half_cm * half_cm * length_cm),
+        (Material.shape == MaterialShape.SQUARE, side_cm * side_cm * length_cm),
+        else_=0.0,
+    )
+    return func.round(volume_cm3 * Material.current_density * quantity / 1000.0, 3)
+
+def _amount_expr(quantity):
+    """_out_amount と同じ計算のSQL式（単価 → 入庫金額/本数 → 入庫金額/重量 の順）"""
+    return case(
+        (Lot.received_unit_price.isnot(None), Lot.received_unit_price * quantity),
+        (
+            and_(Lot.received_amount.isnot(None), Lot.initial_quantity > 0),
+            Lot.received_amount / Lot.initial_quantity * quantity
+        ),
+        (
+            and_(Lot.received_amount.isnot(None), Lot.initial_weight_kg > 0),
+            Lot.received_amount / Lot.initial_weight_kg * _weight_kg_expr(quantity)
+        ),
+        else_=0.0,
+    )
+
+def _archived_frame(
+    start_date: Optional[date],
+    end_date: Optional[date],
+    movement_type: Optional[MovementType] = None
+):
+    """アーカイブ済みの入出庫履歴の DataFrame（期間がアーカイブ済みの月にかからなければ None）"""
+    frame = history_archive.read(
+        "movements",
+        datetime.combine(start_date, datetime.min.time()) if start_date else None,
+        datetime.combine(end_date, datetime.max.time()) if end_date else None,
+    )
+    if frame is not None and movement_type:
+        frame = frame[frame["movement_type"] == movement_type.value]
+    return frame if frame is not None and not frame.empty else None
+
+def _archived_movements(
+    start_date: Optional[date],
+    end_date: Optional[date],
+    movement_type: Optional[MovementType] = None
+) -> list:
+    """アーカイブ済みの入出庫履歴（期間がアーカイブ済みの月にかからなければ空）"""
+    frame = _archived_frame(start_date, end_date, movement_type)
+    if frame is None:
+        return []
+    frame = frame.astype(object).where(frame.notna(), None)
+    return [
+        SimpleNamespace(
+            item_id=row.item_id,
+            lot_id=row.lot_id,
+            material_id=row.material_id,
+            movement_type=MovementType(row.movement_type),
+            quantity=int(row.quantity or 0),
+            processed_at=row.processed_at.to_pydatetime(),
+        )
+        for row in frame.itertuples(index=False)
+    ]
+
+def _out_amount(lot: Optional[Lot], quantity: int) -> float:
+    """出庫本数分の金額（単価 → 入庫金額/本数 → 入庫金額/重量 の順に算出）"""
+    material = lot.material if lot else None
+    if lot and lot.received_unit_price is not None:
+        return float(lot.received_unit_price) * quantity
+    if lot and lot.received_amount is not None and lot.initial_quantity and lot.initial_quantity > 0:
+        return (float(lot.received_amount) / float(lot.initial_quantity)) * quantity
+    if lot and lot.received_amount is not None and lot.initial_weight_kg and lot.initial_weight_kg > 0 and material:
+        price_per_kg = float(lot.received_amount) / float(lot.initial_weight_kg)
+        return price_per_kg * _calculate_weight_kg(material, lot.length_mm, quantity)
+    return 0.0
+
+def _summary_response(materials: List[MaterialSummary]) -> "AnalyticsSummaryResponse":
+    """材料別集計から合計を求めてレスポンスを作る"""
+    return AnalyticsSummaryResponse(
+        materials=materials,
+        total_stock_quantity=sum(m.current_stock_quantity for m in materials),
+        total_stock_weight_kg=round(sum(m.current_stock_weight_kg for m in materials), 3),
+        total_in_quantity=sum(m.total_in_quantity for m in materials),
+        total_in_weight_kg=round(sum(m.total_in_weight_kg for m in materials), 3),
+        total_out_quantity=sum(m.total_out_quantity for m in materials),
+        total_out_weight_kg=round(sum(m.total_out_weight_kg for m in materials), 3),
+        total_amount=round(sum(m.total_amount for m in materials), 2)
+    )
+
+SUMMARY_EXPORT_HEADER = [
+    '材料名', '現在在庫本数', '現在在庫重量(kg)',
+    '入庫本数', '入庫重量(kg)', '出庫本数', '出庫重量(kg)', '金額（円）'
+]
+
+def _summary_export(summary: "AnalyticsSummaryResponse", export_format: str):
+    """集計結果をCSV/Excelで逐次出力（末尾に合計行）"""
+    rows = (
+        [
+            m.material_name,
+            m.current_stock_quantity,
+            m.current_stock_weight_kg,
+            m.total_in_quantity,
+            m.total_in_weight_kg,
+            m.total_out_quantity,
+            m.total_out_weight_kg,
+            m.total_amount
+        ]
+        for m in summary.materials
+    )
+    footer = [
+        [],
+        [
+            '合計',
+            summary.total_stock_quantity,
+            summary.total_stock_weight_kg,
+            summary.total_in_quantity,
+            summary.total_in_weight_kg,
+            summary.total_out_quantity,
+            summary.total_out_weight_kg,
+            summary.total_amount
+        ],
+    ]
+    return streaming_export(
+        export_format,
+        "analytics",
+        "集計結果",
+        SUMMARY_EXPORT_HEADER,
+        rows,
+        column_widths=[30] + [15] * 7,
+        footer=footer,
+    )
+
 # ========================================
 # APIエンドポイント
 # ========================================
 
 @router.get("/summary/", response_model=AnalyticsSummaryResponse)
+@analytics_cache.cached("summary")
 async def get_analytics_summary(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
@@ -115,6 +249,16 @@ async def get_analytics_summary(
 
     検索条件に基づいて材料別の在庫数、入出庫数、金額を集計します。
     """
+    if analytics_duckdb.active():
+        return _summary_response([
+            MaterialSummary(**values)
+            for values in analytics_duckdb.summary(
+                start_date, end_date, material_name, material_group_id,
+                purchase_month, purchase_month_start, purchase_month_end, supplier,
+                movement_type.value if movement_type else None
+            )
+        ])
+
     # 材料フィルタ構築
     material_query = db.query(Material.id).filter(Material.is_active == True)
 
@@ -170,6 +314,9 @@ async def get_analytics_summary(
     total_out_weight = 0.0
     total_amount_sum = 0.0
 
+    # アーカイブ済みの月にかかる期間の場合は、アーカイブ分の履歴も合わせて集計
+    archived = _archived_movements(start_date, end_date, movement_type)
+
     for material_id in material_ids:
         material = db.query(Material).filter(Material.id == material_id).first()
         if not material:
@@ -207,6 +354,9 @@ async def get_analytics_summary(
             movements = db.query(Movement).filter(and_(*movement_filters)).all()
         else:
             movements = []
+        if archived and item_ids:
+            item_id_set = set(item_ids)
+            movements.extend(m for m in archived if m.item_id in item_id_set)
 
         in_qty = sum(m.quantity for m in movements if m.movement_type == MovementType.IN)
         out_qty = sum(m.quantity for m in movements if m.movement_type == MovementType.OUT)
@@ -259,6 +409,7 @@ async def get_analytics_summary(
     )
 
 @router.get("/graph/timeline/", response_model=GraphDataResponse)
+@analytics_cache.cached("timeline")
 async def get_timeline_graph(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
@@ -266,6 +417,12 @@ async def get_timeline_graph(
     db: Session = Depends(get_db)
 ):
     """時系列推移グラフデータ（日別の入出庫推移）"""
+    if analytics_duckdb.active():
+        rows = analytics_duckdb.timeline(start_date, end_date, material_id)
+        return _timeline_response(
+            [r[0] for r in rows], [r[1] for r in rows], [int(r[2] or 0) for r in rows]
+        )
+
     query = db.query(
         func.date(Movement.processed_at).label('date'),
         Movement.movement_type,
@@ -281,20 +438,31 @@ async def get_timeline_graph(
     if material_id:
         query = query.filter(Lot.material_id == material_id)
 
-    results = query.group_by(func.date(Movement.processed_at), Movement.movement_type).order_by('date').all()
-
-    # データ整形
-    dates = sorted(set(r.date for r in results))
-    labels = [d.strftime('%Y-%m-%d') for d in dates]
-
-    in_data = []
-    out_data = []
-
-    for d in dates:
-        in_qty = sum(r.total_quantity for r in results if r.date == d and r.movement_type == MovementType.IN)
-        out_qty = sum(r.total_quantity for r in results if r.date == d and r.movement_type == MovementType.OUT)
-        in_data.append(in_qty)
-        out_data.append(out_qty)
+    results = query.group_by(func.date(Movement.processed_at), Movement.movement_type).all()
+
+    dates = [r.date for r in results]
+    types = [r.movement_type.value for r in results]
+    quantities = [int(r.total_quantity or 0) for r in results]
+
+    # アーカイブ分は日付・種別ごとに集計してから合算
+    archived = _archived_frame(start_date, end_date)
+    if archived is not None:
+        if material_id:
+            archived = archived[archived["material_id"] == material_id]
+        grouped = archived.groupby(
+            [archived["processed_at"].dt.date, "movement_type"]
+        )["quantity"].sum()
+        dates.extend(grouped.index.get_level_values(0))
+        types.extend(grouped.index.get_level_values(1))
+        quantities.extend(grouped.tolist())
+
+    return _timeline_response(dates, types, quantities)
+
+def _timeline_response(dates: list, types: list, quantities: list) -> GraphDataResponse:
+    """(日付, 入出庫種別, 本数) の行からグラフデータを作る"""
+    labels, (in_data, out_data) = graph_shape.pivot_by_date(
+        dates, types, quantities, [MovementType.IN.value, MovementType.OUT.value], dtype=int
+    )
 
     return GraphDataResponse(
         labels=labels,
@@ -305,6 +473,7 @@ async def get_timeline_graph(
     )
 
 @router.get("/graph/material-composition/", response_model=GraphDataResponse)
+@analytics_cache.cached("material_composition")
 async def get_material_composition_graph(
     db: Session = Depends(get_db)
 ):
@@ -312,11 +481,11 @@ async def get_material_composition_graph(
     try:
         query = db.query(
             Material.display_name,
-            func.sum(Item.current_quantity).label('total_quantity')
-        ).join(Lot, Material.id == Lot.material_id).join(Item, Lot.id == Item.lot_id).filter(
+            MaterialStock.total_quantity
+        ).join(MaterialStock, MaterialStock.material_id == Material.id).filter(
             Material.is_active == True,
-            Item.is_active == True
-        ).group_by(Material.id, Material.display_name).order_by(desc('total_quantity')).limit(10)
+            MaterialStock.total_quantity > 0
+        ).order_by(desc(MaterialStock.total_quantity)).limit(10)
 
         results = query.all()
 
@@ -343,6 +512,7 @@ async def get_material_composition_graph(
         return GraphDataResponse(labels=[], datasets=[{"label": "在庫本数", "data": [], "backgroundColor": []}])
 
 @router.get("/graph/supplier-amount/", response_model=GraphDataResponse)
+@analytics_cache.cached("supplier_amount")
 async def get_supplier_amount_graph(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
@@ -353,6 +523,12 @@ async def get_supplier_amount_graph(
     db: Session = Depends(get_db)
 ):
     """仕入先別金額グラフデータ（棒グラフ）"""
+    if analytics_duckdb.active():
+        results = analytics_duckdb.supplier_amount(
+            start_date, end_date, purchase_month, purchase_month_start, purchase_month_end
+        )
+        return _supplier_amount_response([r[0] for r in results], [float(r[1] or 0) for r in results])
+
     query = db.query(
         Lot.supplier,
         func.sum(Lot.received_amount).label('total_amount')
@@ -373,9 +549,11 @@ async def get_supplier_amount_graph(
 
     results = query.group_by(Lot.supplier).order_by(desc('total_amount')).limit(10).all()
 
-    labels = [r.supplier for r in results]
-    data = [float(r.total_amount or 0) for r in results]
+    return _supplier_amount_response(
+        [r.supplier for r in results], [float(r.total_amount or 0) for r in results]
+    )
 
+def _supplier_amount_response(labels: List[str], data: List[float]) -> GraphDataResponse:
     return GraphDataResponse(
         labels=labels,
         datasets=[{
@@ -386,12 +564,17 @@ async def get_supplier_amount_graph(
     )
 
 @router.get("/graph/purchase-month-amount/", response_model=GraphDataResponse)
+@analytics_cache.cached("purchase_month_amount")
 async def get_purchase_month_amount_graph(
     purchase_month_start: Optional[str] = Query(None),
     purchase_month_end: Optional[str] = Query(None),
     db: Session = Depends(get_db)
 ):
     """購入月別購入費グラフデータ（棒グラフ）"""
+    if analytics_duckdb.active():
+        results = analytics_duckdb.purchase_month_amount(purchase_month_start, purchase_month_end)
+        return _purchase_month_amount_response([r[0] for r in results], [float(r[1] or 0) for r in results])
+
     query = db.query(
         Lot.purchase_month,
         func.sum(Lot.received_amount).label('total_amount')
@@ -404,9 +587,11 @@ async def get_purchase_month_amount_graph(
 
     results = query.group_by(Lot.purchase_month).order_by(Lot.purchase_month).all()
 
-    labels = [r.purchase_month for r in results]
-    data = [float(r.total_amount or 0) for r in results]
+    return _purchase_month_amount_response(
+        [r.purchase_month for r in results], [float(r.total_amount or 0) for r in results]
+    )
 
+def _purchase_month_amount_response(labels: List[str], data: List[float]) -> GraphDataResponse:
     return GraphDataResponse(
         labels=labels,
         datasets=[{
@@ -417,6 +602,7 @@ async def get_purchase_month_amount_graph(
     )
 
 @router.get("/graph/inventory-amount/", response_model=GraphDataResponse)
+@analytics_cache.cached("inventory_amount")
 async def get_inventory_amount_graph(
     material_name: Optional[str] = Query(None),
     material_group_id: Optional[int] = Query(None),
@@ -427,6 +613,12 @@ async def get_inventory_amount_graph(
     db: Session = Depends(get_db)
 ):
     """材料別の在庫金額グラフ（棒グラフ）"""
+    if analytics_duckdb.active():
+        results = analytics_duckdb.inventory_amount(
+            material_name, material_group_id, purchase_month, purchase_month_start, purchase_month_end, supplier
+        )
+        return _inventory_amount_response([r[0] for r in results], [round(float(r[1]), 2) for r in results])
+
     # 材料フィルタ
     material_query = db.query(Material.id).filter(Material.is_active == True)
     if material_name:
@@ -437,7 +629,7 @@ async def get_inventory_amount_graph(
         )
     material_ids = [m[0] for m in material_query.all()]
     if not material_ids:
-        return GraphDataResponse(labels=[], datasets=[{"label": "在庫金額（円）", "data": [], "backgroundColor": "rgba(99, 102, 241, 0.8)"}])
+        return _inventory_amount_response([], [])
 
     # ロットフィルタ
     lot_filters = []
@@ -450,43 +642,32 @@ async def get_inventory_amount_graph(
     if supplier:
         lot_filters.append(Lot.supplier.contains(supplier))
 
+    # 現在在庫アイテム（条件に一致）の金額を材料別に SQL で集計
+    results = db.query(
+        Material.display_name,
+        func.sum(_amount_expr(Item.current_quantity)).label('total_value')
+    ).select_from(Item).join(
+        Lot, Item.lot_id == Lot.id
+    ).join(
+        Material, Lot.material_id == Material.id
+    ).filter(
+        Lot.material_id.in_(material_ids),
+        Item.is_active == True,
+        Item.current_quantity > 0,
+        *lot_filters
+    ).group_by(Material.id, Material.display_name).order_by(Material.id).all()
+
     labels = []
     data = []
-
-    for material_id in material_ids:
-        material = db.query(Material).filter(Material.id == material_id).first()
-        if not material:
-            continue
-        # 現在在庫アイテム（条件に一致）
-        items = db.query(Item).join(Lot).filter(
-            and_(Lot.material_id == material_id, Item.is_active == True, *lot_filters)
-        ).all()
-        total_value = 0.0
-        for item in items:
-            lot = item.lot
-            if not lot:
-                continue
-            qty = item.current_quantity or 0
-            if qty <= 0:
-                continue
-            # 単価算出
-            if lot.received_unit_price is not None:
-                unit_price_per_piece = float(lot.received_unit_price)
-                total_value += unit_price_per_piece * qty
-            elif lot.received_amount is not None and lot.initial_quantity and lot.initial_quantity > 0:
-                unit_price_per_piece = float(lot.received_amount) / float(lot.initial_quantity)
-                total_value += unit_price_per_piece * qty
-            elif lot.received_amount is not None and lot.initial_weight_kg and lot.initial_weight_kg > 0:
-                price_per_kg = float(lot.received_amount) / float(lot.initial_weight_kg)
-                weight_kg = _calculate_weight_kg(material, lot.length_mm, qty)
-                total_value += price_per_kg * weight_kg
-            else:
-                # 情報不足時は0評価
-                total_value += 0.0
+    for r in results:
+        total_value = float(r.total_value or 0)
         if total_value > 0:
-            labels.append(material.display_name)
+            labels.append(r.display_name)
             data.append(round(total_value, 2))
 
+    return _inventory_amount_response(labels, data)
+
+def _inventory_amount_response(labels: List[str], data: List[float]) -> GraphDataResponse:
     return GraphDataResponse(
         labels=labels,
         datasets=[{
@@ -497,6 +678,7 @@ async def get_inventory_amount_graph(
     )
 
 @router.get("/graph/outgoing-amount/", response_model=GraphDataResponse)
+@analytics_cache.cached("outgoing_amount")
 async def get_outgoing_amount_graph(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
@@ -507,49 +689,70 @@ async def get_outgoing_amount_graph(
     db: Session = Depends(get_db)
 ):
     """持ち出し量金額（日別合計、棒グラフ）"""
-    # 対象移動抽出
-    query = db.query(Movement).join(Item).join(Lot)
-    query = query.filter(Movement.movement_type == MovementType.OUT)
-    if start_date:
-        query = query.filter(Movement.processed_at >= datetime.combine(start_date, datetime.min.time()))
-    if end_date:
-        query = query.filter(Movement.processed_at <= datetime.combine(end_date, datetime.max.time()))
+    if analytics_duckdb.active():
+        results = analytics_duckdb.outgoing_amount(
+            start_date, end_date, material_id, purchase_month, purchase_month_start, purchase_month_end
+        )
+        return _outgoing_amount_response(
+            [day.strftime('%Y-%m-%d') for day, _ in results], [round(float(amount or 0), 2) for _, amount in results]
+        )
+
+    # 出庫金額を日別に SQL で集計（移動ごとにロット・材料を読み込まない）
+    lot_filters = []
     if material_id:
-        query = query.filter(Lot.material_id == material_id)
+        lot_filters.append(Lot.material_id == material_id)
     if purchase_month:
-        query = query.filter(Lot.purchase_month == purchase_month)
+        lot_filters.append(Lot.purchase_month == purchase_month)
     if purchase_month_start:
-        query = query.filter(Lot.purchase_month >= purchase_month_start)
+        lot_filters.append(Lot.purchase_month >= purchase_month_start)
     if purchase_month_end:
-        query = query.filter(Lot.purchase_month <= purchase_month_end)
-
-    movements = query.order_by(func.date(Movement.processed_at)).all()
+        lot_filters.append(Lot.purchase_month <= purchase_month_end)
 
-    # 日別集計
-    totals_by_date = {}
-    for m in movements:
-        lot = m.item.lot
-        material = lot.material if lot else None
-        date_key = m.processed_at.date()
-        qty = m.quantity or 0
-        if qty <= 0:
-            continue
-        amount = 0.0
-        if lot and lot.received_unit_price is not None:
-            amount = float(lot.received_unit_price) * qty
-        elif lot and lot.received_amount is not None and lot.initial_quantity and lot.initial_quantity > 0:
-            amount = (float(lot.received_amount) / float(lot.initial_quantity)) * qty
-        elif lot and lot.received_amount is not None and lot.initial_weight_kg and lot.initial_weight_kg > 0 and material:
-            price_per_kg = float(lot.received_amount) / float(lot.initial_weight_kg)
-            weight_kg = _calculate_weight_kg(material, lot.length_mm, qty)
-            amount = price_per_kg * weight_kg
-        totals_by_date[date_key] = round(totals_by_date.get(date_key, 0.0) + amount, 2)
-
-    # ラベル・データ生成
-    dates = sorted(totals_by_date.keys())
-    labels = [d.strftime('%Y-%m-%d') for d in dates]
-    data = [totals_by_date[d] for d in dates]
+    query = db.query(
+        func.date(Movement.processed_at).label('date'),
+        func.sum(_amount_expr(Movement.quantity)).label('amount')
+    ).select_from(Movement).join(
+        Item, Movement.item_id == Item.id
+    ).join(
+        Lot, Item.lot_id == Lot.id
+    ).join(
+        Material, Lot.material_id == Material.id
+    ).filter(
+        Movement.movement_type == MovementType.OUT,
+        Movement.quantity > 0,
+        *lot_filters
+    )
+    if start_date:
+        query = query.filter(Movement.processed_at >= datetime.combine(start_date, datetime.min.time()))
+    if end_date:
+        query = query.filter(Movement.processed_at <= datetime.combine(end_date, datetime.max.time()))
 
+    results = query.group_by(func.date(Movement.processed_at)).all()
+    dates = [r.date for r in results]
+    amounts = [float(r.amount or 0) for r in results]
+
+    # アーカイブ分はロット・日付ごとに本数を集計し、現在のロット情報から金額を求める
+    archived = _archived_frame(start_date, end_date, MovementType.OUT)
+    if archived is not None:
+        archived = archived[archived["quantity"] > 0]
+        grouped = archived.groupby(["lot_id", archived["processed_at"].dt.date])["quantity"].sum()
+        lot_ids = [int(lot_id) for lot_id in grouped.index.get_level_values(0).unique()]
+        lots = {
+            lot.id: lot
+            for lot in db.query(Lot).options(joinedload(Lot.material)).filter(
+                Lot.id.in_(lot_ids), *lot_filters
+            ).all()
+        } if lot_ids else {}
+        for (lot_id, day), quantity in grouped.items():
+            lot = lots.get(int(lot_id))
+            if lot is not None:
+                dates.append(day)
+                amounts.append(_out_amount(lot, int(quantity)))
+
+    labels, (data,) = graph_shape.pivot_by_date(dates, ["out"] * len(dates), amounts, ["out"], decimals=2)
+    return _outgoing_amount_response(labels, data)
+
+def _outgoing_amount_response(labels: List[str], data: List[float]) -> GraphDataResponse:
     return GraphDataResponse(
         labels=labels,
         datasets=[{
@@ -559,11 +762,17 @@ async def get_outgoing_amount_graph(
         }]
     )
 
+@router.get("/cache-stats/")
+async def analytics_cache_stats():
+    """集計結果キャッシュの状況（ヒット率・件数・データ版数）"""
+    return {**analytics_cache.get_stats(), "duckdb": analytics_duckdb.stats if analytics_duckdb.enabled() else None}
+
 @router.get("/export/csv/")
 async def export_csv(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     material_name: Optional[str] = Query(None),
+    material_group_id: Optional[int] = Query(None),
     purchase_month: Optional[str] = Query(None),
     purchase_month_start: Optional[str] = Query(None),
     purchase_month_end: Optional[str] = Query(None),
@@ -575,73 +784,31 @@ async def export_csv(
         start_date=start_date,
         end_date=end_date,
         material_name=material_name,
+        material_group_id=material_group_id,
         purchase_month=purchase_month,
         purchase_month_start=purchase_month_start,
         purchase_month_end=purchase_month_end,
+        supplier=None,
+        movement_type=None,
         db=db
     )
 
-    # CSV生成
-    output = io.StringIO()
-    output.write('\ufeff')  # BOM
-    writer = csv.writer(output)
-
-    # ヘッダー
-    writer.writerow([
-        '材料名', '現在在庫本数', '現在在庫重量(kg)',
-        '入庫本数', '入庫重量(kg)', '出庫本数', '出庫重量(kg)', '金額（円）'
-    ])
-
-    # データ行
-    for m in summary.materials:
-        writer.writerow([
-            m.material_name,
-            m.current_stock_quantity,
-            m.current_stock_weight_kg,
-            m.total_in_quantity,
-            m.total_in_weight_kg,
-            m.total_out_quantity,
-            m.total_out_weight_kg,
-            m.total_amount
-        ])
-
-    # 合計行
-    writer.writerow([])
-    writer.writerow([
-        '合計',
-        summary.total_stock_quantity,
-        summary.total_stock_weight_kg,
-        summary.total_in_quantity,
-        summary.total_in_weight_kg,
-        summary.total_out_quantity,
-        summary.total_out_weight_kg,
-        summary.total_amount
-    ])
-
-    output.seek(0)
-
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv; charset=utf-8",
-        headers={
-            "Content-Disposition": f"attachment; filename=analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        }
-    )
+    return _summary_export(summary, "csv")
 
 @router.get("/export/excel/")
 async def export_excel(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     material_name: Optional[str] = Query(None),
+    material_group_id: Optional[int] = Query(None),
     purchase_month: Optional[str] = Query(None),
     purchase_month_start: Optional[str] = Query(None),
     purchase_month_end: Optional[str] = Query(None),
     db: Session = Depends(get_db)
 ):
-    """Excel出力（openpyxl使用）"""
+    """Excel出力（openpyxl write-only モード）"""
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill
+        import openpyxl  # noqa: F401
     except ImportError:
         raise HTTPException(status_code=500, detail="openpyxlがインストールされていません")
 
@@ -650,75 +817,13 @@ async def export_excel(
         start_date=start_date,
         end_date=end_date,
         material_name=material_name,
+        material_group_id=material_group_id,
         purchase_month=purchase_month,
         purchase_month_start=purchase_month_start,
         purchase_month_end=purchase_month_end,
+        supplier=None,
+        movement_type=None,
         db=db
     )
 
-    # Excel生成
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "集計結果"
-
-    # ヘッダー
-    headers = [
-        '材料名', '現在在庫本数', '現在在庫重量(kg)',
-        '入庫本数', '入庫重量(kg)', '出庫本数', '出庫重量(kg)', '金額（円）'
-    ]
-    ws.append(headers)
-
-    # ヘッダースタイル
-    for cell in ws[1]:
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center")
-
-    # データ行
-    for m in summary.materials:
-        ws.append([
-            m.material_name,
-            m.current_stock_quantity,
-            m.current_stock_weight_kg,
-            m.total_in_quantity,
-            m.total_in_weight_kg,
-            m.total_out_quantity,
-            m.total_out_weight_kg,
-            m.total_amount
-        ])
-
-    # 合計行
-    ws.append([])
-    total_row = [
-        '合計',
-        summary.total_stock_quantity,
-        summary.total_stock_weight_kg,
-        summary.total_in_quantity,
-        summary.total_in_weight_kg,
-        summary.total_out_quantity,
-        summary.total_out_weight_kg,
-        summary.total_amount
-    ]
-    ws.append(total_row)
-
-    # 合計行スタイル
-    for cell in ws[ws.max_row]:
-        cell.font = Font(bold=True)
-
-    # 列幅調整
-    ws.column_dimensions['A'].width = 30
-    for col in ['B', 'C', 'D', 'E', 'F', 'G', 'H']:
-        ws.column_dimensions[col].width = 15
-
-    # バイナリ出力
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={
-            "Content-Disposition": f"attachment; filename=analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        }
-    )
+    return _summary_export(summary, "xlsx")
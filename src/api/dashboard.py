@@ -0,0 +1,147 @@
+"""ダッシュボードAPI
+
+ダッシュボードで表示する7種類のデータ（グループ在庫・材料数・在庫・入出庫履歴・
+在庫不足（材料・グループ単位）・在庫切れ予測・未入庫/未検品の発注）を1回の呼び出し・1つのDBセッションでまとめて返す。
+組み立てた結果は条件ごとに短時間キャッシュし、ETag による条件付きGETに対応する。
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.db import get_db
+from src.api import inventory, materials, movements, purchase_orders
+from src.api.production_schedule import StockoutForecast, _calculate_stockout_forecast
+from src.utils import stock_events, low_stock
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# (条件) -> (有効期限, ETag, JSON本文)
+_cache: Dict[tuple, Tuple[float, str, bytes]] = {}
+_locks: Dict[tuple, asyncio.Lock] = {}
+cache_stats = {"hits": 0, "builds": 0, "not_modified": 0}
+
+
+def _prune(now: float) -> None:
+    """期限切れのキャッシュと使われていないロックを削除（条件の種類だけ増え続けないように）"""
+    for key in [key for key, entry in list(_cache.items()) if entry[0] <= now]:
+        _cache.pop(key, None)
+    for key in [key for key, lock in list(_locks.items()) if key not in _cache and not lock.locked()]:
+        _locks.pop(key, None)
+
+
+def _serialize(model_type, data):
+    """各APIのレスポンスモデルと同じ形に変換"""
+    return jsonable_encoder(TypeAdapter(model_type).validate_python(data, from_attributes=True))
+
+
+async def _build_dashboard(
+    db: Session,
+    inventory_limit: int,
+    movement_limit: int,
+    low_stock_threshold: int,
+) -> dict:
+    errors = {}
+
+    groups = await inventory.get_inventory_groups(include_inactive_groups=False, db=db)
+    materials_count = await materials.get_materials_count(
+        is_active=True, display_name=None, diameter_mm=None, shape=None, db=db
+    )
+    inventory_items = await inventory.get_inventory(
+        skip=0,
+        limit=inventory_limit,
+        material_id=None,
+        location_id=None,
+        lot_number=None,
+        is_active=True,
+        has_stock=True,
+        include_zero_stock=False,
+        db=db,
+    )
+    recent_movements = await movements.get_movements(
+        skip=0, limit=movement_limit, movement_type=None, item_id=None, db=db
+    )
+    low_stock_alerts = low_stock.get_low_stock_alerts(db, default_threshold=low_stock_threshold)
+    pending_items = purchase_orders.list_pending_or_inspection_items(db, include_inspected=False)
+
+    # 在庫切れ予測はExcel読込を伴うため、失敗しても他のデータは返す
+    try:
+        forecasts = await run_in_threadpool(_calculate_stockout_forecast, db)
+    except Exception as exc:
+        logger.exception("在庫切れ予測の計算に失敗しました")
+        forecasts = []
+        errors["forecasts"] = str(exc)
+
+    return {
+        "groups": _serialize(List[inventory.InventoryGroupSummary], groups),
+        "materials_count": jsonable_encoder(materials_count),
+        "inventory": _serialize(List[inventory.InventoryItem], inventory_items),
+        "movements": _serialize(List[movements.MovementResponse], recent_movements),
+        "low_stock_alerts": low_stock_alerts,
+        "forecasts": _serialize(List[StockoutForecast], forecasts),
+        "pending_po_items": _serialize(List[purchase_orders.PurchaseOrderItemResponse], pending_items),
+        "errors": errors,
+        "generated_at": datetime.now().isoformat(),
+    }
+
+
+@router.get("/")
+async def get_dashboard(
+    request: Request,
+    inventory_limit: int = Query(20, ge=1, le=200, description="在庫一覧の件数"),
+    movement_limit: int = Query(10, ge=1, le=100, description="入出庫履歴の件数"),
+    low_stock_threshold: int = Query(5, ge=0, le=1000, description="発注点未設定の材料に適用する下限本数"),
+    db: Session = Depends(get_db)
+):
+    """ダッシュボード用データ一括取得（短時間キャッシュ・ETag対応）"""
+    key = (inventory_limit, movement_limit, low_stock_threshold)
+    now = time.monotonic()
+    entry = _cache.get(key)
+
+    if entry is None or entry[0] <= now:
+        _prune(now)
+        # 同じ条件の同時アクセスは1回だけ計算する
+        lock = _locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = _cache.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                payload = await _build_dashboard(db, inventory_limit, movement_limit, low_stock_threshold)
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                entry = (time.monotonic() + settings.dashboard_cache_ttl_sec, etag, body)
+                _cache[key] = entry
+                cache_stats["builds"] += 1
+            else:
+                cache_stats["hits"] += 1
+    else:
+        cache_stats["hits"] += 1
+
+    _, etag, body = entry
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if request.headers.get("if-none-match") == etag:
+        cache_stats["not_modified"] += 1
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@stock_events.subscribe
+def _on_stock_changed(event: dict):
+    """在庫が変わったらキャッシュを破棄（次回アクセス時に再計算）"""
+    _cache.clear()
+    for key in [key for key, lock in list(_locks.items()) if not lock.locked()]:
+        _locks.pop(key, None)
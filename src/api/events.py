@@ -0,0 +1,68 @@
+"""在庫変更イベント配信API（Server-Sent Events）
+
+入出庫・置き場変更・検品・入庫のコミット後に、アイテムID・現在数量・置き場などの差分を配信する。
+クライアントは EventSource で受信し、該当行のみ更新する。
+"""
+
+import json
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+from src.config import settings
+from src.utils.event_broker import broker
+
+router = APIRouter()
+
+# 接続維持のためのコメント送信間隔（秒）
+HEARTBEAT_SEC = 15
+
+
+def _format_sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.get("/")
+async def stream_events(request: Request):
+    """在庫変更イベントのストリーム"""
+    client = broker.register()
+    if client is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="イベント配信の接続数が上限に達しています"
+        )
+
+    async def event_generator():
+        try:
+            # 再接続間隔の指定（ミリ秒）
+            yield f"retry: {settings.event_stream_retry_ms}\n\n"
+            while True:
+                if await request.is_disconnected():
+                    break
+                event = await client.next_event(HEARTBEAT_SEC)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_sse(event)
+        finally:
+            broker.unregister(client)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+@router.get("/stats/")
+async def event_stats():
+    """配信状況（接続数・配信件数）"""
+    return {
+        "clients": broker.client_count,
+        "published": broker.published,
+        "queue_size": settings.event_stream_queue_size,
+        "max_clients": settings.event_stream_max_clients,
+    }
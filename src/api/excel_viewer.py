@@ -4,7 +4,6 @@ Excel直接ビューア API
 Excelファイルを直接読み込み、在庫との照合結果を返すシンプルなAPI
 """
 
-import pandas as pd
 import tempfile
 import os
 import re
@@ -16,7 +15,7 @@ from sqlalchemy import func
 from pydantic import BaseModel
 
 from src.db import get_db
-from src.db.models import Material, Item, Lot, MaterialShape
+from src.db.models import Material, MaterialShape, MaterialStock
 
 router = APIRouter(prefix="/api/excel-viewer", tags=["excel-viewer"])
 
@@ -38,6 +37,8 @@ def parse_material_info(material_spec: str) -> Dict[str, Any]:
     - SUS303 ∅10.0CM → {material_name: 'SUS303', diameter: 10.0, shape: round}
     - C3602Lcd ∅12.0 (NB5N) → {material_name: 'C3602LCD', diameter: 12.0, shape: round, dedicated_part_number: 'NB5N'}
     """
+    import pandas as pd
+
     if not material_spec or pd.isna(material_spec):
         return None
 
@@ -111,31 +112,18 @@ def get_current_stock(db: Session, material_info: Dict[str, Any]) -> int:
         return 0
 
     try:
-        # 基本条件で材料を検索（材質名・径のみ）
-        query = db.query(Material).filter(
+        # 材質名・径が一致する材料の在庫集計を合計
+        total_stock = db.query(
+            func.coalesce(func.sum(MaterialStock.total_quantity), 0)
+        ).join(
+            Material, MaterialStock.material_id == Material.id
+        ).filter(
             Material.name == material_info['material_name'],
             Material.diameter_mm == material_info['diameter'],
             Material.is_active == True
-        )
-
-        materials = query.all()
-
-        if not materials:
-            return 0
+        ).scalar()
 
-        # すべてのマッチした材料の在庫を合計
-        total_stock = 0
-        for material in materials:
-            stock = db.query(func.sum(Item.current_quantity)).join(
-                Lot, Item.lot_id == Lot.id
-            ).filter(
-                Lot.material_id == material.id,
-                Item.is_active == True
-            ).scalar()
-
-            total_stock += (stock or 0)
-
-        return total_stock
+        return int(total_stock or 0)
 
     except Exception as e:
         print(f"在庫取得エラー: {e}")
@@ -152,6 +140,8 @@ async def analyze_excel(
     Excelファイルを解析して在庫照合結果を返す
     """
 
+    import pandas as pd
+
     if not file.filename.endswith('.xlsx'):
         raise HTTPException(status_code=400, detail="Excelファイル(.xlsx)をアップロードしてください")
 
@@ -0,0 +1,352 @@
+"""
+データエクスポートAPI（在庫・入出庫履歴・ロット・監査ログ）
+
+各エンドポイントはサーバーサイドカーソル（yield_per）で行を取得しながら
+CSV / Excel を逐次出力するため、件数が多くてもメモリ使用量は一定。
+入出庫履歴・監査ログは、期間がアーカイブ済みの月にかかる場合はアーカイブ分（1か月ずつ読み込み）を先に出力する。
+"""
+
+from datetime import date, datetime, time
+from itertools import chain
+from typing import Iterable, Iterator, List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from src.db import get_db
+from src.db.models import AuditLog, Item, Location, Lot, Material, Movement, MovementType, User
+from src.utils import history_archive
+from src.utils.export_stream import EXPORT_BATCH_SIZE, streaming_export
+from src.utils.weight import weight_per_piece_kg_expr
+
+router = APIRouter()
+
+FORMAT_QUERY = Query("csv", pattern="^(csv|xlsx)$", description="出力形式（csv / xlsx）")
+
+
+def _start_of(day: Optional[date]) -> Optional[datetime]:
+    return datetime.combine(day, time.min) if day else None
+
+
+def _end_of(day: Optional[date]) -> Optional[datetime]:
+    return datetime.combine(day, time.max) if day else None
+
+
+def _rounded(rows, *weight_columns: int) -> Iterator[list]:
+    """重量列を小数3桁に丸めて1行ずつ返す"""
+    for row in rows:
+        row = list(row)
+        for index in weight_columns:
+            if row[index] is not None:
+                row[index] = round(float(row[index]), 3)
+        yield row
+
+
+def _batches(rows: Iterable[dict]) -> Iterator[List[dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ids(batch: List[dict], key: str) -> set:
+    return {int(row[key]) for row in batch if row[key] is not None}
+
+
+def _user_names(db: Session, user_ids: set, column) -> dict:
+    if not user_ids:
+        return {}
+    return dict(db.query(User.id, column).filter(User.id.in_(user_ids)).all())
+
+
+def archived_movement_rows(
+    db: Session,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    movement_type: Optional[MovementType] = None,
+    item_id: Optional[int] = None,
+) -> Iterator[list]:
+    """アーカイブ済みの入出庫履歴（材料名・重量は現存するロットから補う）"""
+    rows = (
+        row for row in history_archive.iter_rows("movements", start, end)
+        if (movement_type is None or row["movement_type"] == movement_type.value)
+        and (item_id is None or row["item_id"] == item_id)
+    )
+    weight_per_piece = weight_per_piece_kg_expr()
+    for batch in _batches(rows):
+        lot_ids = _ids(batch, "lot_id")
+        lots = {
+            lot_id: (name, weight)
+            for lot_id, name, weight in db.query(Lot.id, Material.display_name, weight_per_piece).join(
+                Material, Lot.material_id == Material.id
+            ).filter(Lot.id.in_(lot_ids)).all()
+        } if lot_ids else {}
+        users = _user_names(db, _ids(batch, "processed_by"), User.full_name)
+        for row in batch:
+            name, weight = lots.get(int(row["lot_id"]) if row["lot_id"] is not None else None, (None, None))
+            quantity = int(row["quantity"])
+            yield [
+                int(row["id"]),
+                row["processed_at"],
+                row["movement_type"],
+                row["lot_number"],
+                name,
+                quantity,
+                round(quantity * float(weight), 3) if weight is not None else None,
+                users.get(int(row["processed_by"])) if row["processed_by"] is not None else None,
+                row["notes"],
+            ]
+
+
+def archived_audit_rows(
+    db: Session,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    action: Optional[str] = None,
+    target_table: Optional[str] = None,
+) -> Iterator[list]:
+    """アーカイブ済みの監査ログ"""
+    rows = (
+        row for row in history_archive.iter_rows("audit_logs", start, end)
+        if (not action or action in (row["action"] or ""))
+        and (not target_table or row["target_table"] == target_table)
+    )
+    for batch in _batches(rows):
+        users = _user_names(db, _ids(batch, "user_id"), User.username)
+        for row in batch:
+            yield [
+                int(row["id"]),
+                row["created_at"],
+                users.get(int(row["user_id"])) if row["user_id"] is not None else None,
+                row["action"],
+                row["target_table"],
+                int(row["target_id"]) if row["target_id"] is not None else None,
+                row["old_values"],
+                row["new_values"],
+                row["ip_address"],
+            ]
+
+
+INVENTORY_HEADER = [
+    "ロット番号", "材料名", "形状", "径(mm)", "長さ(mm)", "置き場", "現在本数",
+    "1本重量(kg)", "総重量(kg)", "仕入先", "入荷日", "購入月", "検品状態",
+]
+
+
+def inventory_rows(
+    db: Session,
+    material_id: Optional[int] = None,
+    location_id: Optional[int] = None,
+    include_zero_stock: bool = False,
+) -> Iterator[list]:
+    weight_per_piece = weight_per_piece_kg_expr()
+    query = db.query(
+        Lot.lot_number,
+        Material.display_name,
+        Material.shape,
+        Material.diameter_mm,
+        Lot.length_mm,
+        Location.name,
+        Item.current_quantity,
+        weight_per_piece,
+        Item.current_quantity * weight_per_piece,
+        Lot.supplier,
+        Lot.received_date,
+        Lot.purchase_month,
+        Lot.inspection_status,
+    ).select_from(Item).join(
+        Lot, Item.lot_id == Lot.id
+    ).join(
+        Material, Lot.material_id == Material.id
+    ).outerjoin(
+        Location, Item.location_id == Location.id
+    ).filter(Item.is_active == True)
+
+    if not include_zero_stock:
+        query = query.filter(Item.current_quantity > 0)
+    if material_id is not None:
+        query = query.filter(Lot.material_id == material_id)
+    if location_id is not None:
+        query = query.filter(Item.location_id == location_id)
+
+    return _rounded(query.order_by(Item.id).yield_per(EXPORT_BATCH_SIZE), 7, 8)
+
+
+def export_inventory_response(
+    db: Session,
+    export_format: str,
+    material_id: Optional[int] = None,
+    location_id: Optional[int] = None,
+    include_zero_stock: bool = False,
+):
+    return streaming_export(
+        export_format,
+        "inventory",
+        "在庫一覧",
+        INVENTORY_HEADER,
+        inventory_rows(db, material_id, location_id, include_zero_stock),
+        column_widths=[22, 30, 10, 10, 10, 10, 10, 12, 12, 20, 20, 10, 10],
+    )
+
+
+@router.get("/inventory/")
+async def export_inventory(
+    format: str = FORMAT_QUERY,
+    material_id: Optional[int] = Query(None),
+    location_id: Optional[int] = Query(None),
+    include_zero_stock: bool = Query(False, description="在庫0のアイテムも含める"),
+    db: Session = Depends(get_db)
+):
+    """在庫一覧エクスポート"""
+    return export_inventory_response(db, format, material_id, location_id, include_zero_stock)
+
+
+@router.get("/movements/")
+async def export_movements(
+    format: str = FORMAT_QUERY,
+    start_date: Optional[date] = Query(None, description="処理日（開始）"),
+    end_date: Optional[date] = Query(None, description="処理日（終了）"),
+    movement_type: Optional[MovementType] = Query(None),
+    item_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """入出庫履歴エクスポート"""
+    weight_per_piece = weight_per_piece_kg_expr()
+    query = db.query(
+        Movement.id,
+        Movement.processed_at,
+        Movement.movement_type,
+        Lot.lot_number,
+        Material.display_name,
+        Movement.quantity,
+        Movement.quantity * weight_per_piece,
+        User.full_name,
+        Movement.notes,
+    ).select_from(Movement).join(
+        Item, Movement.item_id == Item.id
+    ).join(
+        Lot, Item.lot_id == Lot.id
+    ).join(
+        Material, Lot.material_id == Material.id
+    ).outerjoin(
+        User, Movement.processed_by == User.id
+    )
+
+    if start_date:
+        query = query.filter(Movement.processed_at >= _start_of(start_date))
+    if end_date:
+        query = query.filter(Movement.processed_at <= _end_of(end_date))
+    if movement_type is not None:
+        query = query.filter(Movement.movement_type == movement_type)
+    if item_id is not None:
+        query = query.filter(Movement.item_id == item_id)
+
+    rows = chain(
+        archived_movement_rows(db, _start_of(start_date), _end_of(end_date), movement_type, item_id),
+        _rounded(query.order_by(Movement.id).yield_per(EXPORT_BATCH_SIZE), 6),
+    )
+    return streaming_export(
+        format,
+        "movements",
+        "入出庫履歴",
+        ["ID", "処理日時", "種別", "ロット番号", "材料名", "本数", "重量(kg)", "処理者", "備考"],
+        rows,
+        column_widths=[8, 20, 8, 22, 30, 8, 12, 15, 40],
+    )
+
+
+@router.get("/lots/")
+async def export_lots(
+    format: str = FORMAT_QUERY,
+    start_date: Optional[date] = Query(None, description="入荷日（開始）"),
+    end_date: Optional[date] = Query(None, description="入荷日（終了）"),
+    material_id: Optional[int] = Query(None),
+    supplier: Optional[str] = Query(None, description="仕入先（部分一致）"),
+    db: Session = Depends(get_db)
+):
+    """ロット一覧エクスポート"""
+    query = db.query(
+        Lot.lot_number,
+        Material.display_name,
+        Lot.length_mm,
+        Lot.initial_quantity,
+        Lot.initial_weight_kg,
+        Lot.supplier,
+        Lot.received_date,
+        Lot.purchase_month,
+        Lot.received_unit_price,
+        Lot.received_amount,
+        Lot.inspection_status,
+        Lot.inspected_at,
+        Lot.inspected_by_name,
+        Lot.notes,
+    ).select_from(Lot).join(Material, Lot.material_id == Material.id)
+
+    if start_date:
+        query = query.filter(Lot.received_date >= _start_of(start_date))
+    if end_date:
+        query = query.filter(Lot.received_date <= _end_of(end_date))
+    if material_id is not None:
+        query = query.filter(Lot.material_id == material_id)
+    if supplier:
+        query = query.filter(Lot.supplier.contains(supplier))
+
+    return streaming_export(
+        format,
+        "lots",
+        "ロット一覧",
+        [
+            "ロット番号", "材料名", "長さ(mm)", "初期本数", "初期重量(kg)", "仕入先", "入荷日", "購入月",
+            "入庫時単価", "入庫時金額", "検品状態", "検品日時", "検品者", "備考",
+        ],
+        query.order_by(Lot.id).yield_per(EXPORT_BATCH_SIZE),
+        column_widths=[22, 30, 10, 10, 12, 20, 20, 10, 12, 12, 10, 20, 15, 40],
+    )
+
+
+@router.get("/audit-logs/")
+async def export_audit_logs(
+    format: str = FORMAT_QUERY,
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    action: Optional[str] = Query(None, description="操作内容（部分一致）"),
+    target_table: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """監査ログエクスポート"""
+    query = db.query(
+        AuditLog.id,
+        AuditLog.created_at,
+        User.username,
+        AuditLog.action,
+        AuditLog.target_table,
+        AuditLog.target_id,
+        AuditLog.old_values,
+        AuditLog.new_values,
+        AuditLog.ip_address,
+    ).select_from(AuditLog).outerjoin(User, AuditLog.user_id == User.id)
+
+    if start_date:
+        query = query.filter(AuditLog.created_at >= _start_of(start_date))
+    if end_date:
+        query = query.filter(AuditLog.created_at <= _end_of(end_date))
+    if action:
+        query = query.filter(AuditLog.action.contains(action))
+    if target_table:
+        query = query.filter(AuditLog.target_table == target_table)
+
+    return streaming_export(
+        format,
+        "audit_logs",
+        "監査ログ",
+        ["ID", "日時", "ユーザー", "操作", "対象テーブル", "対象ID", "変更前", "変更後", "IPアドレス"],
+        chain(
+            archived_audit_rows(db, _start_of(start_date), _end_of(end_date), action, target_table),
+            query.order_by(AuditLog.id).yield_per(EXPORT_BATCH_SIZE),
+        ),
+        column_widths=[8, 20, 15, 25, 18, 10, 50, 50, 16],
+    )
@@ -6,6 +6,8 @@ import re
 
 from src.db import get_db
 from src.db.models import Lot, InspectionStatus, Item, PurchaseOrderItem
+from src.utils import material_stock, scan_cache, stock_events
+from src.utils.json_stream import stream_json_array, stream_query
 
 router = APIRouter(prefix="/api/inspections", tags=["検品"])
 
@@ -76,6 +78,7 @@ async def submit_inspection(lot_id: int, body: InspectionRequest, db: Session =
     print(f"デバッグ: 検品処理開始 - Lot ID={lot_id}, Status={lot.inspection_status.value}")
 
     # 検品合格の場合にのみ在庫アイテムを登録
+    inventory_item = None
     if lot.inspection_status == InspectionStatus.PASSED:
         # 既に在庫アイテムが存在するかチェック
         existing_item = db.query(Item).filter(Item.lot_id == lot.id).first()
@@ -107,6 +110,7 @@ async def submit_inspection(lot_id: int, body: InspectionRequest, db: Session =
             )
             db.add(inventory_item)
             print(f"デバッグ: Item作成完了 - Item ID={inventory_item.id}")
+            material_stock.refresh(db, [lot.material_id])
             
             # 備考から登録予定置き場情報をクリア
             if lot.notes and "登録予定置き場:" in lot.notes:
@@ -115,7 +119,10 @@ async def submit_inspection(lot_id: int, body: InspectionRequest, db: Session =
                     lot.notes = None
 
     db.commit()
+    scan_cache.invalidate(lot.lot_number)
     print(f"デバッグ: 検品処理完了 - Lot ID={lot_id}")
+    if inventory_item is not None:
+        stock_events.publish_item_change("inspection", inventory_item)
     
     return {
         "message": "検品情報を保存しました",
@@ -161,38 +168,38 @@ async def search_lot_by_number(lot_number: str, db: Session = Depends(get_db)):
     return result
 
 
+def _pending_lot_dict(lot: Lot) -> dict:
+    return {
+        "id": lot.id,
+        "lot_number": lot.lot_number,
+        "material": {
+            "id": lot.material.id,
+            "display_name": lot.material.display_name,
+            "name": lot.material.display_name
+        } if lot.material else None,
+        "initial_quantity": lot.initial_quantity,
+        "initial_weight_kg": lot.initial_weight_kg,
+        "inspection_status": lot.inspection_status.value if lot.inspection_status else "pending",
+        "received_date": lot.received_date.isoformat() if lot.received_date else None,
+        "notes": lot.notes,
+        "purchase_order": {
+            "id": lot.purchase_order_item.purchase_order.id,
+            "order_number": lot.purchase_order_item.purchase_order.order_number
+        } if lot.purchase_order_item and lot.purchase_order_item.purchase_order else None
+    }
+
+
 @router.get("/lots/pending/", response_model=list)
 async def get_pending_inspection_lots(db: Session = Depends(get_db)):
-    """検品待ちのロット一覧を取得"""
-    lots = db.query(Lot).options(
+    """検品待ちのロット一覧を取得（サーバーサイドカーソルで逐次返す）"""
+    query = db.query(Lot).options(
         joinedload(Lot.material),
         joinedload(Lot.purchase_order_item).joinedload(PurchaseOrderItem.purchase_order)
     ).filter(
         Lot.inspection_status.in_([InspectionStatus.PENDING, InspectionStatus.FAILED])
-    ).all()
-    
-    result = []
-    for lot in lots:
-        result.append({
-            "id": lot.id,
-            "lot_number": lot.lot_number,
-            "material": {
-                "id": lot.material.id,
-                "display_name": lot.material.display_name,
-                "name": lot.material.display_name
-            } if lot.material else None,
-            "initial_quantity": lot.initial_quantity,
-            "initial_weight_kg": lot.initial_weight_kg,
-            "inspection_status": lot.inspection_status.value if lot.inspection_status else "pending",
-            "received_date": lot.received_date.isoformat() if lot.received_date else None,
-            "notes": lot.notes,
-            "purchase_order": {
-                "id": lot.purchase_order_item.purchase_order.id,
-                "order_number": lot.purchase_order_item.purchase_order.order_number
-            } if lot.purchase_order_item and lot.purchase_order_item.purchase_order else None
-        })
-    
-    return result
+    ).order_by(Lot.id)
+
+    return stream_json_array(stream_query(query), _pending_lot_dict)
 
 
 @router.get("/inspectors/", response_model=list)
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import Response
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, and_, case
 from typing import List, Optional
@@ -6,7 +7,11 @@ from pydantic import BaseModel, Field, ConfigDict, field_serializer
 from datetime import datetime
 
 from src.db import get_db
-from src.db.models import Item, Lot, Material, Location, MaterialShape, MaterialGroup, MaterialGroupMember, InspectionStatus, InspectionJudgement, PurchaseOrderItem, PurchaseOrder
+from src.db.models import Item, Lot, Material, Location, MaterialShape, MaterialGroup, MaterialGroupMember, InspectionStatus, InspectionJudgement, PurchaseOrderItem, PurchaseOrder, MaterialStock
+from src.api.exports import export_inventory_response
+from src.utils import low_stock, material_stock, scan_cache
+from src.utils.json_stream import stream_json_array, stream_query
+from src.utils.weight import volume_per_piece_cm3
 
 router = APIRouter()
 
@@ -173,21 +178,8 @@ def get_available_stock_for_material(
     Returns:
         利用可能な在庫数
     """
-    # 材料情報を取得
-    material = db.query(Material).filter(Material.id == material_id).first()
-    if not material:
-        return 0
-
-    # 在庫数を合計
-    total_stock = db.query(func.sum(Item.current_quantity)).join(
-        Lot, Item.lot_id == Lot.id
-    ).filter(
-        Lot.material_id == material.id,
-        Item.is_active == True,
-        Item.current_quantity > 0
-    ).scalar()
-
-    return total_stock or 0
+    # 材料別在庫集計（主キー読み取り）
+    return material_stock.get(db, material_id)["total_quantity"]
 
 # Pydantic スキーマ
 class LocationInfo(BaseModel):
@@ -576,38 +568,19 @@ async def get_inventory_summary_by_name(
 
     return summaries
 
-@router.get("/search/{lot_number}", response_model=InventoryItem)
-async def search_by_lot_number(lot_number: str, db: Session = Depends(get_db)):
-    """LOT番号による検索"""
+def _scan_snapshot(db: Session, lot_number: str):
+    """ロット番号からアイテムを取得し、(アイテムID, InventoryItem のJSON) を返す"""
     item = db.query(Item).join(Item.lot).options(
         joinedload(Item.lot).joinedload(Lot.material),
         joinedload(Item.location)
     ).filter(Lot.lot_number == lot_number).first()
 
     if not item:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="指定されたLOT番号のアイテムが見つかりません"
-        )
+        return None
 
     # 重量計算
     material = item.lot.material
-
-    if material.shape == MaterialShape.ROUND:
-        radius_cm = (material.diameter_mm / 2) / 10
-        length_cm = item.lot.length_mm / 10
-        volume_cm3 = 3.14159 * (radius_cm ** 2) * length_cm
-    elif material.shape == MaterialShape.HEXAGON:
-        side_cm = (material.diameter_mm / 2) / 10
-        length_cm = item.lot.length_mm / 10
-        volume_cm3 = (3 * (3 ** 0.5) / 2) * (side_cm ** 2) * length_cm
-    elif material.shape == MaterialShape.SQUARE:
-        side_cm = material.diameter_mm / 10
-        length_cm = item.lot.length_mm / 10
-        volume_cm3 = (side_cm ** 2) * length_cm
-    else:
-        volume_cm3 = 0
-
+    volume_cm3 = volume_per_piece_cm3(material.shape, material.diameter_mm, item.lot.length_mm)
     weight_per_piece_kg = (volume_cm3 * material.current_density) / 1000
     total_weight_kg = weight_per_piece_kg * item.current_quantity
 
@@ -650,7 +623,20 @@ async def search_by_lot_number(lot_number: str, db: Session = Depends(get_db)):
         "total_weight_kg": round(total_weight_kg, 3)
     }
 
-    return InventoryItem(**item_dict)
+    return item.id, InventoryItem(**item_dict).model_dump_json().encode("utf-8")
+
+@router.get("/search/{lot_number}", response_model=InventoryItem)
+async def search_by_lot_number(lot_number: str, db: Session = Depends(get_db)):
+    """LOT番号による検索（QRスキャン用。結果はメモリにキャッシュし、在庫変更時に破棄）"""
+    body = scan_cache.resolve(lot_number, lambda: _scan_snapshot(db, lot_number))
+
+    if body is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="指定されたLOT番号のアイテムが見つかりません"
+        )
+
+    return Response(content=body, media_type="application/json")
 
 @router.get("/search", response_model=List[InventoryItem])
 async def search_inventory_items(
@@ -758,53 +744,24 @@ async def search_inventory_items(
 
     return result
 
-@router.get("/low-stock")
-async def get_low_stock_items(
-    threshold: int = Query(5, ge=0, description="在庫下限値"),
+@router.get("/export/")
+async def export_inventory(
+    format: str = Query("csv", pattern="^(csv|xlsx)$", description="出力形式（csv / xlsx）"),
+    material_id: Optional[int] = Query(None),
+    location_id: Optional[int] = Query(None),
+    include_zero_stock: bool = Query(False, description="在庫0のアイテムも含める"),
     db: Session = Depends(get_db)
 ):
-    """在庫下限アラート"""
-    items = db.query(Item).options(
-        joinedload(Item.lot).joinedload(Lot.material),
-        joinedload(Item.location)
-    ).filter(
-        Item.is_active == True,
-        Item.current_quantity <= threshold
-    ).all()
-
-    result = []
-    for item in items:
-        material = item.lot.material
-
-        # 重量計算
-        if material.shape == MaterialShape.ROUND:
-            radius_cm = (material.diameter_mm / 2) / 10
-            length_cm = item.lot.length_mm / 10
-            volume_cm3 = 3.14159 * (radius_cm ** 2) * length_cm
-        elif material.shape == MaterialShape.HEXAGON:
-            side_cm = (material.diameter_mm / 2) / 10
-            length_cm = item.lot.length_mm / 10
-            volume_cm3 = (3 * (3 ** 0.5) / 2) * (side_cm ** 2) * length_cm
-        elif material.shape == MaterialShape.SQUARE:
-            side_cm = material.diameter_mm / 10
-            length_cm = item.lot.length_mm / 10
-            volume_cm3 = (side_cm ** 2) * length_cm
-        else:
-            volume_cm3 = 0
-
-        weight_per_piece_kg = (volume_cm3 * material.current_density) / 1000
-
-        result.append({
-            "lot_number": item.lot.lot_number,
-            "material_name": material.display_name,
-            "length_mm": item.lot.length_mm,
-            "current_quantity": item.current_quantity,
-            "location_name": item.location.name if item.location else "未配置",
-            "weight_per_piece_kg": round(weight_per_piece_kg, 3),
-            "alert_level": "危険" if item.current_quantity == 0 else "注意" if item.current_quantity <= threshold / 2 else "警告"
-        })
+    """在庫一覧エクスポート（ストリーミング出力）"""
+    return export_inventory_response(db, format, material_id, location_id, include_zero_stock)
 
-    return {"threshold": threshold, "items": result}
+@router.get("/low-stock/")
+async def get_low_stock_items(
+    threshold: int = Query(5, ge=0, description="発注点未設定の材料に使う在庫下限本数"),
+    db: Session = Depends(get_db)
+):
+    """在庫下限アラート（材料・グループ単位。発注点があればそれで判定する）"""
+    return {"threshold": threshold, "items": low_stock.get_low_stock_alerts(db, threshold)}
 
 @router.get("/locations/", response_model=List[LocationInfo])
 async def get_locations(
@@ -837,6 +794,7 @@ class InventoryGroupSummary(BaseModel):
     group_name: str
     is_active: bool
     total_stock: int
+    total_weight_kg: float = 0.0
     lot_count: int
     materials: List[GroupMaterialBrief]
 
@@ -846,53 +804,58 @@ async def get_inventory_groups(
     include_inactive_groups: Optional[bool] = Query(False, description="無効グループも含める"),
     db: Session = Depends(get_db)
 ):
-    """材料グループ単位の在庫集計（本数合計とロット数）"""
+    """材料グループ単位の在庫集計（本数・重量合計とロット数）
+
+    グループ数に関わらず、グループ・メンバー・集計の3クエリで組み立てる。
+    """
 
     group_query = db.query(MaterialGroup)
     if not include_inactive_groups:
         group_query = group_query.filter(MaterialGroup.is_active == True)
     groups = group_query.all()
-
-    summaries: List[InventoryGroupSummary] = []
-
-    for group in groups:
-        member_materials = (
-            db.query(Material)
-            .join(MaterialGroupMember, MaterialGroupMember.material_id == Material.id)
-            .filter(MaterialGroupMember.group_id == group.id)
+    if not groups:
+        return []
+
+    group_ids = [group.id for group in groups]
+
+    members: dict = {group_id: [] for group_id in group_ids}
+    for group_id, material_id, name, diameter_mm in (
+        db.query(MaterialGroupMember.group_id, Material.id, Material.display_name, Material.diameter_mm)
+        .join(Material, MaterialGroupMember.material_id == Material.id)
+        .filter(MaterialGroupMember.group_id.in_(group_ids))
+        .order_by(MaterialGroupMember.group_id, MaterialGroupMember.id)
+        .all()
+    ):
+        members[group_id].append(GroupMaterialBrief(id=material_id, name=name, diameter_mm=diameter_mm))
+
+    # メンバー材料の材料別在庫集計をグループ単位で合計（1クエリ）
+    totals = {
+        group_id: (quantity, weight, lot_count)
+        for group_id, quantity, weight, lot_count in (
+            db.query(
+                MaterialGroupMember.group_id,
+                func.coalesce(func.sum(MaterialStock.total_quantity), 0),
+                func.coalesce(func.sum(MaterialStock.total_weight_kg), 0.0),
+                func.coalesce(func.sum(MaterialStock.lot_count), 0),
+            )
+            .join(MaterialStock, MaterialStock.material_id == MaterialGroupMember.material_id)
+            .filter(MaterialGroupMember.group_id.in_(group_ids))
+            .group_by(MaterialGroupMember.group_id)
             .all()
         )
+    }
 
-        if member_materials:
-            material_ids = [m.id for m in member_materials]
-            total_stock = (
-                db.query(func.coalesce(func.sum(Item.current_quantity), 0))
-                .join(Lot, Item.lot_id == Lot.id)
-                .filter(Item.is_active == True)
-                .filter(Item.current_quantity > 0)
-                .filter(Lot.material_id.in_(material_ids))
-                .scalar()
-            )
-
-            lot_count = (
-                db.query(func.count(func.distinct(Lot.id)))
-                .join(Item, Item.lot_id == Lot.id)
-                .filter(Item.is_active == True)
-                .filter(Item.current_quantity > 0)
-                .filter(Lot.material_id.in_(material_ids))
-                .scalar()
-            )
-        else:
-            total_stock = 0
-            lot_count = 0
-
+    summaries: List[InventoryGroupSummary] = []
+    for group in groups:
+        total_stock, total_weight_kg, lot_count = totals.get(group.id, (0, 0.0, 0))
         summaries.append(InventoryGroupSummary(
             group_id=group.id,
             group_name=group.group_name,
             is_active=group.is_active,
             total_stock=int(total_stock or 0),
+            total_weight_kg=round(float(total_weight_kg or 0), 3),
             lot_count=int(lot_count or 0),
-            materials=[GroupMaterialBrief(id=m.id, name=m.display_name, diameter_mm=m.diameter_mm) for m in member_materials]
+            materials=members[group.id]
         ))
 
     return summaries
@@ -928,6 +891,15 @@ class InspectionLotResponse(BaseModel):
         return value.value if value else None
 
 
+def _inspection_lot_weight_kg(row) -> float:
+    """検品一覧の重量（初期重量があればそれを、なければ材質密度 × 体積 × 本数）"""
+    if row.initial_weight_kg is not None:
+        return round(row.initial_weight_kg, 3)
+    volume_cm3 = volume_per_piece_cm3(row.shape, row.diameter_mm, row.length_mm)
+    weight_per_piece_kg = (volume_cm3 * float(row.current_density or 0.0)) / 1000
+    return round(weight_per_piece_kg * int(row.total_quantity or 0), 3)
+
+
 @router.get("/lots/for-inspection/", response_model=List[InspectionLotResponse])
 def get_lots_for_inspection(
     include_completed: bool = Query(False, description="検品完了済みも含める"),
@@ -984,32 +956,8 @@ def get_lots_for_inspection(
     # 受領日降順でソート
     query = query.order_by(Lot.received_date.desc())
 
-    results = query.all()
-
-    inspected_list: List[InspectionLotResponse] = []
-    for row in results:
-        # 重量計算（材質密度 × 体積）
-        if row.shape == MaterialShape.ROUND:
-            radius_cm = (row.diameter_mm / 2) / 10
-            length_cm = row.length_mm / 10
-            volume_cm3 = 3.14159 * (radius_cm ** 2) * length_cm
-        elif row.shape == MaterialShape.HEXAGON:
-            side_cm = (row.diameter_mm / 2) / 10
-            length_cm = row.length_mm / 10
-            volume_cm3 = (3 * (3 ** 0.5) / 2) * (side_cm ** 2) * length_cm
-        elif row.shape == MaterialShape.SQUARE:
-            side_cm = row.diameter_mm / 10
-            length_cm = row.length_mm / 10
-            volume_cm3 = (side_cm ** 2) * length_cm
-        else:
-            volume_cm3 = 0
-
-        density = float(row.current_density or 0.0)
-        qty = int(row.total_quantity or 0)
-        weight_per_piece_kg = (volume_cm3 * density) / 1000
-        total_weight_kg = row.initial_weight_kg if row.initial_weight_kg is not None else (weight_per_piece_kg * qty)
-
-        inspected_list.append(InspectionLotResponse(
+    def to_response(row) -> InspectionLotResponse:
+        return InspectionLotResponse(
             lot_id=row.lot_id,
             lot_number=row.lot_number,
             material_name=row.material_name,
@@ -1017,14 +965,14 @@ def get_lots_for_inspection(
             diameter_mm=row.diameter_mm,
             length_mm=row.length_mm,
             total_quantity=row.total_quantity or 0,
-            total_weight_kg=round(total_weight_kg, 3),
+            total_weight_kg=_inspection_lot_weight_kg(row),
             inspection_status=row.inspection_status,
             inspected_at=row.inspected_at,
             received_date=row.received_date,
             order_number=None
-        ))
+        )
 
-    return inspected_list
+    return stream_json_array(stream_query(query), to_response)
 
 
 class UpdateInspectionRequest(BaseModel):
@@ -1129,6 +1077,7 @@ def update_lot_inspection(
 
     db.commit()
     db.refresh(lot)
+    scan_cache.invalidate(lot.lot_number)
 
     return {
         "message": "検品情報を更新しました",
@@ -1264,32 +1213,8 @@ def get_inspected_lots(
     if order_number:
         query = query.filter(PurchaseOrder.order_number.ilike(f"%{order_number}%"))
 
-    rows = query.offset(skip).limit(limit).all()
-
-    responses: List[InspectedLotResponse] = []
-    for row in rows:
-        # 重量計算（材質密度 × 体積）
-        if row.shape == MaterialShape.ROUND:
-            radius_cm = (row.diameter_mm / 2) / 10
-            length_cm = row.length_mm / 10
-            volume_cm3 = 3.14159 * (radius_cm ** 2) * length_cm
-        elif row.shape == MaterialShape.HEXAGON:
-            side_cm = (row.diameter_mm / 2) / 10
-            length_cm = row.length_mm / 10
-            volume_cm3 = (3 * (3 ** 0.5) / 2) * (side_cm ** 2) * length_cm
-        elif row.shape == MaterialShape.SQUARE:
-            side_cm = row.diameter_mm / 10
-            length_cm = row.length_mm / 10
-            volume_cm3 = (side_cm ** 2) * length_cm
-        else:
-            volume_cm3 = 0
-
-        density = float(row.current_density or 0.0)
-        qty = int(row.total_quantity or 0)
-        weight_per_piece_kg = (volume_cm3 * density) / 1000
-        total_weight_kg = row.initial_weight_kg if row.initial_weight_kg is not None else (weight_per_piece_kg * qty)
-
-        responses.append(InspectedLotResponse(
+    def to_response(row) -> InspectedLotResponse:
+        return InspectedLotResponse(
             lot_id=row.lot_id,
             lot_number=row.lot_number,
             material_name=row.material_name,
@@ -1297,11 +1222,11 @@ def get_inspected_lots(
             diameter_mm=row.diameter_mm,
             length_mm=row.length_mm,
             total_quantity=row.total_quantity or 0,
-            total_weight_kg=round(total_weight_kg, 3),
+            total_weight_kg=_inspection_lot_weight_kg(row),
             inspection_status=row.inspection_status,
             inspected_at=row.inspected_at,
             received_date=row.received_date,
             order_number=row.order_number
-        ))
+        )
 
-    return responses
+    return stream_json_array(stream_query(query.offset(skip).limit(limit)), to_response)
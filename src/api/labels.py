@@ -1,27 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
-from sqlalchemy.orm import Session, joinedload
-from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Request, Query
+from sqlalchemy.orm import Session, joinedload, contains_eager
+from typing import Optional, List, Literal
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import datetime, date
 from io import BytesIO
 from urllib.parse import quote
-import qrcode
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A6
-from reportlab.lib.units import mm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
 
 from src.db import get_db
-from src.db.models import Item, Lot, Material, Location
+from src.db.models import Item, Lot, Material, Location, PurchaseOrderItem
+from src.utils.pdf_render_pool import render_pdf, get_render_stats
+from src.utils import label_cache
 
 router = APIRouter()
 
-# 日本語フォント登録
-pdfmetrics.registerFont(UnicodeCIDFont('HeiseiKakuGo-W5'))
+# 一括印刷で1つのPDFにまとめる最大件数
+BATCH_MAX_LOTS = 500
 
 class LabelPrintRequest(BaseModel):
     lot_number: str = Field(..., description="LOT番号")
@@ -31,136 +24,124 @@ class LotTagRequest(BaseModel):
     lot_id: int = Field(..., description="ロットID")
     copies: int = Field(default=1, ge=1, le=10, description="印刷部数")
 
+class BatchLabelRequest(BaseModel):
+    kind: Literal["lot_tag", "label"] = Field(default="lot_tag", description="lot_tag: 現品票 / label: 材料管理ラベル")
+    purchase_order_id: Optional[int] = Field(None, description="発注ID")
+    lot_ids: Optional[List[int]] = Field(None, description="ロットIDリスト")
+    received_from: Optional[date] = Field(None, description="入荷日（開始）")
+    received_to: Optional[date] = Field(None, description="入荷日（終了）")
+    copies: int = Field(default=1, ge=1, le=10, description="1ロットあたりの印刷部数")
+
 @router.post("/print")
 async def print_label(
     request: LabelPrintRequest,
+    http_request: Request,
     db: Session = Depends(get_db)
 ):
     """QRコード付きラベル印刷（PDF生成）"""
+    item = get_label_item(db, request.lot_number)
+    return await label_pdf_response(http_request, item, request.copies)
+
+@router.get("/pdf/{lot_number}")
+async def get_label_pdf(
+    lot_number: str,
+    http_request: Request,
+    copies: int = Query(1, ge=1, le=10, description="印刷部数"),
+    db: Session = Depends(get_db)
+):
+    """ラベルPDF取得（再印刷・プレビュー用。ETag/If-None-Match対応）"""
+    item = get_label_item(db, lot_number)
+    return await label_pdf_response(http_request, item, copies)
 
-    # アイテム情報取得（LOT番号から検索）
+def get_label_item(db: Session, lot_number: str) -> Item:
+    """ラベル印刷対象のアイテム取得（LOT番号から検索）"""
     item = db.query(Item).join(Item.lot).options(
         joinedload(Item.lot).joinedload(Lot.material),
         joinedload(Item.location)
-    ).filter(Lot.lot_number == request.lot_number).first()
+    ).filter(Lot.lot_number == lot_number).first()
 
     if not item:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="指定されたLOT番号のアイテムが見つかりません"
         )
+    return item
 
+async def label_pdf_response(http_request: Request, item: Item, copies: int) -> Response:
+    """材料管理ラベルPDFのレスポンス"""
     material = item.lot.material
 
     # 重量計算
-    if material.shape.value == "round":
-        radius_cm = (material.diameter_mm / 2) / 10
-        length_cm = item.lot.length_mm / 10
-        volume_cm3 = 3.14159 * (radius_cm ** 2) * length_cm
-    elif material.shape.value == "hexagon":
-        side_cm = (material.diameter_mm / 2) / 10
-        length_cm = item.lot.length_mm / 10
-        volume_cm3 = (3 * (3 ** 0.5) / 2) * (side_cm ** 2) * length_cm
-    elif material.shape.value == "square":
-        side_cm = material.diameter_mm / 10
-        length_cm = item.lot.length_mm / 10
-        volume_cm3 = (side_cm ** 2) * length_cm
-    else:
-        volume_cm3 = 0
-
-    weight_per_piece_kg = (volume_cm3 * material.current_density) / 1000
+    weight_per_piece_kg = (calculate_volume_per_piece_cm3(material, item.lot.length_mm) * material.current_density) / 1000
     total_weight_kg = weight_per_piece_kg * item.current_quantity
 
-    # PDFバッファ作成
-    buffer = BytesIO()
-
-    # A6ラベル作成
-    create_a6_label(buffer, item, material, weight_per_piece_kg, total_weight_kg, request.copies)
+    filename = f"label_{item.lot.lot_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return await cached_pdf_response(
+        http_request,
+        "label",
+        [label_fields(item, material, weight_per_piece_kg, total_weight_kg)],
+        copies,
+        filename,
+        lot_number=item.lot.lot_number,
+    )
 
-    buffer.seek(0)
+async def cached_pdf_response(
+    http_request: Request,
+    kind: str,
+    entries: List[dict],
+    copies: int,
+    filename: str,
+    lot_number: Optional[str] = None,
+    headers: Optional[dict] = None,
+) -> Response:
+    """印字内容のハッシュでキャッシュしたPDFを返す（If-None-Match一致時は304）"""
+    key = label_cache.content_key(kind, entries, copies)
+    etag = f'"{key}"'
+    response_headers = {"ETag": etag, "Cache-Control": "private, no-cache", **(headers or {})}
+
+    if http_request.headers.get("if-none-match") == etag:
+        label_cache.cache_stats["not_modified"] += 1
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers)
+
+    pdf = label_cache.get(key, lot_number)
+    response_headers["X-Label-Cache"] = "hit" if pdf is not None else "miss"
+    if pdf is None:
+        # A6ラベル/現品票作成（プロセスプールで生成）
+        pdf = await render_pdf(kind, entries, copies)
+        label_cache.put(key, pdf, lot_number)
 
     # ファイル名をURLエンコード（日本語対応）
-    filename = f"label_{request.lot_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     filename_encoded = quote(filename)
+    response_headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{filename_encoded}"
 
     # PDFレスポンス
-    response = Response(
-        content=buffer.getvalue(),
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}"
-        }
-    )
-
-    return response
+    return Response(content=pdf, media_type="application/pdf", headers=response_headers)
 
 def create_qr_code(data: str, size_mm: int = 20) -> BytesIO:
-    """QRコード生成（最小20mm角）"""
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-
-    qr_image = qr.make_image(fill_color="black", back_color="white")
-    qr_buffer = BytesIO()
-    qr_image.save(qr_buffer, format='PNG')
-    qr_buffer.seek(0)
-
-    return qr_buffer
-
-def create_a6_label(buffer: BytesIO, item, material, weight_per_piece_kg: float, total_weight_kg: float, copies: int):
-    """A6ラベル作成"""
-    doc = SimpleDocTemplate(buffer, pagesize=A6, topMargin=5*mm, bottomMargin=5*mm, leftMargin=5*mm, rightMargin=5*mm)
-    styles = getSampleStyleSheet()
-
-    # 日本語対応スタイル
-    jp_style = ParagraphStyle(
-        'Japanese',
-        parent=styles['Normal'],
-        fontName='HeiseiKakuGo-W5',
-        fontSize=8,
-        leading=10
-    )
+    """QRコード生成（最小20mm角、PNG画像が必要な場合用）"""
+    from src.utils.qr import render_qr_png
 
-    title_style = ParagraphStyle(
-        'JapaneseTitle',
-        parent=styles['Title'],
-        fontName='HeiseiKakuGo-W5',
-        fontSize=12,
-        leading=14,
-        alignment=1  # 中央揃え
-    )
+    return BytesIO(render_qr_png(data, size_mm))
 
-    for copy_num in range(copies):
-        story = []
-
-        # タイトル
-        story.append(Paragraph("材料管理ラベル", title_style))
-        story.append(Spacer(1, 5*mm))
-
-        # QRコード
-        qr_buffer = create_qr_code(item.lot.lot_number, 18)
-        qr_image = Image(qr_buffer, width=18*mm, height=18*mm)
-
-        # QRコードとタイトルを並べて配置
-        header_table = Table([[qr_image, "LOT: " + item.lot.lot_number[:15] + ("..." if len(item.lot.lot_number) > 15 else "")]],
-                           colWidths=[20*mm, 70*mm])
-        header_table.setStyle(TableStyle([
-            ('FONT', (1, 0), (1, 0), 'HeiseiKakuGo-W5'),
-            ('FONTSIZE', (1, 0), (1, 0), 8),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('ALIGN', (1, 0), (1, 0), 'LEFT'),
-        ]))
-
-        story.append(header_table)
-        story.append(Spacer(1, 5*mm))
+def calculate_volume_per_piece_cm3(material, length_mm: int) -> float:
+    """1本あたりの体積（cm³）"""
+    length_cm = length_mm / 10
+    if material.shape.value == "round":
+        radius_cm = (material.diameter_mm / 2) / 10
+        return 3.14159 * (radius_cm ** 2) * length_cm
+    if material.shape.value == "hexagon":
+        side_cm = (material.diameter_mm / 2) / 10
+        return (3 * (3 ** 0.5) / 2) * (side_cm ** 2) * length_cm
+    if material.shape.value == "square":
+        side_cm = material.diameter_mm / 10
+        return (side_cm ** 2) * length_cm
+    return 0
 
-        # メイン情報テーブル（A6用に最適化）
-        data = [
+def label_fields(item, material, weight_per_piece_kg: float, total_weight_kg: float) -> dict:
+    """材料管理ラベルの印字内容（印刷日を除く）"""
+    return {
+        "lot_number": item.lot.lot_number,
+        "rows": [
             ["LOT", item.lot.lot_number],
             ["材質", material.display_name],
             ["形状", get_shape_name(material.shape.value)],
@@ -172,24 +153,30 @@ def create_a6_label(buffer: BytesIO, item, material, weight_per_piece_kg: float,
             ["置き場", item.location.name if item.location else "-"],
             ["仕入先", item.lot.supplier or "-"],
             ["入荷日", item.lot.received_date.strftime("%Y/%m/%d") if item.lot.received_date else "-"],
-            ["印刷日", datetime.now().strftime("%m/%d %H:%M")]
-        ]
-
-        table = Table(data, colWidths=[20*mm, 70*mm])
-        table.setStyle(TableStyle([
-            ('FONT', (0, 0), (-1, -1), 'HeiseiKakuGo-W5'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-        ]))
-
-        story.append(table)
+        ],
+    }
 
-        if copy_num < copies - 1:
-            story.append(Spacer(1, 10*mm))
+def lot_tag_fields(lot, material) -> dict:
+    """現品票の印字内容（印刷日を除く）"""
+    weight_per_piece_kg = (calculate_volume_per_piece_cm3(material, lot.length_mm) * material.current_density) / 1000
+    shape_name = get_shape_name(material.shape.value)
 
-    doc.build(story)
+    return {
+        "lot_number": lot.lot_number,
+        "rows": [
+            ["ロット番号", lot.lot_number],
+            ["材質", material.display_name],
+            ["形状・寸法", f"{shape_name} φ{material.diameter_mm}mm" if material.shape.value == "round" else f"{shape_name} {material.diameter_mm}mm"],
+            ["長さ", f"{lot.length_mm}mm"],
+            ["数量", f"{(lot.initial_quantity or 0)}本"],
+            ["重量(初期)", f"{lot.initial_weight_kg:.3f}kg" if lot.initial_weight_kg else "-"],
+            ["単重", f"{weight_per_piece_kg:.3f}kg/本"],
+            ["仕入先", lot.supplier or "-"],
+            ["入荷日", lot.received_date.strftime("%Y/%m/%d") if lot.received_date else "-"],
+            ["作成日", lot.created_at.strftime("%m/%d %H:%M")],
+        ],
+        "notes": lot.notes,
+    }
 
 def get_shape_name(shape_value: str) -> str:
     """形状値を日本語名に変換"""
@@ -268,148 +255,119 @@ async def preview_label(lot_number: str, db: Session = Depends(get_db)):
 @router.post("/lot-tag")
 async def print_lot_tag(
     request: LotTagRequest,
+    http_request: Request,
     db: Session = Depends(get_db)
 ):
     """ロット現品票印刷（PDF生成）"""
+    lot = get_lot_for_tag(db, request.lot_id)
+    return await lot_tag_pdf_response(http_request, lot, request.copies)
+
+@router.get("/lot-tag-pdf/{lot_id}")
+async def get_lot_tag_pdf(
+    lot_id: int,
+    http_request: Request,
+    copies: int = Query(1, ge=1, le=10, description="印刷部数"),
+    db: Session = Depends(get_db)
+):
+    """現品票PDF取得（再印刷・プレビュー用。ETag/If-None-Match対応）"""
+    lot = get_lot_for_tag(db, lot_id)
+    return await lot_tag_pdf_response(http_request, lot, copies)
 
-    # ロット情報取得
+def get_lot_for_tag(db: Session, lot_id: int) -> Lot:
+    """現品票印刷対象のロット取得"""
     lot = db.query(Lot).options(
         joinedload(Lot.material)
-    ).filter(Lot.id == request.lot_id).first()
+    ).filter(Lot.id == lot_id).first()
 
     if not lot:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="指定されたロットが見つかりません"
         )
+    return lot
 
-    material = lot.material
-
-    # PDFバッファ作成
-    buffer = BytesIO()
-
-    # A6現品票作成
-    create_a6_lot_tag(buffer, lot, material, request.copies)
+async def lot_tag_pdf_response(http_request: Request, lot: Lot, copies: int) -> Response:
+    """現品票PDFのレスポンス"""
+    filename = f"lot_tag_{lot.lot_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return await cached_pdf_response(
+        http_request,
+        "lot_tag",
+        [lot_tag_fields(lot, lot.material)],
+        copies,
+        filename,
+        lot_number=lot.lot_number,
+    )
 
-    buffer.seek(0)
+@router.post("/batch/")
+async def print_batch(
+    request: BatchLabelRequest,
+    http_request: Request,
+    db: Session = Depends(get_db)
+):
+    """現品票/ラベルの一括印刷（発注・ロットID・入荷日範囲で指定し、1つのPDFにまとめる）"""
 
-    # ファイル名をURLエンコード（日本語対応）
-    filename = f"lot_tag_{lot.lot_number}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-    filename_encoded = quote(filename)
+    if request.purchase_order_id is None and not request.lot_ids and not (request.received_from or request.received_to):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="発注ID・ロットID・入荷日範囲のいずれかを指定してください"
+        )
 
-    # PDFレスポンス
-    response = Response(
-        content=buffer.getvalue(),
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename*=UTF-8''{filename_encoded}"
-        }
-    )
+    # ロット・材質（ラベルの場合はアイテム・置き場も）を1クエリで取得
+    if request.kind == "label":
+        query = db.query(Item).join(Item.lot).join(Lot.material).outerjoin(Item.location).options(
+            contains_eager(Item.lot).contains_eager(Lot.material),
+            contains_eager(Item.location)
+        ).filter(Item.is_active == True)
+    else:
+        query = db.query(Lot).join(Lot.material).options(contains_eager(Lot.material))
 
-    return response
+    if request.purchase_order_id is not None:
+        query = query.join(PurchaseOrderItem, Lot.purchase_order_item_id == PurchaseOrderItem.id).filter(
+            PurchaseOrderItem.purchase_order_id == request.purchase_order_id
+        )
+    if request.lot_ids:
+        query = query.filter(Lot.id.in_(request.lot_ids))
+    if request.received_from:
+        query = query.filter(Lot.received_date >= datetime.combine(request.received_from, datetime.min.time()))
+    if request.received_to:
+        query = query.filter(Lot.received_date <= datetime.combine(request.received_to, datetime.max.time()))
 
-def create_a6_lot_tag(buffer: BytesIO, lot, material, copies: int):
-    """A6現品票作成"""
-    doc = SimpleDocTemplate(buffer, pagesize=A6, topMargin=5*mm, bottomMargin=5*mm, leftMargin=5*mm, rightMargin=5*mm)
-    styles = getSampleStyleSheet()
+    rows = query.order_by(Lot.received_date, Lot.id).limit(BATCH_MAX_LOTS + 1).all()
 
-    # 日本語対応スタイル
-    jp_style = ParagraphStyle(
-        'Japanese',
-        parent=styles['Normal'],
-        fontName='HeiseiKakuGo-W5',
-        fontSize=8,
-        leading=10
-    )
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="条件に一致するロットが見つかりません"
+        )
+    if len(rows) > BATCH_MAX_LOTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"一括印刷は{BATCH_MAX_LOTS}ロットまでです。条件を絞り込んでください"
+        )
 
-    title_style = ParagraphStyle(
-        'JapaneseTitle',
-        parent=styles['Title'],
-        fontName='HeiseiKakuGo-W5',
-        fontSize=14,
-        leading=16,
-        alignment=1  # 中央揃え
+    if request.kind == "label":
+        entries = []
+        for item in rows:
+            material = item.lot.material
+            weight_per_piece_kg = (calculate_volume_per_piece_cm3(material, item.lot.length_mm) * material.current_density) / 1000
+            entries.append(label_fields(item, material, weight_per_piece_kg, weight_per_piece_kg * item.current_quantity))
+    else:
+        entries = [lot_tag_fields(lot, lot.material) for lot in rows]
+
+    filename = f"{request.kind}_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+    return await cached_pdf_response(
+        http_request,
+        request.kind,
+        entries,
+        request.copies,
+        filename,
+        headers={"X-Label-Count": str(len(rows))},
     )
 
-    for copy_num in range(copies):
-        story = []
-
-        # タイトル
-        story.append(Paragraph("現品票", title_style))
-        story.append(Spacer(1, 8*mm))
-
-        # QRコード（ロット番号をエンコード）
-        qr_buffer = create_qr_code(lot.lot_number, 20)
-        qr_image = Image(qr_buffer, width=20*mm, height=20*mm)
-
-        # QRコードとタイトルを並べて配置
-        header_table = Table([[qr_image, "LOT: " + lot.lot_number[:15] + ("..." if len(lot.lot_number) > 15 else "")]],
-                           colWidths=[22*mm, 68*mm])
-        header_table.setStyle(TableStyle([
-            ('FONT', (1, 0), (1, 0), 'HeiseiKakuGo-W5'),
-            ('FONTSIZE', (1, 0), (1, 0), 8),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('ALIGN', (1, 0), (1, 0), 'LEFT'),
-        ]))
-
-        story.append(header_table)
-        story.append(Spacer(1, 5*mm))
-
-        # 重量計算（1本あたり）
-        if material.shape.value == "round":
-            radius_cm = (material.diameter_mm / 2) / 10
-            length_cm = lot.length_mm / 10
-            volume_cm3 = 3.14159 * (radius_cm ** 2) * length_cm
-        elif material.shape.value == "hexagon":
-            side_cm = (material.diameter_mm / 2) / 10
-            length_cm = lot.length_mm / 10
-            volume_cm3 = (3 * (3 ** 0.5) / 2) * (side_cm ** 2) * length_cm
-        elif material.shape.value == "square":
-            side_cm = material.diameter_mm / 10
-            length_cm = lot.length_mm / 10
-            volume_cm3 = (side_cm ** 2) * length_cm
-        else:
-            volume_cm3 = 0
-
-        weight_per_piece_kg = (volume_cm3 * material.current_density) / 1000
-
-        # メイン情報テーブル（A6用に最適化）
-        data = [
-            ["ロット番号", lot.lot_number],
-            ["材質", material.display_name],
-            ["形状・寸法", f"{get_shape_name(material.shape.value)} φ{material.diameter_mm}mm" if material.shape.value == "round" else f"{get_shape_name(material.shape.value)} {material.diameter_mm}mm"],
-            ["長さ", f"{lot.length_mm}mm"],
-            ["数量", f"{(lot.initial_quantity or 0)}本"],
-            ["重量(初期)", f"{lot.initial_weight_kg:.3f}kg" if lot.initial_weight_kg else "-"],
-            ["単重", f"{weight_per_piece_kg:.3f}kg/本"],
-            ["仕入先", lot.supplier or "-"],
-            ["入荷日", lot.received_date.strftime("%Y/%m/%d") if lot.received_date else "-"],
-            ["作成日", lot.created_at.strftime("%m/%d %H:%M")],
-            ["印刷日", datetime.now().strftime("%m/%d %H:%M")]
-        ]
-
-        table = Table(data, colWidths=[25*mm, 65*mm])
-        table.setStyle(TableStyle([
-            ('FONT', (0, 0), (-1, -1), 'HeiseiKakuGo-W5'),
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.lightgrey])
-        ]))
-
-        story.append(table)
-        story.append(Spacer(1, 5*mm))
-
-        # 備考欄
-        if lot.notes:
-            story.append(Paragraph("備考:", jp_style))
-            story.append(Paragraph(lot.notes, jp_style))
-
-        if copy_num < copies - 1:
-            story.append(Spacer(1, 10*mm))
-
-    doc.build(story)
+@router.get("/render-stats/")
+async def label_render_stats():
+    """ラベルPDF生成の処理状況（件数・所要時間・待ち件数・キャッシュ）"""
+    return {**get_render_stats(), "cache": label_cache.cache_stats}
 
 @router.get("/lot-preview/{lot_id}")
 async def preview_lot_tag(lot_id: int, db: Session = Depends(get_db)):
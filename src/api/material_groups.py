@@ -4,7 +4,8 @@ from typing import List, Optional
 from sqlalchemy.orm import Session, joinedload
 
 from src.db import get_db
-from src.db.models import MaterialGroup, MaterialGroupMember, Material
+from src.db.models import MaterialGroup, MaterialGroupMember, Material, ReorderPoint
+from src.utils import low_stock
 
 router = APIRouter(prefix="/api/material-groups", tags=["material-groups"])
 
@@ -103,8 +104,10 @@ async def delete_group(group_id: int, db: Session = Depends(get_db)):
     group = db.query(MaterialGroup).filter(MaterialGroup.id == group_id).first()
     if not group:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="グループが見つかりません")
+    db.query(ReorderPoint).filter(ReorderPoint.group_id == group_id).delete(synchronize_session=False)
     db.delete(group)
     db.commit()
+    low_stock.invalidate()
     return None
 
 
@@ -144,6 +147,7 @@ async def add_group_member(group_id: int, payload: GroupMemberAdd, db: Session =
     db.add(membership)
     db.commit()
     db.refresh(membership)
+    low_stock.invalidate()
     return membership
 
 
@@ -158,6 +162,7 @@ async def remove_group_member(group_id: int, member_id: int, db: Session = Depen
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="所属が見つかりません")
     db.delete(membership)
     db.commit()
+    low_stock.invalidate()
     return None
 
 
@@ -172,4 +177,5 @@ async def remove_group_member(group_id: int, material_id: int, db: Session = Dep
 
     db.delete(membership)
     db.commit()
+    low_stock.invalidate()
     return None
\ No newline at end of file
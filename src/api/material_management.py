@@ -9,15 +9,17 @@ import re
 from collections import defaultdict
 from datetime import date, datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
-import pandas as pd
 from fastapi import APIRouter, HTTPException
 from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 from src.config import settings
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/material-management", tags=["材料管理"])
@@ -72,6 +74,8 @@ def _format_date(value) -> Optional[str]:
         return None
     if isinstance(value, (datetime, date)):
         return value.strftime("%Y-%m-%d")
+    import pandas as pd
+
     try:
         parsed = pd.to_datetime(value)
     except Exception:
@@ -120,6 +124,8 @@ def _get_row_value(row: pd.Series, field: str):
 
 
 def _load_material_plan() -> List[MaterialUsageSummary]:
+    import pandas as pd
+
     excel_path = Path(settings.production_schedule_path)
     if not excel_path.exists():
         raise FileNotFoundError(f"指定のExcelファイルが存在しません: {excel_path}")
@@ -11,6 +11,7 @@ from src.db import get_db
 from src.db.models import (
     Material, MaterialShape, MaterialAlias, Lot
 )
+from src.utils import low_stock, reorder, scan_cache
 
 router = APIRouter()
 
@@ -175,6 +176,9 @@ async def update_material(
 
     db.commit()
     db.refresh(db_material)
+    scan_cache.invalidate()
+    low_stock.invalidate()
+    reorder.invalidate()
     return db_material
 
 @router.delete("/{material_id}")
@@ -189,6 +193,9 @@ async def delete_material(material_id: int, db: Session = Depends(get_db)):
 
     db_material.is_active = False
     db.commit()
+    scan_cache.invalidate()
+    low_stock.invalidate()
+    reorder.invalidate()
 
     return {"message": "材料を無効化しました"}
 
@@ -305,11 +312,8 @@ async def search_materials(
 
     # 在庫あり材料のみに絞る場合のサブクエリ
     if in_stock_only:
-        from src.db.models import Item, Lot
-        stock_mat_ids = db.query(Lot.material_id).join(Item, Item.lot_id == Lot.id).filter(
-            Item.is_active == True,
-            Item.current_quantity > 0
-        ).distinct()
+        from src.db.models import MaterialStock
+        stock_mat_ids = db.query(MaterialStock.material_id).filter(MaterialStock.total_quantity > 0)
         base_query = base_query.filter(Material.id.in_(stock_mat_ids))
 
     materials = base_query.filter(
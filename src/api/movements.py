@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import desc
-from typing import List, Optional
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field, ConfigDict, field_validator, model_validator
 from datetime import datetime
 import math
+from collections import defaultdict
 from decimal import Decimal, ROUND_HALF_UP, ROUND_FLOOR
 
 from src.db import get_db
@@ -15,9 +16,10 @@ from src.db.models import (
     Material,
     Location,
     MovementType,
-    AuditLog,
     MaterialShape,
 )
+from src.utils import audit, idempotency, material_stock, stock_events
+from src.utils.stock import InsufficientStockError, adjust_item_quantity
 
 router = APIRouter()
 
@@ -42,6 +44,14 @@ def _calculate_weight_per_piece_kg(item: Item) -> float:
     return (volume_cm3 * material.current_density) / 1000
 
 
+def _item_weight_per_piece_kg(item: Item) -> float:
+    """1本あたり重量(kg)（ロットの初期重量があれば優先）"""
+    lot = item.lot
+    if lot.initial_weight_kg and lot.initial_quantity and lot.initial_quantity > 0:
+        return lot.initial_weight_kg / lot.initial_quantity
+    return _calculate_weight_per_piece_kg(item)
+
+
 def _resolve_quantity_from_weight(weight_kg: float, weight_per_piece_kg: float) -> int:
     """重量から本数を切り捨てで算出"""
     if weight_per_piece_kg <= 0:
@@ -75,6 +85,16 @@ class MovementOut(MovementBase):
     """出庫用"""
     pass
 
+class MovementBatchLine(MovementBase):
+    """一括入出庫の1行"""
+    item_id: int = Field(..., description="アイテムID")
+
+class MovementBatchRequest(BaseModel):
+    """一括入出庫リクエスト（段取り時の複数ロット持ち出しなど）"""
+    movement_type: MovementType = Field(MovementType.OUT, description="入出庫種別")
+    lines: List[MovementBatchLine] = Field(..., min_length=1, description="明細")
+    all_or_nothing: bool = Field(False, description="1行でも失敗したら全行を登録しない")
+
 class RelocationRequest(BaseModel):
     """置き場変更リクエスト"""
     location_id: int = Field(..., description="新しい置き場ID")
@@ -135,11 +155,7 @@ async def get_movements(
     # レスポンス用に関連情報を追加
     result = []
     for movement in movements:
-        lot = movement.item.lot
-        if lot.initial_weight_kg and lot.initial_quantity and lot.initial_quantity > 0:
-            weight_per_piece = lot.initial_weight_kg / lot.initial_quantity
-        else:
-            weight_per_piece = _calculate_weight_per_piece_kg(movement.item)
+        weight_per_piece = _item_weight_per_piece_kg(movement.item)
         weight_kg = round(weight_per_piece * movement.quantity, 3)
 
         movement_dict = {
@@ -159,12 +175,7 @@ async def get_movements(
 
     return result
 
-@router.post("/in/{item_id}")
-async def create_in_movement(
-    item_id: int,
-    movement_data: MovementIn,
-    db: Session = Depends(get_db)
-):
+def _create_in_movement(db: Session, item_id: int, movement_data: MovementIn) -> dict:
     """入庫処理"""
     # アイテム存在確認
     item = db.query(Item).filter(Item.id == item_id).first()
@@ -181,11 +192,7 @@ async def create_in_movement(
             detail="無効なアイテムには入庫できません"
         )
 
-    lot = item.lot
-    if lot.initial_weight_kg and lot.initial_quantity and lot.initial_quantity > 0:
-        weight_per_piece = lot.initial_weight_kg / lot.initial_quantity
-    else:
-        weight_per_piece = _calculate_weight_per_piece_kg(item)
+    weight_per_piece = _item_weight_per_piece_kg(item)
     resolved_quantity = movement_data.quantity
     input_weight = movement_data.weight_kg
 
@@ -214,11 +221,8 @@ async def create_in_movement(
     weight_difference = round(calculated_weight - raw_input_weight, 3)
     normalized_input_weight = round(raw_input_weight, 3)
 
-    # 入庫前の数量を記録
-    old_quantity = item.current_quantity
-
-    # アイテムの数量を増加
-    item.current_quantity += resolved_quantity
+    # アイテムの数量を増加（UPDATE 1文で加算し、変更前後の数量を取得）
+    old_quantity, _ = adjust_item_quantity(db, item, resolved_quantity)
 
     # 入庫履歴を作成
     movement = Movement(
@@ -230,21 +234,19 @@ async def create_in_movement(
     )
 
     db.add(movement)
-
-    # 監査ログを作成
-    audit_log = AuditLog(
-        user_id=1,  # TODO: 認証実装後にユーザーIDを設定
-        action="入庫",
-        target_table="items",
-        target_id=item_id,
-        old_values=f"数量: {old_quantity}",
-        new_values=f"数量: {item.current_quantity}, 入庫本数: {resolved_quantity}, 入庫重量: {calculated_weight}kg",
-        created_at=datetime.now()
-    )
-
-    db.add(audit_log)
     db.commit()
     db.refresh(movement)
+    audit.record(
+        "入庫", "items", item_id,
+        old_values={"quantity": old_quantity},
+        new_values={
+            "quantity": item.current_quantity,
+            "movement_id": movement.id,
+            "in_quantity": resolved_quantity,
+            "weight_kg": calculated_weight,
+        },
+    )
+    stock_events.publish_item_change("in", item, movement_id=movement.id, quantity=resolved_quantity)
 
     return {
         "message": "入庫処理が完了しました",
@@ -258,12 +260,21 @@ async def create_in_movement(
         "weight_difference_kg": weight_difference
     }
 
-@router.post("/out/{item_id}")
-async def create_out_movement(
+@router.post("/in/{item_id}")
+async def create_in_movement(
     item_id: int,
-    movement_data: MovementOut,
+    movement_data: MovementIn,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db)
 ):
+    """入庫処理（Idempotency-Key 付きの再送は初回の結果を返す）"""
+    result, replayed = idempotency.execute(
+        db, idempotency_key, f"in:{item_id}", movement_data.model_dump(),
+        lambda: _create_in_movement(db, item_id, movement_data)
+    )
+    return idempotency.to_response(result, replayed)
+
+def _create_out_movement(db: Session, item_id: int, movement_data: MovementOut) -> dict:
     """出庫処理"""
     # アイテム存在確認
     item = db.query(Item).filter(Item.id == item_id).first()
@@ -279,11 +290,7 @@ async def create_out_movement(
             detail="無効なアイテムからは出庫できません"
         )
 
-    lot = item.lot
-    if lot.initial_weight_kg and lot.initial_quantity and lot.initial_quantity > 0:
-        weight_per_piece = lot.initial_weight_kg / lot.initial_quantity
-    else:
-        weight_per_piece = _calculate_weight_per_piece_kg(item)
+    weight_per_piece = _item_weight_per_piece_kg(item)
     resolved_quantity = movement_data.quantity
     input_weight = movement_data.weight_kg
 
@@ -307,22 +314,19 @@ async def create_out_movement(
             detail="数量は1以上で入力してください"
         )
 
-    if item.current_quantity < resolved_quantity:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"在庫が不足しています。現在庫: {item.current_quantity}本, 出庫要求: {resolved_quantity}本"
-        )
-
     calculated_weight = round(resolved_quantity * weight_per_piece, 3)
     raw_input_weight = input_weight if input_weight is not None else calculated_weight
     weight_difference = round(calculated_weight - raw_input_weight, 3)
     normalized_input_weight = round(raw_input_weight, 3)
 
-    # 出庫前の数量を記録
-    old_quantity = item.current_quantity
-
-    # アイテムの数量を減少
-    item.current_quantity -= resolved_quantity
+    # アイテムの数量を減少（在庫が足りる場合のみ UPDATE 1文で減算）
+    try:
+        old_quantity, _ = adjust_item_quantity(db, item, -resolved_quantity)
+    except InsufficientStockError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"在庫が不足しています。現在庫: {exc.current_quantity}本, 出庫要求: {resolved_quantity}本"
+        )
 
     # 出庫履歴を作成
     movement = Movement(
@@ -334,21 +338,19 @@ async def create_out_movement(
     )
 
     db.add(movement)
-
-    # 監査ログを作成
-    audit_log = AuditLog(
-        user_id=1,  # TODO: 認証実装後にユーザーIDを設定
-        action="出庫",
-        target_table="items",
-        target_id=item_id,
-        old_values=f"数量: {old_quantity}",
-        new_values=f"数量: {item.current_quantity}, 出庫本数: {resolved_quantity}, 出庫重量: {calculated_weight}kg",
-        created_at=datetime.now()
-    )
-
-    db.add(audit_log)
     db.commit()
     db.refresh(movement)
+    audit.record(
+        "出庫", "items", item_id,
+        old_values={"quantity": old_quantity},
+        new_values={
+            "quantity": item.current_quantity,
+            "movement_id": movement.id,
+            "out_quantity": resolved_quantity,
+            "weight_kg": calculated_weight,
+        },
+    )
+    stock_events.publish_item_change("out", item, movement_id=movement.id, quantity=resolved_quantity)
 
     return {
         "message": "出庫処理が完了しました",
@@ -362,6 +364,227 @@ async def create_out_movement(
         "weight_difference_kg": weight_difference
     }
 
+@router.post("/out/{item_id}")
+async def create_out_movement(
+    item_id: int,
+    movement_data: MovementOut,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db)
+):
+    """出庫処理（Idempotency-Key 付きの再送は初回の結果を返す）"""
+    result, replayed = idempotency.execute(
+        db, idempotency_key, f"out:{item_id}", movement_data.model_dump(),
+        lambda: _create_out_movement(db, item_id, movement_data)
+    )
+    return idempotency.to_response(result, replayed)
+
+BATCH_MAX_LINES = 100
+
+
+def _create_batch_movements(db: Session, batch: MovementBatchRequest) -> dict:
+    """一括入出庫（対象アイテムを1クエリで行ロック付き取得し、1トランザクションで登録）
+
+    行ごとに成功・失敗を返す。all_or_nothing=true の場合は1行でも失敗すると何も登録しない。
+    """
+    if len(batch.lines) > BATCH_MAX_LINES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"一括登録は{BATCH_MAX_LINES}行までです"
+        )
+
+    is_out = batch.movement_type == MovementType.OUT
+    label = "出庫" if is_out else "入庫"
+
+    # ID順に行ロックを取る（ロック順を揃えて他の一括処理とのデッドロックを防ぐ）
+    item_ids = sorted({line.item_id for line in batch.lines})
+    items = {
+        item.id: item
+        for item in db.query(Item).options(
+            joinedload(Item.lot).joinedload(Lot.material),
+            joinedload(Item.location)
+        ).filter(Item.id.in_(item_ids)).order_by(Item.id).with_for_update().all()
+    }
+
+    # 在庫チェック（同じアイテムが複数行にある場合は累計で判定）
+    results = []
+    accepted = []
+    running_quantity = {item_id: item.current_quantity for item_id, item in items.items()}
+
+    for index, line in enumerate(batch.lines):
+        result = {"index": index, "item_id": line.item_id}
+        results.append(result)
+
+        item = items.get(line.item_id)
+        if not item:
+            result.update(status="error", detail="指定されたアイテムが見つかりません")
+            continue
+        if not item.is_active:
+            result.update(status="error", detail=f"無効なアイテムには{label}できません")
+            continue
+
+        weight_per_piece = _item_weight_per_piece_kg(item)
+        quantity = line.quantity
+        if quantity is None:
+            try:
+                quantity = _resolve_quantity_from_weight(line.weight_kg, weight_per_piece)
+            except ValueError as exc:
+                result.update(status="error", detail=str(exc))
+                continue
+
+        old_quantity = running_quantity[item.id]
+        if is_out and old_quantity < quantity:
+            result.update(
+                status="error",
+                detail=f"在庫が不足しています。現在庫: {old_quantity}本, 出庫要求: {quantity}本"
+            )
+            continue
+
+        new_quantity = old_quantity - quantity if is_out else old_quantity + quantity
+        running_quantity[item.id] = new_quantity
+        result.update(
+            status="ok",
+            lot_number=item.lot.lot_number,
+            quantity=quantity,
+            old_quantity=old_quantity,
+            new_quantity=new_quantity,
+            calculated_weight_kg=round(quantity * weight_per_piece, 3),
+        )
+        accepted.append((result, line, item))
+
+    failed = len(results) - len(accepted)
+    if not accepted or (batch.all_or_nothing and failed):
+        db.rollback()
+        for result, _, _ in accepted:
+            result.update(status="skipped", detail="他の行にエラーがあるため登録されませんでした")
+        return {
+            "message": f"一括{label}は登録されませんでした",
+            "committed": False,
+            "succeeded": 0,
+            "failed": failed,
+            "results": results,
+        }
+
+    # ロック済みの行なので、累計後の在庫数をそのまま書き込む
+    for item_id, quantity in running_quantity.items():
+        material_stock.apply_quantity_change(db, items[item_id], items[item_id].current_quantity, quantity)
+        items[item_id].current_quantity = quantity
+
+    movements = [
+        Movement(
+            item_id=item.id,
+            movement_type=batch.movement_type,
+            quantity=result["quantity"],
+            notes=line.notes,
+            processed_by=1  # TODO: 認証実装後にユーザーIDを設定
+        )
+        for result, line, item in accepted
+    ]
+    db.add_all(movements)
+    db.flush()
+
+    movement_ids = defaultdict(list)
+    for movement, (result, line, item) in zip(movements, accepted):
+        result["movement_id"] = movement.id
+        movement_ids[item.id].append(movement.id)
+    db.commit()
+
+    for result, line, item in accepted:
+        audit.record(
+            label, "items", item.id,
+            old_values={"quantity": result["old_quantity"]},
+            new_values={
+                "quantity": result["new_quantity"],
+                "movement_id": result["movement_id"],
+                f"{batch.movement_type.value}_quantity": result["quantity"],
+                "weight_kg": result["calculated_weight_kg"],
+                "batch": True,
+            },
+        )
+
+    for item_id, ids in movement_ids.items():
+        stock_events.publish_item_change(batch.movement_type.value, items[item_id], movement_ids=ids)
+
+    return {
+        "message": f"一括{label}が完了しました",
+        "committed": True,
+        "succeeded": len(accepted),
+        "failed": failed,
+        "results": results,
+    }
+
+@router.post("/batch/")
+async def create_batch_movements(
+    batch: MovementBatchRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db)
+):
+    """一括入出庫（Idempotency-Key 付きの再送は初回の結果を返す）"""
+    result, replayed = idempotency.execute(
+        db, idempotency_key, "batch", batch.model_dump(),
+        lambda: _create_batch_movements(db, batch)
+    )
+    return idempotency.to_response(result, replayed)
+
+REPLAY_MAX_OPERATIONS = 200
+
+
+class ReplayOperation(MovementBase):
+    """オフライン中に端末で保留していた入出庫1件"""
+    idempotency_key: str = Field(..., min_length=1, max_length=idempotency.MAX_KEY_LENGTH, description="端末で採番したキー")
+    kind: Literal["in", "out"] = Field(..., description="in=入庫, out=出庫")
+    item_id: int = Field(..., description="アイテムID")
+
+
+@router.post("/replay/")
+async def replay_movements(
+    operations: List[ReplayOperation],
+    db: Session = Depends(get_db)
+):
+    """保留中の入出庫をまとめて送信（端末の再接続時に使用）
+
+    送信順に1件ずつ処理し、各操作のステータスを返す。処理済みのキーは初回の結果を返すため、
+    同じ一覧を何度送っても二重登録されない。
+    """
+    if len(operations) > REPLAY_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"一度に送信できるのは{REPLAY_MAX_OPERATIONS}件までです"
+        )
+
+    results = []
+    for operation in operations:
+        movement_data = MovementBase(
+            quantity=operation.quantity,
+            weight_kg=operation.weight_kg,
+            notes=operation.notes,
+        )
+        handler = _create_in_movement if operation.kind == "in" else _create_out_movement
+        try:
+            body, replayed = idempotency.execute(
+                db, operation.idempotency_key, f"{operation.kind}:{operation.item_id}",
+                movement_data.model_dump(),
+                lambda: handler(db, operation.item_id, movement_data)
+            )
+            results.append({
+                "idempotency_key": operation.idempotency_key,
+                "status_code": status.HTTP_200_OK,
+                "replayed": replayed,
+                "body": body,
+            })
+        except HTTPException as exc:
+            results.append({
+                "idempotency_key": operation.idempotency_key,
+                "status_code": exc.status_code,
+                "replayed": False,
+                "detail": exc.detail,
+            })
+
+    return {
+        "succeeded": sum(1 for result in results if result["status_code"] == status.HTTP_200_OK),
+        "failed": sum(1 for result in results if result["status_code"] != status.HTTP_200_OK),
+        "results": results,
+    }
+
 @router.put("/relocate/{item_id}")
 async def relocate_item(
     item_id: int,
@@ -401,21 +624,16 @@ async def relocate_item(
 
     # 置き場を更新
     item.location_id = relocation_data.location_id
+    material_stock.apply_relocation(db, item)
 
-    # 監査ログを作成
-    audit_log = AuditLog(
-        user_id=1,  # TODO: 認証実装後にユーザーIDを設定
-        action="置き場変更",
-        target_table="items",
-        target_id=item_id,
-        old_values=f"置き場: {old_location_name}",
-        new_values=f"置き場: {new_location.name}, 備考: {relocation_data.notes or 'なし'}",
-        created_at=datetime.now()
-    )
-
-    db.add(audit_log)
     db.commit()
     db.refresh(item)
+    audit.record(
+        "置き場変更", "items", item_id,
+        old_values={"location_id": old_location_id, "location": old_location_name},
+        new_values={"location_id": new_location.id, "location": new_location.name, "notes": relocation_data.notes},
+    )
+    stock_events.publish_item_change("relocate", item, old_location_id=old_location_id)
 
     return {
         "message": "置き場を変更しました",
@@ -444,9 +662,7 @@ async def update_movement(
 ):
     """入出庫履歴の編集（数量・重量・備考を更新し、在庫数も再計算）"""
     # 履歴取得
-    movement = db.query(Movement).options(
-        joinedload(Movement.item).joinedload(Item.lot).joinedload(Lot.material)
-    ).filter(Movement.id == movement_id).first()
+    movement = db.query(Movement).filter(Movement.id == movement_id).first()
 
     if not movement:
         raise HTTPException(
@@ -457,11 +673,7 @@ async def update_movement(
     item = movement.item
 
     # 重量計算
-    lot = item.lot
-    if lot.initial_weight_kg and lot.initial_quantity and lot.initial_quantity > 0:
-        weight_per_piece = lot.initial_weight_kg / lot.initial_quantity
-    else:
-        weight_per_piece = _calculate_weight_per_piece_kg(item)
+    weight_per_piece = _item_weight_per_piece_kg(item)
 
     # 新しい数量を決定
     new_quantity = movement_data.quantity
@@ -487,29 +699,26 @@ async def update_movement(
             detail="数量は1以上で入力してください"
         )
 
+    # 同じ履歴の同時編集・削除を防ぐため行ロックを取り、最新の数量で差分を計算
+    db.refresh(movement, with_for_update=True)
+
     # 旧数量を記録
     old_quantity = movement.quantity
     quantity_diff = new_quantity - old_quantity
 
     # 在庫数を調整（出庫なら減算、入庫なら加算）
-    if movement.movement_type == MovementType.OUT:
-        # 出庫の場合: 新しい数量に応じて在庫を調整
-        # 例: 旧10本出庫 → 新15本出庫 なら、さらに5本減らす
-        new_current_quantity = item.current_quantity - quantity_diff
-
-        if new_current_quantity < 0:
+    # 例: 旧10本出庫 → 新15本出庫 なら、さらに5本減らす
+    stock_delta = -quantity_diff if movement.movement_type == MovementType.OUT else quantity_diff
+    old_item_quantity = item.current_quantity
+    if stock_delta:
+        try:
+            old_item_quantity, _ = adjust_item_quantity(db, item, stock_delta)
+        except InsufficientStockError as exc:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"在庫が不足しています。現在庫: {item.current_quantity}本, 追加出庫: {quantity_diff}本"
+                detail=f"在庫が不足しています。現在庫: {exc.current_quantity}本, 減算: {exc.requested}本"
             )
 
-        item.current_quantity = new_current_quantity
-
-    elif movement.movement_type == MovementType.IN:
-        # 入庫の場合: 新しい数量に応じて在庫を調整
-        # 例: 旧10本入庫 → 新15本入庫 なら、さらに5本増やす
-        item.current_quantity += quantity_diff
-
     # 履歴を更新
     movement.quantity = new_quantity
     if movement_data.notes is not None:
@@ -517,20 +726,14 @@ async def update_movement(
 
     calculated_weight = round(new_quantity * weight_per_piece, 3)
 
-    # 監査ログを記録
-    audit_log = AuditLog(
-        user_id=1,  # TODO: 認証実装後にユーザーIDを設定
-        action="入出庫履歴編集",
-        target_table="movements",
-        target_id=movement_id,
-        old_values=f"数量: {old_quantity}, 在庫: {item.current_quantity + (old_quantity if movement.movement_type == MovementType.OUT else -old_quantity)}",
-        new_values=f"数量: {new_quantity}, 在庫: {item.current_quantity}, 備考: {movement_data.notes or 'なし'}",
-        created_at=datetime.now()
-    )
-
-    db.add(audit_log)
     db.commit()
     db.refresh(movement)
+    audit.record(
+        "入出庫履歴編集", "movements", movement_id,
+        old_values={"quantity": old_quantity, "item_quantity": old_item_quantity},
+        new_values={"quantity": new_quantity, "item_quantity": item.current_quantity, "notes": movement_data.notes},
+    )
+    stock_events.publish_item_change("movement_update", item, movement_id=movement.id)
 
     return {
         "message": "入出庫履歴を更新しました",
@@ -548,10 +751,8 @@ async def delete_movement(
     db: Session = Depends(get_db)
 ):
     """入出庫履歴の削除（在庫数を巻き戻し）"""
-    # 履歴取得
-    movement = db.query(Movement).options(
-        joinedload(Movement.item).joinedload(Item.lot).joinedload(Lot.material)
-    ).filter(Movement.id == movement_id).first()
+    # 履歴取得（同じ履歴の二重削除で在庫が二重に戻らないよう行ロック）
+    movement = db.query(Movement).filter(Movement.id == movement_id).with_for_update().first()
 
     if not movement:
         raise HTTPException(
@@ -561,41 +762,27 @@ async def delete_movement(
 
     item = movement.item
     old_quantity = movement.quantity
-    old_item_quantity = item.current_quantity
-
-    # 在庫を巻き戻し
-    if movement.movement_type == MovementType.OUT:
-        # 出庫を削除 → 在庫を戻す
-        item.current_quantity += old_quantity
 
-    elif movement.movement_type == MovementType.IN:
-        # 入庫を削除 → 在庫を減らす
-        new_current_quantity = item.current_quantity - old_quantity
-
-        if new_current_quantity < 0:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"在庫がマイナスになるため削除できません。現在庫: {item.current_quantity}本, 削除する入庫: {old_quantity}本"
-            )
-
-        item.current_quantity = new_current_quantity
-
-    # 監査ログを記録
-    audit_log = AuditLog(
-        user_id=1,  # TODO: 認証実装後にユーザーIDを設定
-        action="入出庫履歴削除",
-        target_table="movements",
-        target_id=movement_id,
-        old_values=f"種別: {movement.movement_type.value}, 数量: {old_quantity}, 在庫: {old_item_quantity}",
-        new_values=f"在庫: {item.current_quantity}（履歴削除により巻き戻し）",
-        created_at=datetime.now()
-    )
-
-    db.add(audit_log)
+    # 在庫を巻き戻し（出庫の削除は在庫を戻し、入庫の削除は在庫を減らす）
+    stock_delta = old_quantity if movement.movement_type == MovementType.OUT else -old_quantity
+    try:
+        old_item_quantity, _ = adjust_item_quantity(db, item, stock_delta)
+    except InsufficientStockError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"在庫がマイナスになるため削除できません。現在庫: {exc.current_quantity}本, 削除する入庫: {old_quantity}本"
+        )
 
     # 履歴を削除
+    movement_type = movement.movement_type
     db.delete(movement)
     db.commit()
+    audit.record(
+        "入出庫履歴削除", "movements", movement_id,
+        old_values={"movement_type": movement_type, "quantity": old_quantity, "item_quantity": old_item_quantity},
+        new_values={"item_quantity": item.current_quantity, "reverted": True},
+    )
+    stock_events.publish_item_change("movement_delete", item, movement_id=movement_id)
 
     return {
         "message": "入出庫履歴を削除しました",
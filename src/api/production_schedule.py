@@ -8,10 +8,9 @@ from __future__ import annotations
 import logging
 from datetime import date, datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 
-import pandas as pd
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
@@ -19,10 +18,14 @@ from src.config import settings
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from src.db import get_db
-from src.db.models import Item, Lot, Material
+from src.db.models import Material, MaterialStock
+from src.utils import consumption
 
 from src.api.material_management import _load_material_plan, MaterialUsageSummary
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/production-schedule", tags=["生産中一覧"])
@@ -67,6 +70,8 @@ DATE_FIELDS = {
 
 
 def _format_date(value) -> Optional[str]:
+    import pandas as pd
+
     if pd.isna(value):
         return None
     if isinstance(value, (datetime, date)):
@@ -81,6 +86,8 @@ def _format_date(value) -> Optional[str]:
 
 
 def _format_text(value) -> Optional[str]:
+    import pandas as pd
+
     if value is None:
         return None
     if isinstance(value, float):
@@ -96,11 +103,15 @@ def _format_text(value) -> Optional[str]:
 
 
 def _should_skip_row(row: pd.Series) -> bool:
+    import pandas as pd
+
     core_fields = [row.get("品番"), row.get("製品名"), row.get("数量")]
     return all(pd.isna(field) or str(field).strip() == "" for field in core_fields)
 
 
 def _load_production_schedule() -> List[ProductionItem]:
+    import pandas as pd
+
     excel_path = Path(settings.production_schedule_path)
     if not excel_path.exists():
         raise FileNotFoundError(f"指定のExcelファイルが存在しません: {excel_path}")
@@ -167,31 +178,31 @@ class StockoutForecast(BaseModel):
     diameter_mm: Optional[float]
 
 
+class ConsumptionForecast(BaseModel):
+    material_id: int
+    material_name: str
+    diameter_mm: Optional[float]
+    current_stock_bars: int
+    daily_out_bars: float
+    days_of_cover: Optional[float]
+    projected_stockout_date: Optional[str]
+    last_out_date: Optional[str]
+    through_date: Optional[str]
+
+
 def _get_current_stock_bars(db: Session, display_name: Optional[str]) -> int:
     """Material.display_name（Excel仕様文字列）一致で在庫本数合計を返す"""
     if not display_name:
         return 0
 
-    materials = (
-        db.query(Material)
+    total_stock = (
+        db.query(func.coalesce(func.sum(MaterialStock.total_quantity), 0))
+        .join(Material, MaterialStock.material_id == Material.id)
         .filter(Material.display_name == display_name, Material.is_active == True)
-        .all()
+        .scalar()
     )
 
-    if not materials:
-        return 0
-
-    total_stock = 0
-    for m in materials:
-        stock = (
-            db.query(func.coalesce(func.sum(Item.current_quantity), 0))
-            .join(Lot, Item.lot_id == Lot.id)
-            .filter(Lot.material_id == m.id, Item.is_active == True)
-            .scalar()
-        )
-        total_stock += int(stock or 0)
-
-    return total_stock
+    return int(total_stock or 0)
 
 
 def _calculate_stockout_forecast(db: Session) -> List[StockoutForecast]:
@@ -217,6 +228,10 @@ def _calculate_stockout_forecast(db: Session) -> List[StockoutForecast]:
         Material.display_name.isnot(None),
     ).all()
 
+    # Excel に載っていない材料は出庫実績の消費ペースから予測する
+    consumption.update(db)
+    pace_by_material = {f["material_id"]: f for f in consumption.forecast(db)}
+
     forecasts: List[StockoutForecast] = []
     today = date.today()
 
@@ -229,12 +244,16 @@ def _calculate_stockout_forecast(db: Session) -> List[StockoutForecast]:
 
         daily = usage_by_spec.get(spec, [])
         if not daily:
+            pace = pace_by_material.get(m.id)
+            projected_date = pace["projected_stockout_date"] if pace else None
             forecasts.append(
                 StockoutForecast(
                     material_spec=spec,
                     current_stock_bars=current_stock,
-                    projected_stockout_date=None,
-                    days_until_stockout=None,
+                    projected_stockout_date=projected_date,
+                    days_until_stockout=(
+                        (date.fromisoformat(projected_date) - today).days if projected_date else None
+                    ),
                     daily_usage=[],
                     material_master_found=True,
                     material_name=m.display_name,
@@ -284,3 +303,18 @@ async def stockout_forecast(db: Session = Depends(get_db)) -> List[StockoutForec
     except Exception as exc:
         logger.exception("在庫切れ予測の計算に失敗しました")
         raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+
+@router.get("/consumption/", response_model=List[ConsumptionForecast])
+async def consumption_forecast(
+    material_id: Optional[List[int]] = Query(None, description="材料ID（複数指定可・省略時は全材料）"),
+    max_days: Optional[float] = Query(None, ge=0, description="在庫日数がこの日数以下の材料のみ"),
+    db: Session = Depends(get_db),
+) -> List[ConsumptionForecast]:
+    """材料ごとの消費ペース（日別出庫本数の指数移動平均）と在庫日数"""
+    # 前日分が未反映の場合のみ、前回以降の出庫を反映する
+    consumption.update(db)
+    results = consumption.forecast(db, material_id)
+    if max_days is not None:
+        results = [r for r in results if r["days_of_cover"] is not None and r["days_of_cover"] <= max_days]
+    return results
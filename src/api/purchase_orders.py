@@ -13,9 +13,11 @@ from src.db import get_db
 from src.db.models import (
     PurchaseOrder, PurchaseOrderItem, PurchaseOrderStatus, PurchaseOrderItemStatus,
     Material, MaterialShape, Lot, Item, Location, OrderType, User,
-    MaterialGroup, MaterialGroupMember, InspectionStatus, AuditLog, Movement
+    MaterialGroup, MaterialGroupMember, InspectionStatus, Movement
 )
 from src.utils.auth import get_password_hash
+from src.utils import audit, lead_time, material_stock, reorder, stock_events
+from src.utils.json_stream import stream_json_array, stream_query
 
 router = APIRouter()
 
@@ -119,6 +121,20 @@ class PaginatedPurchaseOrderResponse(BaseModel):
     page_size: int
     total_pages: int
 
+class SupplierLeadTimeResponse(BaseModel):
+    """仕入先別の納入リードタイム統計（material_id が NULL の行は仕入先全体）"""
+    supplier: str
+    material_id: Optional[int] = None
+    material_name: Optional[str] = None
+    sample_count: int
+    mean_days: float
+    p50_days: float
+    p90_days: float
+    due_count: int
+    on_time_count: int
+    on_time_ratio: Optional[float] = None
+    last_received_date: Optional[date] = None
+
 class PurchaseOrderUpdate(BaseModel):
     """発注ヘッダー更新用スキーマ"""
     supplier: Optional[str] = Field(None, max_length=200, description="仕入先")
@@ -213,6 +229,16 @@ async def get_purchase_orders(
         "total_pages": total_pages
     }
 
+@router.get("/lead-times/", response_model=List[SupplierLeadTimeResponse])
+async def get_supplier_lead_times(
+    supplier: Optional[str] = None,
+    material_id: Optional[int] = None,
+    include_materials: bool = True,
+    db: Session = Depends(get_db)
+):
+    """仕入先別の納入リードタイム統計（入庫登録時に更新済みの値を返す）"""
+    return lead_time.list_stats(db, supplier=supplier, material_id=material_id, include_materials=include_materials)
+
 @router.get("/{order_id}", response_model=PurchaseOrderResponse)
 async def get_purchase_order(order_id: int, db: Session = Depends(get_db)):
     """発注詳細取得"""
@@ -240,19 +266,13 @@ async def get_pending_items(db: Session = Depends(get_db)):
 
     return items
 
-@router.get("/pending-or-inspection/items/", response_model=List[PurchaseOrderItemResponse])
-async def get_pending_or_inspection_items(
-    include_inspected: bool = False,
-    db: Session = Depends(get_db)
-):
-    """入庫待ち、または検品未完了アイテム一覧取得（オプションで検品完了も含める）
+def pending_or_inspection_items_query(db: Session, include_inspected: bool = False):
+    """入庫待ち・検品未完了の発注アイテムと、最新ロットの検品ステータスを取得するクエリ
 
-    - 発注アイテムが未入庫（PENDING）のもの
-    - 入庫済み（RECEIVED）だが、紐づく最新ロットの検品が未完了（PENDING/FAILED）のもの
-    - include_inspected=true の場合、検品完了（PASSED）のものも含める
+    最新ロットの検品ステータスは相関サブクエリで求めるため、ロットのリレーションは読み込まない
+    （サーバーサイドカーソルでのストリーミング中に追加クエリを発行しないため）。
     """
-    from sqlalchemy.sql import exists
-    from src.db.models import Lot
+    from sqlalchemy.sql import exists, select
 
     lot_has_unpassed_inspection = exists().where(
         (Lot.purchase_order_item_id == PurchaseOrderItem.id) &
@@ -273,28 +293,47 @@ async def get_pending_or_inspection_items(
     if include_inspected:
         conditions.append(lot_has_passed_inspection)
 
-    items = db.query(PurchaseOrderItem).options(
-        joinedload(PurchaseOrderItem.purchase_order),
-        joinedload(PurchaseOrderItem.lots)
+    # 最新ロット（入荷日が新しい順、同日はID順。入荷日なしは最も古い扱い）
+    latest_lot_status = select(Lot.inspection_status).where(
+        Lot.purchase_order_item_id == PurchaseOrderItem.id
+    ).order_by(
+        Lot.received_date.is_(None), Lot.received_date.desc(), Lot.id.desc()
+    ).limit(1).correlate(PurchaseOrderItem).scalar_subquery()
+
+    return db.query(
+        PurchaseOrderItem, latest_lot_status.label("latest_inspection_status")
     ).filter(
         or_(*conditions)
-    ).all()
+    ).order_by(PurchaseOrderItem.id)
 
-    # 検品ステータスを各アイテムに付与（N+1問題解消）
-    result = []
-    for item in items:
-        item_dict = PurchaseOrderItemResponse.model_validate(item).model_dump()
 
-        # 最新ロットの検品ステータスを取得
-        if item.lots:
-            latest_lot = max(item.lots, key=lambda l: (l.received_date or datetime.min, l.id))
-            item_dict['inspection_status'] = latest_lot.inspection_status.value if latest_lot.inspection_status else 'PENDING'
-        else:
-            item_dict['inspection_status'] = None
+def pending_item_response(row) -> PurchaseOrderItemResponse:
+    item, latest_status = row
+    response = PurchaseOrderItemResponse.model_validate(item)
+    response.inspection_status = latest_status.value if latest_status else None
+    return response
 
-        result.append(item_dict)
 
-    return result
+def list_pending_or_inspection_items(db: Session, include_inspected: bool = False) -> List[PurchaseOrderItemResponse]:
+    """入庫待ち・検品未完了アイテム一覧（リストで取得）"""
+    return [pending_item_response(row) for row in pending_or_inspection_items_query(db, include_inspected)]
+
+
+@router.get("/pending-or-inspection/items/", response_model=List[PurchaseOrderItemResponse])
+async def get_pending_or_inspection_items(
+    include_inspected: bool = False,
+    db: Session = Depends(get_db)
+):
+    """入庫待ち、または検品未完了アイテム一覧取得（オプションで検品完了も含める）
+
+    - 発注アイテムが未入庫（PENDING）のもの
+    - 入庫済み（RECEIVED）だが、紐づく最新ロットの検品が未完了（PENDING/FAILED）のもの
+    - include_inspected=true の場合、検品完了（PASSED）のものも含める
+
+    件数が多くなるため、サーバーサイドカーソルで取得しながらJSON配列を逐次返す。
+    """
+    query = pending_or_inspection_items_query(db, include_inspected)
+    return stream_json_array(stream_query(query), pending_item_response)
 
 @router.get("/items/{item_id}/suggest-material", response_model=Optional[MaterialSuggestionResponse])
 async def suggest_material_for_item(item_id: int, db: Session = Depends(get_db)):
@@ -342,6 +381,8 @@ async def external_import_test(dry_run: bool = True, excel: Optional[str] = None
         excel_path = excel or r"\\192.168.1.200\共有\生産管理課\材料管理.xlsx"
         sheet_name = sheet or "材料管理表"
         result = await run_in_threadpool(import_excel_to_purchase_orders, excel_path, sheet_name, dry_run)
+        if not dry_run:
+            reorder.invalidate()
         return {"result": result}
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -514,6 +555,14 @@ async def receive_item(
             order.status = PurchaseOrderStatus.PARTIAL
 
         db.commit()
+        lead_time.refresh_after_commit(db, order.supplier)
+        stock_events.publish(
+            "receive",
+            lot_id=lot.id,
+            lot_number=primary_lot_number,
+            material_id=material_id,
+            purchase_order_item_id=item.id,
+        )
 
         # 検品完了時に在庫登録するため、item_idはNoneを返す
         return {
@@ -692,7 +741,21 @@ async def update_received_item(
     item.received_quantity = total_quantity if total_quantity > 0 else 0
     item.received_weight_kg = total_weight_kg if total_weight_kg > 0 else None
 
+    # 本数・置き場・重量計算の元（長さ・初期重量・比重）が変わるため材料の在庫集計を再計算
+    material_stock.refresh(db, [material.id])
+
     db.commit()
+    lead_time.refresh_after_commit(db, item.purchase_order.supplier)
+    if inv_item:
+        stock_events.publish_item_change("receive_update", inv_item, purchase_order_item_id=item.id)
+    else:
+        stock_events.publish(
+            "receive_update",
+            lot_id=lot.id,
+            lot_number=lot.lot_number,
+            material_id=material.id,
+            purchase_order_item_id=item.id,
+        )
 
     return {
         "message": "入庫内容を更新しました",
@@ -745,10 +808,14 @@ async def delete_received_lot(
             )
 
     # ロットと在庫アイテムを削除
+    deleted_item_id = inventory_item.id if inventory_item else None
+    deleted_material_id = lot.material_id
     if inventory_item:
         db.delete(inventory_item)
     db.delete(lot)
     db.flush()
+    if inventory_item:
+        material_stock.refresh(db, [deleted_material_id])
 
     # 残存ロットから入庫数量と重量を再計算
     remaining_lots = db.query(Lot).options(joinedload(Lot.material)).filter(
@@ -798,6 +865,14 @@ async def delete_received_lot(
             order.status = PurchaseOrderStatus.PENDING
 
     db.commit()
+    lead_time.refresh_after_commit(db, item.purchase_order.supplier)
+    stock_events.publish(
+        "receive_delete",
+        item_id=deleted_item_id,
+        lot_number=lot_number,
+        current_quantity=0 if deleted_item_id else None,
+        purchase_order_item_id=item.id,
+    )
 
     return {
         "message": "ロットを削除しました",
@@ -928,7 +1003,7 @@ async def update_purchase_order(
         print(f"警告: 入庫済み発注（ID: {order_id}）を編集しています")
 
     # 旧値を記録
-    old_values = f"仕入先: {order.supplier}, 納期: {order.expected_delivery_date}, 備考: {order.notes or 'なし'}"
+    old_values = {"supplier": order.supplier, "expected_delivery_date": order.expected_delivery_date, "notes": order.notes}
 
     # 更新
     if order_data.supplier is not None:
@@ -940,20 +1015,16 @@ async def update_purchase_order(
 
     order.updated_at = datetime.now()
 
-    # 監査ログ記録
-    audit_log = AuditLog(
-        user_id=1,  # TODO: 認証実装後にユーザーIDを設定
-        action="発注ヘッダー編集",
-        target_table="purchase_orders",
-        target_id=order_id,
-        old_values=old_values,
-        new_values=f"仕入先: {order.supplier}, 納期: {order.expected_delivery_date}, 備考: {order.notes or 'なし'}",
-        created_at=datetime.now()
-    )
-
-    db.add(audit_log)
     db.commit()
+    # 仕入先・納期予定日が変わると統計の集計先・納期遵守の判定が変わる
+    lead_time.refresh_after_commit(db, old_values["supplier"], order.supplier)
+    reorder.invalidate()
     db.refresh(order)
+    audit.record(
+        "発注ヘッダー編集", "purchase_orders", order_id,
+        old_values=old_values,
+        new_values={"supplier": order.supplier, "expected_delivery_date": order.expected_delivery_date, "notes": order.notes},
+    )
 
     return order
 
@@ -981,7 +1052,12 @@ async def update_purchase_order_item(
         )
 
     # 旧値を記録
-    old_values = f"数量: {item.ordered_quantity}, 重量: {item.ordered_weight_kg}, 単価: {item.unit_price}, 金額: {item.amount}"
+    old_values = {
+        "ordered_quantity": item.ordered_quantity,
+        "ordered_weight_kg": item.ordered_weight_kg,
+        "unit_price": item.unit_price,
+        "amount": item.amount,
+    }
 
     # 更新
     if item_data.ordered_quantity is not None:
@@ -995,20 +1071,19 @@ async def update_purchase_order_item(
 
     item.updated_at = datetime.now()
 
-    # 監査ログ記録
-    audit_log = AuditLog(
-        user_id=1,  # TODO: 認証実装後にユーザーIDを設定
-        action="発注アイテム編集",
-        target_table="purchase_order_items",
-        target_id=item_id,
-        old_values=old_values,
-        new_values=f"数量: {item.ordered_quantity}, 重量: {item.ordered_weight_kg}, 単価: {item.unit_price}, 金額: {item.amount}",
-        created_at=datetime.now()
-    )
-
-    db.add(audit_log)
     db.commit()
+    reorder.invalidate()
     db.refresh(item)
+    audit.record(
+        "発注アイテム編集", "purchase_order_items", item_id,
+        old_values=old_values,
+        new_values={
+            "ordered_quantity": item.ordered_quantity,
+            "ordered_weight_kg": item.ordered_weight_kg,
+            "unit_price": item.unit_price,
+            "amount": item.amount,
+        },
+    )
 
     return item
 
@@ -1041,18 +1116,7 @@ async def delete_purchase_order(
             detail="入庫済みアイテムがあるため削除できません"
         )
 
-    # 監査ログ記録
-    audit_log = AuditLog(
-        user_id=1,  # TODO: 認証実装後にユーザーIDを設定
-        action="発注削除",
-        target_table="purchase_orders",
-        target_id=order_id,
-        old_values=f"発注番号: {order.order_number}, 仕入先: {order.supplier}, アイテム数: {len(order.items)}",
-        new_values="削除",
-        created_at=datetime.now()
-    )
-
-    db.add(audit_log)
+    deleted_values = {"order_number": order.order_number, "supplier": order.supplier, "item_count": len(order.items)}
 
     # 発注アイテムを先に削除（外部キー制約対応）
     for item in order.items:
@@ -1061,11 +1125,13 @@ async def delete_purchase_order(
     # 発注本体を削除
     db.delete(order)
     db.commit()
+    reorder.invalidate()
+    audit.record("発注削除", "purchase_orders", order_id, old_values=deleted_values, new_values=None)
 
     return {
         "message": "発注を削除しました",
         "order_id": order_id,
-        "order_number": order.order_number
+        "order_number": deleted_values["order_number"]
     }
 
 
@@ -0,0 +1,185 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from datetime import datetime
+
+from src.db import get_db
+from src.db.models import ReorderPoint, Material, MaterialGroup
+from src.utils import low_stock, reorder
+
+router = APIRouter()
+
+# Pydantic スキーマ
+class ReorderPointBase(BaseModel):
+    material_id: Optional[int] = Field(None, description="材料ID（材料単位の場合）")
+    group_id: Optional[int] = Field(None, description="材料グループID（グループ単位の場合）")
+    min_quantity: Optional[int] = Field(None, ge=0, description="下限本数")
+    min_weight_kg: Optional[float] = Field(None, ge=0, description="下限重量（kg）")
+    notes: Optional[str] = Field(None, description="備考")
+
+class ReorderPointCreate(ReorderPointBase):
+    @model_validator(mode="after")
+    def validate_target(self):
+        if (self.material_id is None) == (self.group_id is None):
+            raise ValueError("材料IDまたはグループIDのどちらか一方を指定してください")
+        if self.min_quantity is None and self.min_weight_kg is None:
+            raise ValueError("下限本数または下限重量を指定してください")
+        return self
+
+class ReorderPointUpdate(BaseModel):
+    min_quantity: Optional[int] = Field(None, ge=0, description="下限本数")
+    min_weight_kg: Optional[float] = Field(None, ge=0, description="下限重量（kg）")
+    notes: Optional[str] = Field(None, description="備考")
+    is_active: Optional[bool] = Field(None, description="有効フラグ")
+
+class ReorderPointResponse(ReorderPointBase):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+
+class LowStockAlert(BaseModel):
+    scope: str
+    material_id: Optional[int]
+    group_id: Optional[int]
+    name: str
+    total_quantity: int
+    total_weight_kg: float
+    lot_count: int
+    min_quantity: Optional[int]
+    min_weight_kg: Optional[float]
+    alert_level: str
+    source: str
+
+class ReorderSuggestion(BaseModel):
+    material_id: int
+    material_name: str
+    diameter_mm: Optional[float]
+    current_stock_bars: int
+    awaiting_inspection_bars: int
+    open_po_bars: int
+    incoming_bars: int
+    demand_bars: float
+    demand_source: Optional[str]
+    safety_stock_bars: int
+    projected_min_bars: float
+    first_shortage_date: Optional[str]
+    shortfall_bars: float
+    suggested_order_bars: int
+    supplier: Optional[str]
+    lead_time_days: float
+    order_by_date: Optional[str]
+    urgent: bool
+
+class ReorderSuggestionReport(BaseModel):
+    generated_at: str
+    horizon_days: int
+    lead_time_stat: str
+    schedule_loaded: bool
+    materials_evaluated: int
+    suggestions: List[ReorderSuggestion]
+
+# API エンドポイント
+@router.get("/", response_model=List[ReorderPointResponse])
+async def get_reorder_points(
+    is_active: Optional[bool] = True,
+    db: Session = Depends(get_db)
+):
+    """発注点一覧取得"""
+    query = db.query(ReorderPoint)
+
+    if is_active is not None:
+        query = query.filter(ReorderPoint.is_active == is_active)
+
+    return query.order_by(ReorderPoint.id).all()
+
+@router.get("/alerts/", response_model=List[LowStockAlert])
+async def get_reorder_alerts(
+    default_threshold: Optional[int] = Query(None, ge=0, description="発注点未設定の材料に適用する下限本数"),
+    db: Session = Depends(get_db)
+):
+    """在庫不足アラート（材料・グループ単位）"""
+    return low_stock.get_low_stock_alerts(db, default_threshold)
+
+@router.get("/suggestions/", response_model=ReorderSuggestionReport)
+async def get_reorder_suggestions(
+    horizon_days: Optional[int] = Query(None, ge=1, le=365, description="計算日数（省略時は REORDER_HORIZON_DAYS）"),
+    lead_time_stat: str = Query("p90_days", pattern="^(mean_days|p50_days|p90_days)$", description="使用するリードタイム統計（mean_days / p50_days / p90_days）"),
+    use_consumption_pace: bool = Query(True, description="生産中シートにない材料は消費ペースで使用量を見込む"),
+    only_shortfall: bool = Query(True, description="不足見込みの材料のみ"),
+    db: Session = Depends(get_db)
+):
+    """発注提案（現在庫・入庫待ちの発注・生産中シートの使用予定・仕入先リードタイムから不足と推奨発注本数を計算）"""
+    return reorder.get_report(db, horizon_days, lead_time_stat, use_consumption_pace, only_shortfall)
+
+@router.post("/", response_model=ReorderPointResponse, status_code=status.HTTP_201_CREATED)
+async def create_reorder_point(point: ReorderPointCreate, db: Session = Depends(get_db)):
+    """発注点作成"""
+    if point.material_id is not None:
+        if not db.query(Material.id).filter(Material.id == point.material_id).first():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="材料が見つかりません")
+        existing = db.query(ReorderPoint).filter(ReorderPoint.material_id == point.material_id).first()
+    else:
+        if not db.query(MaterialGroup.id).filter(MaterialGroup.id == point.group_id).first():
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="材料グループが見つかりません")
+        existing = db.query(ReorderPoint).filter(ReorderPoint.group_id == point.group_id).first()
+
+    if existing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="この材料（グループ）の発注点は既に登録されています"
+        )
+
+    db_point = ReorderPoint(**point.model_dump())
+    db.add(db_point)
+    db.commit()
+    db.refresh(db_point)
+    low_stock.invalidate()
+    reorder.invalidate()
+
+    return db_point
+
+@router.put("/{point_id}", response_model=ReorderPointResponse)
+async def update_reorder_point(
+    point_id: int,
+    point_update: ReorderPointUpdate,
+    db: Session = Depends(get_db)
+):
+    """発注点更新"""
+    db_point = db.query(ReorderPoint).filter(ReorderPoint.id == point_id).first()
+    if not db_point:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="発注点が見つかりません"
+        )
+
+    update_data = point_update.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_point, field, value)
+
+    db.commit()
+    db.refresh(db_point)
+    low_stock.invalidate()
+    reorder.invalidate()
+
+    return db_point
+
+@router.delete("/{point_id}")
+async def delete_reorder_point(point_id: int, db: Session = Depends(get_db)):
+    """発注点削除"""
+    db_point = db.query(ReorderPoint).filter(ReorderPoint.id == point_id).first()
+    if not db_point:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="発注点が見つかりません"
+        )
+
+    db.delete(db_point)
+    db.commit()
+    low_stock.invalidate()
+    reorder.invalidate()
+
+    return {"message": "発注点を削除しました"}
@@ -34,6 +34,64 @@ class Settings(BaseSettings):
     qr_size_mm: int = int(os.getenv("QR_SIZE_MM", "20"))
     production_schedule_path: str = os.getenv("PRODUCTION_SCHEDULE_PATH", r"\\192.168.1.200\共有\生産管理課\セット予定表.xlsx")
     # production_schedule_path: str = os.getenv("PRODUCTION_SCHEDULE_PATH", r"セット予定表.xlsx")
+    # ラベルPDF生成（プロセスプール。ワーカー数0でスレッド実行）
+    label_render_workers: int = int(os.getenv("LABEL_RENDER_WORKERS", "2"))
+    label_render_queue_limit: int = int(os.getenv("LABEL_RENDER_QUEUE_LIMIT", "16"))
+    label_render_timeout_sec: float = float(os.getenv("LABEL_RENDER_TIMEOUT_SEC", "60"))
+    # 生成済みラベルPDFのディスクキャッシュ
+    label_cache_enabled: bool = os.getenv("LABEL_CACHE_ENABLED", "True").lower() == "true"
+    label_cache_dir: str = os.getenv("LABEL_CACHE_DIR", str(Path("instance") / "label_cache"))
+    label_cache_max_files: int = int(os.getenv("LABEL_CACHE_MAX_FILES", "2000"))
+
+    # ダッシュボード集計結果のキャッシュ秒数
+    dashboard_cache_ttl_sec: int = int(os.getenv("DASHBOARD_CACHE_TTL_SEC", "60"))
+
+    # 在庫変更イベント配信（SSE）：クライアントごとの未送信上限 / 同時接続数 / 再接続間隔
+    event_stream_queue_size: int = int(os.getenv("EVENT_STREAM_QUEUE_SIZE", "100"))
+    event_stream_max_clients: int = int(os.getenv("EVENT_STREAM_MAX_CLIENTS", "50"))
+    event_stream_retry_ms: int = int(os.getenv("EVENT_STREAM_RETRY_MS", "5000"))
+
+    # 入出庫の Idempotency-Key（再送時に同じ結果を返す）の保持時間
+    idempotency_key_ttl_hours: int = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "72"))
+
+    # 監査ログの非同期書き込み（スプールファイル / キュー上限 / 一括INSERT件数 / 書き込み間隔）
+    audit_spool_path: str = os.getenv("AUDIT_SPOOL_PATH", str(Path("instance") / "audit_spool.jsonl"))
+    audit_queue_size: int = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+    audit_batch_size: int = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+    audit_flush_interval_sec: float = float(os.getenv("AUDIT_FLUSH_INTERVAL_SEC", "1.0"))
+
+    # 入出庫履歴・監査ログのアーカイブ（月別 Parquet）の保存先
+    archive_dir: str = os.getenv("ARCHIVE_DIR", str(Path("instance") / "archive"))
+    # 分析用の差分 Parquet エクスポート（出力先 / 確定待ち秒数）
+    parquet_export_dir: str = os.getenv("PARQUET_EXPORT_DIR", str(Path("instance") / "parquet"))
+    parquet_export_settle_sec: int = int(os.getenv("PARQUET_EXPORT_SETTLE_SEC", "60"))
+    # 集計（/api/analytics）のバックエンド（mysql / duckdb）と DuckDB ファイル・更新間隔
+    analytics_backend: str = os.getenv("ANALYTICS_BACKEND", "mysql").lower()
+    analytics_duckdb_path: str = os.getenv("ANALYTICS_DUCKDB_PATH", str(Path("instance") / "analytics.duckdb"))
+    analytics_duckdb_refresh_sec: int = int(os.getenv("ANALYTICS_DUCKDB_REFRESH_SEC", "300"))
+    # 集計結果のメモリキャッシュ件数（0で無効）と有効秒数
+    analytics_cache_size: int = int(os.getenv("ANALYTICS_CACHE_SIZE", "256"))
+    analytics_cache_ttl_sec: int = int(os.getenv("ANALYTICS_CACHE_TTL_SEC", "300"))
+
+    # 在庫不足アラートのキャッシュ秒数
+    low_stock_cache_ttl_sec: int = int(os.getenv("LOW_STOCK_CACHE_TTL_SEC", "60"))
+
+    # 材料別の消費ペース（日別出庫本数の指数移動平均）の半減期と初回計算の日数
+    consumption_half_life_days: float = float(os.getenv("CONSUMPTION_HALF_LIFE_DAYS", "14"))
+    consumption_warmup_days: int = int(os.getenv("CONSUMPTION_WARMUP_DAYS", "90"))
+
+    # 発注提案（計算日数 / リードタイム実績がない場合の日数 / 結果のキャッシュ秒数）
+    reorder_horizon_days: int = int(os.getenv("REORDER_HORIZON_DAYS", "30"))
+    reorder_default_lead_days: float = float(os.getenv("REORDER_DEFAULT_LEAD_DAYS", "14"))
+    reorder_cache_ttl_sec: int = int(os.getenv("REORDER_CACHE_TTL_SEC", "300"))
+
+    # QRスキャン（ロット番号検索）結果のメモリキャッシュ件数（0で無効）
+    scan_cache_size: int = int(os.getenv("SCAN_CACHE_SIZE", "1000"))
+    # 他のワーカーでの在庫変更を反映するまでの最大秒数（キャッシュの有効期間）
+    scan_cache_ttl_sec: float = float(os.getenv("SCAN_CACHE_TTL_SEC", "10"))
+
+    # 起動設定（pandas / reportlab などの重量級ライブラリを起動後にバックグラウンドで読み込む）
+    prewarm_heavy_modules: bool = os.getenv("PREWARM_HEAVY_MODULES", "True").lower() == "true"
 
     @property
     def database_url(self) -> str:
@@ -21,6 +21,22 @@ def get_db():
     finally:
         db.close()
 
-def create_tables():
-    """起動時にテーブルを作成"""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+def create_tables(indexes: bool = True):
+    """起動時にテーブルを作成（indexes=False の場合、既存テーブルへのインデックス追加は呼び出し側で行う）"""
+    Base.metadata.create_all(bind=engine)
+    if indexes:
+        ensure_indexes()
+
+def ensure_indexes():
+    """既存テーブルに不足しているインデックスを追加（create_all は既存テーブルを変更しないため）"""
+    from sqlalchemy import inspect
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind=engine)
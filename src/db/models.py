@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Enum, UniqueConstraint, Index
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, DateTime, Text, ForeignKey, Enum, UniqueConstraint, Index
 from sqlalchemy.dialects.mysql import CHAR
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -145,6 +145,7 @@ class Lot(Base):
     __tablename__ = "lots"
     __table_args__ = (
         Index('idx_lots_po_inspection', 'purchase_order_item_id', 'inspection_status'),
+        Index('idx_lots_lot_number', 'lot_number'),
     )
 
     id = Column(Integer, primary_key=True, index=True)
@@ -196,6 +197,9 @@ class Lot(Base):
 
 class Item(Base):
     __tablename__ = "items"
+    __table_args__ = (
+        Index('idx_items_active_quantity', 'is_active', 'current_quantity'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     lot_id = Column(Integer, ForeignKey("lots.id"), nullable=False, unique=True, comment="ロットID（1ロット=1アイテム）")
@@ -217,6 +221,9 @@ class Item(Base):
 
 class Movement(Base):
     __tablename__ = "movements"
+    __table_args__ = (
+        Index('idx_movements_processed_at', 'processed_at'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     item_id = Column(Integer, ForeignKey("items.id"), nullable=False)
@@ -288,6 +295,9 @@ class PurchaseOrderItem(Base):
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    __table_args__ = (
+        Index('idx_audit_logs_created_at', 'created_at'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -303,5 +313,81 @@ class AuditLog(Base):
     # リレーション
     user = relationship("User")
 
+class ReorderPoint(Base):
+    """発注点（材料またはグループ単位の在庫下限）"""
+    __tablename__ = "reorder_points"
+
+    id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=True, unique=True, comment="材料ID（材料単位の場合）")
+    group_id = Column(Integer, ForeignKey("material_groups.id"), nullable=True, unique=True, comment="材料グループID（グループ単位の場合）")
+    min_quantity = Column(Integer, nullable=True, comment="下限本数")
+    min_weight_kg = Column(Float, nullable=True, comment="下限重量（kg）")
+    notes = Column(Text, comment="備考")
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # リレーション
+    material = relationship("Material")
+    group = relationship("MaterialGroup")
+
+class IdempotencyKey(Base):
+    """冪等キー（端末からの再送で同じ入出庫が二重登録されないよう、処理結果を一定期間保持）"""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(100), nullable=False, unique=True, comment="Idempotency-Key ヘッダーの値")
+    scope = Column(String(100), nullable=False, comment="対象処理（例: out:123）")
+    request_hash = Column(String(64), nullable=False, comment="リクエスト内容のハッシュ")
+    response_body = Column(Text, nullable=True, comment="レスポンス本文（JSON、保存前はNULL）")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True, comment="有効期限")
 
+class MaterialStock(Base):
+    """材料ごとの在庫集計（入出庫・検品・入庫の更新と同じトランザクションで更新）"""
+    __tablename__ = "material_stock"
 
+    material_id = Column(Integer, ForeignKey("materials.id"), primary_key=True, comment="材料ID")
+    total_quantity = Column(Integer, nullable=False, default=0, comment="在庫本数")
+    total_weight_kg = Column(Float, nullable=False, default=0.0, comment="在庫重量（kg）")
+    lot_count = Column(Integer, nullable=False, default=0, comment="在庫のあるロット数")
+    location_count = Column(Integer, nullable=False, default=0, comment="在庫のある置き場数")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # リレーション
+    material = relationship("Material")
+
+class MaterialConsumption(Base):
+    """材料ごとの消費ペース（日別出庫本数の指数移動平均。前日までの確定分を日次で反映）"""
+    __tablename__ = "material_consumption"
+
+    material_id = Column(Integer, ForeignKey("materials.id"), primary_key=True, comment="材料ID")
+    ewma_daily_out = Column(Float, nullable=False, default=0.0, comment="日別出庫本数の指数移動平均（本/日）")
+    last_out_date = Column(Date, nullable=True, comment="最終出庫日")
+    through_date = Column(Date, nullable=False, comment="反映済みの最終日")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # リレーション
+    material = relationship("Material")
+
+class SupplierLeadTime(Base):
+    """仕入先別・仕入先×材料別の納入リードタイム統計（発注日〜入荷日。入庫登録時に仕入先単位で再計算）"""
+    __tablename__ = "supplier_lead_times"
+    __table_args__ = (
+        Index('idx_supplier_lead_times_supplier_material', 'supplier', 'material_id'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    supplier = Column(String(200), nullable=False, comment="仕入先")
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=True, comment="材料ID（NULLは仕入先全体）")
+    sample_count = Column(Integer, nullable=False, default=0, comment="入荷ロット数")
+    mean_days = Column(Float, nullable=False, default=0.0, comment="平均リードタイム（日）")
+    p50_days = Column(Float, nullable=False, default=0.0, comment="リードタイム中央値（日）")
+    p90_days = Column(Float, nullable=False, default=0.0, comment="リードタイム90パーセンタイル（日）")
+    due_count = Column(Integer, nullable=False, default=0, comment="納期予定日のある入荷ロット数")
+    on_time_count = Column(Integer, nullable=False, default=0, comment="納期予定日までに入荷したロット数")
+    last_received_date = Column(Date, nullable=True, comment="最終入荷日")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    # リレーション
+    material = relationship("Material")
@@ -1,3 +1,6 @@
+import time
+_IMPORT_STARTED_AT = time.perf_counter()
+
 from fastapi import FastAPI, Request
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
@@ -7,11 +10,15 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.security import HTTPBearer
 import uvicorn
 import logging
+import threading
+from contextlib import contextmanager
 
 from src.config import settings
-from src.db import create_tables, SessionLocal
+from src.db import create_tables, ensure_indexes, SessionLocal
 from src.db.models import Location, DensityPreset
-from src.api import auth, materials, inventory, movements, labels, density_presets, purchase_orders, excel_viewer, production_schedule, material_management, material_groups, inspections, analytics
+from sqlalchemy import func
+from src.api import auth, materials, inventory, movements, labels, density_presets, purchase_orders, excel_viewer, production_schedule, material_management, material_groups, inspections, analytics, dashboard, events, reorder_points, exports
+from src.utils import analytics_duckdb, audit, consumption, idempotency, lead_time, material_stock
 
 # ログ設定
 logging.basicConfig(
@@ -42,6 +49,8 @@ app.add_middleware(
     allowed_hosts=["*"] if settings.debug else settings.allowed_hosts
 )
 
+app.add_middleware(audit.RequestInfoMiddleware)
+
 # 静的ファイルとテンプレート設定
 app.mount("/static", StaticFiles(directory="src/static"), name="static")
 templates = Jinja2Templates(directory="src/templates")
@@ -70,15 +79,99 @@ app.include_router(material_management.router, tags=["材料管理"])
 app.include_router(material_groups.router, tags=["材料グループ"])
 app.include_router(inspections.router, tags=["検品"])
 app.include_router(analytics.router, prefix="/api/analytics", tags=["集計・分析"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["ダッシュボード"])
+app.include_router(events.router, prefix="/api/events", tags=["イベント配信"])
+app.include_router(reorder_points.router, prefix="/api/reorder-points", tags=["発注点管理"])
+app.include_router(exports.router, prefix="/api/exports", tags=["エクスポート"])
+
+# 起動フェーズ計測（ms）
+startup_profile: dict = {"import": round((time.perf_counter() - _IMPORT_STARTED_AT) * 1000, 1)}
+app.state.startup_profile = startup_profile
+
+LOCATION_COUNT = 300
+
+
+@contextmanager
+def startup_phase(name: str):
+    """起動処理の各フェーズの所要時間を記録"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_profile[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def prewarm_heavy_modules():
+    """初回リクエストの待ち時間を避けるため、重量級ライブラリを裏で読み込む"""
+    started = time.perf_counter()
+    try:
+        import pandas  # noqa: F401
+        import qrcode  # noqa: F401
+        from src.utils.label_render import ensure_japanese_font
+        ensure_japanese_font()
+        import reportlab.platypus  # noqa: F401
+        from src.utils import pdf_render_pool
+        pdf_render_pool.warm_up()
+    except Exception as e:
+        logger.warning(f"ライブラリの事前読込に失敗しました: {e}")
+        return
+    startup_profile["prewarm"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"ライブラリの事前読込が完了しました: {startup_profile['prewarm']}ms")
+
+
+def catch_up():
+    """起動後の追いつき処理（インデックス追加・集計表の初回作成・前日までの出庫の反映など）"""
+    started = time.perf_counter()
+
+    # 既存テーブルに不足しているインデックスの追加
+    try:
+        with startup_phase("indexes"):
+            ensure_indexes()
+    except Exception as e:
+        logger.error(f"インデックスの追加エラー: {e}")
+
+    # 材料別在庫集計の初回作成（導入直後のみ）
+    try:
+        with startup_phase("material_stock"), SessionLocal() as db:
+            material_stock.ensure_populated(db)
+    except Exception as e:
+        logger.error(f"材料別在庫集計の作成エラー: {e}")
+
+    # 材料別の消費ペースに前日までの出庫を反映
+    try:
+        with startup_phase("consumption"), SessionLocal() as db:
+            consumption.update(db)
+    except Exception as e:
+        logger.error(f"材料別の消費ペースの更新エラー: {e}")
+
+    # 仕入先別リードタイム統計の初回作成（導入直後のみ）
+    try:
+        with startup_phase("lead_times"), SessionLocal() as db:
+            lead_time.ensure_populated(db)
+    except Exception as e:
+        logger.error(f"リードタイム統計の作成エラー: {e}")
+
+    # 期限切れの Idempotency-Key を削除
+    try:
+        with startup_phase("idempotency_keys"), SessionLocal() as db:
+            idempotency.purge_expired(db)
+    except Exception as e:
+        logger.error(f"期限切れの Idempotency-Key の削除エラー: {e}")
+
+    startup_profile["catch_up"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"起動後の追いつき処理が完了しました: {startup_profile['catch_up']}ms")
+
 
 @app.on_event("startup")
 async def startup_event():
     """起動時処理"""
     logger.info("材料管理システムを起動中...")
+    started = time.perf_counter()
 
     # データベーステーブル作成
     try:
-        create_tables()
+        with startup_phase("create_tables"):
+            create_tables(indexes=False)
         logger.info("データベーステーブルの初期化が完了しました")
     except Exception as e:
         logger.error(f"データベース初期化エラー: {e}")
@@ -86,24 +179,28 @@ async def startup_event():
 
     # 置き場（1〜300）の初期化（存在しないIDのみ作成）
     try:
-        with SessionLocal() as db:
-            existing_ids = {row[0] for row in db.query(Location.id).all()}
-            created = 0
-            for i in range(1, 301):
-                if i not in existing_ids:
-                    db.add(Location(id=i, name=str(i), description=None, is_active=True))
-                    created += 1
-            if created:
-                db.commit()
-                logger.info(f"置き場を初期化しました: 新規 {created} 件")
-            else:
+        with startup_phase("locations"), SessionLocal() as db:
+            initialized = db.query(func.count(Location.id)).filter(
+                Location.id.between(1, LOCATION_COUNT)
+            ).scalar()
+            if initialized >= LOCATION_COUNT:
                 logger.info("置き場は既に初期化済みです")
+            else:
+                existing_ids = {row[0] for row in db.query(Location.id).all()}
+                created = 0
+                for i in range(1, LOCATION_COUNT + 1):
+                    if i not in existing_ids:
+                        db.add(Location(id=i, name=str(i), description=None, is_active=True))
+                        created += 1
+                if created:
+                    db.commit()
+                    logger.info(f"置き場を初期化しました: 新規 {created} 件")
     except Exception as e:
         logger.error(f"置き場初期化エラー: {e}")
 
     # 比重プリセットの初期化（未登録時のみ投入）
     try:
-        with SessionLocal() as db:
+        with startup_phase("density_presets"), SessionLocal() as db:
             preset_count = db.query(DensityPreset).count()
             if preset_count == 0:
                 presets = [
@@ -129,11 +226,30 @@ async def startup_event():
     except Exception as e:
         logger.error(f"比重プリセット初期化エラー: {e}")
 
+    # 監査ログの書き込みスレッド（前回の未書き込み分はスレッド内で先に書き込む）
+    with startup_phase("audit"):
+        audit.start()
+
+    # 集計表の作成・追いつき処理は起動を待たせないよう裏で実行する
+    threading.Thread(target=catch_up, name="startup-catch-up", daemon=True).start()
+
+    # 集計用 DuckDB の定期更新（ANALYTICS_BACKEND=duckdb の場合のみ）
+    analytics_duckdb.start()
+
+    if settings.prewarm_heavy_modules:
+        threading.Thread(target=prewarm_heavy_modules, name="prewarm", daemon=True).start()
+
+    startup_profile["startup"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"起動フェーズ計測(ms): {startup_profile}")
     logger.info("材料管理システムの起動が完了しました")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """終了時処理"""
+    from src.utils import pdf_render_pool
+    pdf_render_pool.shutdown()
+    audit.stop()
+    analytics_duckdb.stop()
     logger.info("材料管理システムを終了します")
 
 @app.get("/")
@@ -0,0 +1,61 @@
+"""
+入出庫履歴・監査ログのアーカイブスクリプト
+
+直近 N か月（当月を含む）より古い movements / audit_logs を月別の Parquet ファイル
+（ARCHIVE_DIR/<テーブル名>/YYYY-MM.parquet）へ書き出し、DB から削除します。
+アーカイブ済みの入出庫履歴も集計画面の期間指定で引き続き集計されます。
+
+使い方:
+  python -m src.scripts.archive_history --months 24
+  python -m src.scripts.archive_history --months 24 --table movements --dry-run
+
+--dry-run では移動対象の月と件数の表示のみ行います。
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from src.db import SessionLocal, create_tables
+from src.utils import history_archive
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="入出庫履歴・監査ログのアーカイブ")
+    parser.add_argument("--months", type=int, required=True, help="DB に残す月数（当月を含む）")
+    parser.add_argument(
+        "--table", choices=sorted(history_archive.TABLES), action="append",
+        help="対象テーブル（省略時は両方）"
+    )
+    parser.add_argument("--dry-run", action="store_true", help="移動せずに対象の件数のみ表示する")
+    args = parser.parse_args(argv)
+
+    tables = args.table or sorted(history_archive.TABLES)
+    cutoff = history_archive.cutoff_for(args.months)
+    print(f"{cutoff:%Y-%m-%d} より前の履歴が対象です")
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        for table in tables:
+            try:
+                results = history_archive.archive(db, table, args.months, dry_run=args.dry_run)
+            except RuntimeError as e:
+                print(f"NG: {e}", file=sys.stderr)
+                return 1
+            if not results:
+                print(f"{table}: 対象なし")
+                continue
+            for entry in results:
+                destination = f" -> {entry['path']}" if entry["path"] else ""
+                print(f"{table} {entry['month']}: {entry['rows']}件{destination}")
+            total = sum(entry["rows"] for entry in results)
+            print(f"{table}: 合計 {total}件{'（dry-run）' if args.dry_run else 'をアーカイブしました'}")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
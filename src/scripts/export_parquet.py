@@ -0,0 +1,52 @@
+"""
+分析用の差分 Parquet エクスポートスクリプト
+
+movements / lots / items / materials / purchase_orders / purchase_order_items を
+PARQUET_EXPORT_DIR 以下へ月別パーティションの Parquet で書き出します。
+前回の続き（新規・更新された行）のみを追記するため、タスクスケジューラ等で定期実行してください。
+
+使い方:
+  python -m src.scripts.export_parquet
+  python -m src.scripts.export_parquet --table movements --table lots
+  python -m src.scripts.export_parquet --rebuild
+
+--rebuild では対象テーブルの出力とウォーターマークを削除して全件を書き出し直します。
+出力は pandas / pyarrow / DuckDB などから `<テーブル名>/` ディレクトリ単位で読み込めます
+（更新されるテーブルは id ごとに `_exported_at` が最新の行を使ってください）。
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from src.db import SessionLocal, create_tables
+from src.utils import parquet_export
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="分析用の差分 Parquet エクスポート")
+    parser.add_argument(
+        "--table", choices=list(parquet_export.TABLES), action="append",
+        help="対象テーブル（省略時は全テーブル）"
+    )
+    parser.add_argument("--rebuild", action="store_true", help="既存の出力を削除して全件を書き出し直す")
+    args = parser.parse_args(argv)
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        results = parquet_export.export(db, args.table, rebuild=args.rebuild)
+    except RuntimeError as e:
+        print(f"NG: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+    for entry in results:
+        print(f"{entry['table']}: {entry['rows']}件 / {entry['files']}ファイル")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
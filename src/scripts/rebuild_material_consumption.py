@@ -0,0 +1,35 @@
+"""
+材料別の消費ペース（material_consumption）の再作成スクリプト
+
+出庫履歴から材料ごとの日別出庫本数の指数移動平均を作り直します。
+過去の出庫を修正・削除した場合や、半減期（CONSUMPTION_HALF_LIFE_DAYS）を変更した場合に実行してください。
+通常は起動時・予測の表示時に前日までの出庫が自動で反映されます。
+
+使い方:
+  python -m src.scripts.rebuild_material_consumption
+"""
+
+from __future__ import annotations
+
+import sys
+
+from src.db import SessionLocal, create_tables
+from src.utils import consumption
+
+
+def main(argv=None) -> int:
+    create_tables()
+    db = SessionLocal()
+    try:
+        updated = consumption.rebuild(db)
+        print(f"{updated}件の材料の消費ペースを作成しました")
+        for entry in consumption.forecast(db)[:20]:
+            days = f"{entry['days_of_cover']}日" if entry["days_of_cover"] is not None else "-"
+            print(f"  {entry['material_name']}: {entry['daily_out_bars']}本/日 在庫{entry['current_stock_bars']}本 ({days})")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+仕入先別の納入リードタイム統計（supplier_lead_times）の再作成スクリプト
+
+発注（発注日・納期予定日）と入荷ロット（入荷日）から、仕入先別・仕入先×材料別の
+平均・中央値・90パーセンタイル・納期遵守率を作り直します。
+発注データを Excel から取り込み直した場合などに実行してください。
+通常は入庫登録・入庫内容の修正・ロット削除のたびに該当仕入先の統計が自動で更新されます。
+
+使い方:
+  python -m src.scripts.rebuild_supplier_lead_times
+"""
+
+from __future__ import annotations
+
+import sys
+
+from src.db import SessionLocal, create_tables
+from src.utils import lead_time
+
+
+def main(argv=None) -> int:
+    create_tables()
+    db = SessionLocal()
+    try:
+        created = lead_time.rebuild(db)
+        print(f"{created}件のリードタイム統計を作成しました")
+        for entry in lead_time.list_stats(db, include_materials=False):
+            ratio = f"{entry['on_time_ratio'] * 100:.0f}%" if entry["on_time_ratio"] is not None else "-"
+            print(
+                f"  {entry['supplier']}: 平均{entry['mean_days']}日 中央値{entry['p50_days']}日 "
+                f"P90 {entry['p90_days']}日 納期遵守{ratio} ({entry['sample_count']}件)"
+            )
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
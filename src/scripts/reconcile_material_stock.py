@@ -0,0 +1,59 @@
+"""
+材料別在庫集計（material_stock）の再構築スクリプト
+
+items から材料ごとの在庫本数・重量・ロット数・置き場数を集計し直し、
+material_stock とずれていた材料を表示して修正します。
+DB を直接編集した後や、集計値に疑いがある場合に実行してください。
+
+使い方:
+  python -m src.scripts.reconcile_material_stock
+  python -m src.scripts.reconcile_material_stock --dry-run
+
+--dry-run ではずれの表示のみ行い、ずれがあった場合は終了コード 1 を返します。
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from src.db import SessionLocal, create_tables
+from src.utils import material_stock
+
+
+def _format(values) -> str:
+    if values is None:
+        return "（未作成）"
+    return (
+        f"{values['total_quantity']}本 / {values['total_weight_kg']:.3f}kg / "
+        f"{values['lot_count']}ロット / {values['location_count']}か所"
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="材料別在庫集計の再構築")
+    parser.add_argument("--dry-run", action="store_true", help="修正せずにずれのみ表示する")
+    args = parser.parse_args(argv)
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        drift = material_stock.reconcile(db, apply=not args.dry_run)
+    finally:
+        db.close()
+
+    for entry in drift:
+        print(f"材料ID {entry['material_id']}: {_format(entry['stored'])} -> {_format(entry['expected'])}")
+
+    if not drift:
+        print("OK: 材料別在庫集計は items と一致しています")
+        return 0
+    if args.dry_run:
+        print(f"NG: {len(drift)}件の材料で集計がずれています", file=sys.stderr)
+        return 1
+    print(f"{len(drift)}件の材料の集計を修正しました")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+発注提案の一括計算スクリプト
+
+現在庫・入庫待ちの発注・検品待ちロット・生産中シートの使用予定・仕入先リードタイムから、
+全材料の不足見込みと推奨発注本数を計算して表示します（計算時間も表示）。
+
+使い方:
+  python -m src.scripts.reorder_suggestions
+  python -m src.scripts.reorder_suggestions --horizon 60 --lead-time-stat p50_days
+  python -m src.scripts.reorder_suggestions --csv reorder.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+import time
+
+from src.db import SessionLocal, create_tables
+from src.utils import lead_time, reorder
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="発注提案の一括計算")
+    parser.add_argument("--horizon", type=int, default=None, help="計算日数（省略時は REORDER_HORIZON_DAYS）")
+    parser.add_argument("--lead-time-stat", choices=lead_time.STATS, default="p90_days", help="使用するリードタイム統計")
+    parser.add_argument("--no-consumption-pace", action="store_true", help="生産中シートにない材料の消費ペースを使わない")
+    parser.add_argument("--all", action="store_true", help="不足見込みのない材料も出力する")
+    parser.add_argument("--csv", help="結果を書き出す CSV ファイル")
+    args = parser.parse_args(argv)
+
+    create_tables()
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        report = reorder.get_report(
+            db, args.horizon, args.lead_time_stat,
+            use_consumption_pace=not args.no_consumption_pace,
+            only_shortfall=not args.all,
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+
+    suggestions = report["suggestions"]
+    print(
+        f"{report['materials_evaluated']}件の材料を{report['horizon_days']}日分計算しました"
+        f"（{elapsed:.3f}秒・生産中シート{'あり' if report['schedule_loaded'] else 'なし'}）"
+    )
+    for entry in suggestions[:30]:
+        mark = "★" if entry["urgent"] else " "
+        print(
+            f"{mark} {entry['material_name']}: 不足{entry['shortfall_bars']}本 → 推奨{entry['suggested_order_bars']}本 "
+            f"（不足日 {entry['first_shortage_date'] or '-'} / 発注期限 {entry['order_by_date'] or '-'}）"
+        )
+
+    if args.csv and suggestions:
+        with open(args.csv, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.DictWriter(f, fieldnames=list(suggestions[0].keys()))
+            writer.writeheader()
+            writer.writerows(suggestions)
+        print(f"{len(suggestions)}件を {args.csv} に書き出しました")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+起動時間（import time）計測スクリプト
+
+`python -X importtime` で `src.main` を読み込み、モジュールごとの読込時間を集計します。
+pandas / reportlab などの重量級ライブラリが起動経路に混入していないかの確認に使用します。
+
+使い方:
+  python -m src.scripts.startup_profile
+  python -m src.scripts.startup_profile --top 30 --budget-ms 1500
+  python -m src.scripts.startup_profile --forbid pandas --forbid reportlab
+
+--budget-ms を超えた場合、または --forbid のモジュールが読み込まれた場合は終了コード 1 を返します。
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+DEFAULT_FORBIDDEN = ("pandas", "reportlab", "qrcode", "openpyxl")
+
+
+def measure_import_time(module: str) -> List[Tuple[str, int, int]]:
+    """(モジュール名, self[us], cumulative[us]) のリストを返す"""
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = project_root + os.pathsep + env.get("PYTHONPATH", "")
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=project_root,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"{module} の読み込みに失敗しました:\n{proc.stderr[-2000:]}")
+
+    rows: List[Tuple[str, int, int]] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+            rows.append((name, int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    return rows
+
+
+def summarize(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """トップレベルパッケージ単位の累計時間（us）"""
+    per_package: Dict[str, int] = {}
+    for name, self_us, _ in rows:
+        package = name.split(".")[0]
+        per_package[package] = per_package.get(package, 0) + self_us
+    return per_package
+
+
+def main():
+    parser = argparse.ArgumentParser(description="起動時のimport時間を計測")
+    parser.add_argument("--module", default="src.main", help="計測対象モジュール")
+    parser.add_argument("--top", type=int, default=20, help="表示するパッケージ数")
+    parser.add_argument("--budget-ms", type=float, default=None, help="許容する合計import時間（ms）")
+    parser.add_argument("--forbid", action="append", default=None, help="起動時に読み込まれてはいけないパッケージ")
+    args = parser.parse_args()
+
+    rows = measure_import_time(args.module)
+    total_ms = next((cum for name, _, cum in rows if name == args.module), 0) / 1000
+    per_package = summarize(rows)
+
+    print(f"{args.module} の読込時間: {total_ms:.1f} ms")
+    print("-" * 50)
+    for package, us in sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)[: args.top]:
+        print(f"{package:<30} {us / 1000:>10.1f} ms")
+    print("-" * 50)
+
+    failed = False
+    forbidden = args.forbid if args.forbid is not None else list(DEFAULT_FORBIDDEN)
+    loaded_forbidden = [p for p in forbidden if p in per_package]
+    if loaded_forbidden:
+        print(f"NG: 起動時に読み込まれています: {', '.join(loaded_forbidden)}")
+        failed = True
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"NG: 読込時間 {total_ms:.1f} ms が上限 {args.budget_ms:.1f} ms を超えています")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+同時出庫の整合性チェックスクリプト
+
+起動中のサーバーに対し、同じアイテムへの出庫を多数のスレッドから同時に送り、
+在庫数がマイナスにならないこと・成功した出庫の合計だけ正確に減っていることを DB で確認します。
+ワーカー数を増やす前や DB 設定を変えた後の確認に使用します（検証用環境で実行してください）。
+
+使い方:
+  python -m src.scripts.stock_concurrency_check --item-id 123
+  python -m src.scripts.stock_concurrency_check --item-id 123 --threads 32 --requests 10 --quantity 1 --cleanup
+  python -m src.scripts.stock_concurrency_check --item-id 123 --base-url https://localhost:8443 --insecure
+
+--cleanup を付けると、作成した出庫履歴を同時に削除して在庫が元の数量に戻ることも確認します。
+不整合があった場合は終了コード 1 を返します。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import ssl
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from src.db import SessionLocal
+from src.db.models import Item, Movement
+
+
+def current_quantity(item_id: int) -> Optional[int]:
+    db = SessionLocal()
+    try:
+        return db.query(Item.current_quantity).filter(Item.id == item_id).scalar()
+    finally:
+        db.close()
+
+
+def count_movements(movement_ids: List[int]) -> int:
+    if not movement_ids:
+        return 0
+    db = SessionLocal()
+    try:
+        return db.query(Movement).filter(Movement.id.in_(movement_ids)).count()
+    finally:
+        db.close()
+
+
+def send(method: str, url: str, payload: Optional[dict], context) -> Tuple[int, dict]:
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=30, context=context) as response:
+            return response.status, json.loads(response.read() or b"{}")
+    except urllib.error.HTTPError as exc:
+        try:
+            body = json.loads(exc.read() or b"{}")
+        except ValueError:
+            body = {}
+        return exc.code, body
+    except Exception as exc:
+        return 0, {"detail": str(exc)}
+
+
+def run(args) -> int:
+    context = ssl._create_unverified_context() if args.insecure else None
+    base_url = args.base_url.rstrip("/")
+
+    initial = current_quantity(args.item_id)
+    if initial is None:
+        print(f"アイテムが見つかりません: {args.item_id}", file=sys.stderr)
+        return 1
+
+    total_requests = args.threads * args.requests
+    print(f"アイテム {args.item_id}: 開始時の在庫 {initial}本")
+    print(f"出庫 {args.quantity}本 × {total_requests}回（{args.threads}スレッド）を送信します")
+
+    url = f"{base_url}/api/movements/out/{args.item_id}"
+    payload = {"quantity": args.quantity, "notes": "同時出庫チェック"}
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(lambda _: send("POST", url, payload, context), range(total_requests)))
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(code for code, _ in results)
+    movement_ids = [body["movement_id"] for code, body in results if code == 200 and "movement_id" in body]
+    succeeded = len(movement_ids)
+
+    final = current_quantity(args.item_id)
+    expected = initial - succeeded * args.quantity
+    recorded = count_movements(movement_ids)
+
+    print(f"所要時間: {elapsed:.2f}秒  ステータス: {dict(statuses)}")
+    print(f"成功 {succeeded}件 / 終了時の在庫 {final}本（期待値 {expected}本）/ 履歴 {recorded}件")
+
+    errors = []
+    if final != expected:
+        errors.append("在庫数が成功した出庫の合計と一致しません（更新の取りこぼし）")
+    if final is not None and final < 0:
+        errors.append("在庫数がマイナスになりました")
+    if recorded != succeeded:
+        errors.append("出庫履歴の件数が成功件数と一致しません")
+    if statuses.get(0) or any(code >= 500 for code in statuses):
+        errors.append("通信エラーまたはサーバーエラーが発生しました")
+    if initial >= total_requests * args.quantity and succeeded != total_requests:
+        errors.append("在庫が十分にあるのに失敗した出庫があります")
+
+    if args.cleanup and movement_ids:
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            delete_results = list(executor.map(
+                lambda movement_id: send("DELETE", f"{base_url}/api/movements/{movement_id}", None, context),
+                movement_ids,
+            ))
+        restored = current_quantity(args.item_id)
+        delete_failed = sum(1 for code, _ in delete_results if code != 200)
+        print(f"後片付け: 履歴 {len(movement_ids)}件を削除（失敗 {delete_failed}件）、在庫 {restored}本")
+        if restored != initial or delete_failed:
+            errors.append("履歴削除後の在庫が開始時と一致しません")
+
+    for message in errors:
+        print(f"NG: {message}", file=sys.stderr)
+    if not errors:
+        print("OK: 在庫数は整合しています")
+    return 1 if errors else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="同時出庫の整合性チェック")
+    parser.add_argument("--item-id", type=int, required=True, help="対象アイテムID")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="サーバーURL")
+    parser.add_argument("--threads", type=int, default=16, help="同時スレッド数")
+    parser.add_argument("--requests", type=int, default=5, help="スレッドあたりの出庫回数")
+    parser.add_argument("--quantity", type=int, default=1, help="1回あたりの出庫本数")
+    parser.add_argument("--cleanup", action="store_true", help="作成した出庫履歴を削除して在庫を戻す")
+    parser.add_argument("--insecure", action="store_true", help="HTTPS の証明書検証を行わない（自己署名証明書用）")
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,12 +12,12 @@ class APIClient {
     const token = localStorage.getItem("access_token");
 
     const config = {
+      ...options,
       headers: {
         "Content-Type": "application/json",
         ...(token && { Authorization: `Bearer ${token}` }),
         ...options.headers,
       },
-      ...options,
     };
 
     try {
@@ -67,10 +67,11 @@ class APIClient {
   /**
    * POSTリクエスト
    */
-  static async post(endpoint, data = {}) {
+  static async post(endpoint, data = {}, headers = {}) {
     return this.request(`${this.baseURL}${endpoint}`, {
       method: "POST",
       body: JSON.stringify(data),
+      headers,
     });
   }
 
@@ -304,16 +305,43 @@ class APIClient {
 
   /**
    * 入庫処理（アイテムIDベース）
+   * @param {string} [idempotencyKey] - 再送しても二重登録されないよう操作ごとに付けるキー
    */
-  static async inMovement(itemId, data) {
-    return this.post(`/movements/in/${itemId}`, data);
+  static async inMovement(itemId, data, idempotencyKey = null) {
+    return this.post(`/movements/in/${itemId}`, data, this.idempotencyHeaders(idempotencyKey));
   }
 
   /**
    * 出庫処理（アイテムIDベース）
+   * @param {string} [idempotencyKey] - 再送しても二重登録されないよう操作ごとに付けるキー
+   */
+  static async outMovement(itemId, data, idempotencyKey = null) {
+    return this.post(`/movements/out/${itemId}`, data, this.idempotencyHeaders(idempotencyKey));
+  }
+
+  static idempotencyHeaders(idempotencyKey) {
+    return idempotencyKey ? { "Idempotency-Key": idempotencyKey } : {};
+  }
+
+  /**
+   * 保留中の入出庫をまとめて送信（オフライン復帰時）
+   * @param {Array<{idempotency_key:string, kind:"in"|"out", item_id:number, quantity?:number, weight_kg?:number, notes?:string}>} operations
+   */
+  static async replayMovements(operations) {
+    return this.post("/movements/replay/", operations);
+  }
+
+  /**
+   * 一括入出庫処理
+   * @param {Array<{item_id:number, quantity?:number, weight_kg?:number, notes?:string}>} lines
+   * @param {Object} options - { movement_type: "out" | "in", all_or_nothing: boolean }
    */
-  static async outMovement(itemId, data) {
-    return this.post(`/movements/out/${itemId}`, data);
+  static async batchMovements(lines, options = {}) {
+    return this.post("/movements/batch/", {
+      movement_type: options.movement_type || "out",
+      all_or_nothing: Boolean(options.all_or_nothing),
+      lines,
+    });
   }
 
   /**
@@ -381,6 +409,15 @@ class APIClient {
   static async getStockoutForecast() {
     return this.get("/production-schedule/stockout-forecast");
   }
+
+  // ===== ダッシュボード =====
+
+  /**
+   * ダッシュボード用データ一括取得
+   */
+  static async getDashboard(params = {}) {
+    return this.get("/dashboard/", params);
+  }
 }
 
 // グローバルに利用可能にする
@@ -156,7 +156,7 @@ class APIClient {
   }
 
   static async getLowStockItems(threshold = 5) {
-    return this.request(`/inventory/low-stock?threshold=${threshold}`);
+    return this.request(`/inventory/low-stock/?threshold=${threshold}`);
   }
 
   // 入出庫関連API
@@ -35,6 +35,7 @@ class DashboardPage {
     init() {
         this.bindEvents();
         this.loadAll();
+        this.subscribeStockEvents();
         this.startAutoRefresh();
     }
 
@@ -44,8 +45,38 @@ class DashboardPage {
         }
     }
 
+    subscribeStockEvents() {
+        if (!window.StockEvents) return;
+
+        // 在庫変更を受けたら、連続した変更をまとめて1回だけ再取得する
+        const scheduleReload = () => {
+            clearTimeout(this.reloadTimer);
+            this.reloadTimer = setTimeout(() => this.loadAll(), 2000);
+        };
+        StockEvents.on("change", (delta) => {
+            this.applyStockDelta(delta);
+            scheduleReload();
+        });
+        StockEvents.on("resync", scheduleReload);
+    }
+
+    applyStockDelta(delta) {
+        // 一覧に表示中のアイテムは即時に数量・置き場を反映
+        const item = this.state.inventory.find((i) => i.id === delta.item_id);
+        if (!item || delta.current_quantity === undefined) return;
+
+        item.current_quantity = delta.current_quantity;
+        if (item.weight_per_piece_kg !== undefined) {
+            item.total_weight_kg = Math.round(item.weight_per_piece_kg * delta.current_quantity * 1000) / 1000;
+        }
+        if (delta.location_id !== undefined) {
+            item.location = { ...(item.location || {}), id: delta.location_id, name: delta.location_name };
+        }
+        this.renderInventorySummary();
+    }
+
     startAutoRefresh() {
-        // 5分ごとに自動更新
+        // 5分ごとに自動更新（在庫イベント受信中は在庫切れ予測などExcel由来の更新のみが目的）
         setInterval(() => {
             this.loadAll();
         }, 5 * 60 * 1000);
@@ -54,23 +85,19 @@ class DashboardPage {
     async loadAll() {
         this.setRefreshState(true);
         try {
-            const [inventoryGroups, materialsCount, inventoryItems, recentMovements, stockAlerts, forecasts, pendingPOItems] = await Promise.all([
-                APIClient.getInventoryGroups({ include_inactive_groups: false }),
-                APIClient.getMaterialsCount({ is_active: true }),
-                APIClient.getInventory({ limit: 20, has_stock: true, include_zero_stock: false }),
-                APIClient.getMovements({ limit: 10 }),
-                APIClient.getLowStockItems(5),
-                APIClient.getStockoutForecast(),
-                APIClient.getPendingPurchaseItems(false),
-            ]);
-
-            this.state.groups = inventoryGroups;
-            this.state.materialsCount = materialsCount?.total ?? null;
-            this.state.inventory = inventoryItems ?? [];
-            this.state.movements = recentMovements ?? [];
-            this.state.alerts = stockAlerts?.items ?? [];
-            this.state.forecasts = forecasts ?? [];
-            this.state.pendingPO = pendingPOItems ?? [];
+            const dashboard = await APIClient.getDashboard({
+                inventory_limit: 20,
+                movement_limit: 10,
+                low_stock_threshold: 5,
+            });
+
+            this.state.groups = dashboard.groups ?? [];
+            this.state.materialsCount = dashboard.materials_count?.total ?? null;
+            this.state.inventory = dashboard.inventory ?? [];
+            this.state.movements = dashboard.movements ?? [];
+            this.state.alerts = dashboard.low_stock_alerts ?? [];
+            this.state.forecasts = dashboard.forecasts ?? [];
+            this.state.pendingPO = dashboard.pending_po_items ?? [];
             this.state.lastInventoryRefresh = new Date();
 
             this.render();
@@ -199,6 +226,9 @@ class DashboardPage {
                             <span class="inline-flex items-center px-2 py-1 bg-purple-50 rounded-lg">
                                 <i class="fas fa-layer-group mr-1"></i> ${group.lot_count} ロット
                             </span>
+                            <span class="inline-flex items-center px-2 py-1 bg-pink-50 rounded-lg">
+                                <i class="fas fa-weight-hanging mr-1"></i> ${Utils.formatNumber(group.total_weight_kg || 0, 1)} kg
+                            </span>
                         </div>
                     </div>
                     <div class="text-right ml-4">
@@ -302,16 +332,16 @@ class DashboardPage {
                             <i class="fas ${iconClass} text-xl"></i>
                         </div>
                         <div class="flex-1">
-                            <p class="text-sm font-bold text-gray-900">${alert.material_name}</p>
+                            <p class="text-sm font-bold text-gray-900">${alert.scope === "group" ? `[グループ] ${alert.name}` : alert.name}</p>
                             <p class="text-xs text-gray-600 mt-1">
-                                <i class="fas fa-layer-group mr-1"></i>ロット: ${alert.lot_number}
+                                <i class="fas fa-layer-group mr-1"></i>ロット数: ${alert.lot_count}
                                 <span class="mx-2">|</span>
-                                <i class="fas fa-map-marker-alt mr-1"></i>${alert.location_name}
+                                <i class="fas fa-flag mr-1"></i>発注点: ${alert.min_quantity !== null ? `${alert.min_quantity}本` : `${alert.min_weight_kg}kg`}
                             </p>
                         </div>
                         <div class="text-right ml-3">
                             <div class="text-lg font-black ${alert.alert_level === "危険" ? "text-red-700" : "text-yellow-700"}">
-                                ${alert.current_quantity}
+                                ${alert.total_quantity}
                             </div>
                             <div class="text-xs text-gray-600 font-semibold">本</div>
                         </div>
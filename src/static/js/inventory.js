@@ -528,7 +528,7 @@ class InventoryManager {
     async showLowStock() {
         try {
             const threshold = document.getElementById('lowStockThreshold')?.value || 5;
-            const response = await fetch(`/api/inventory/low-stock?threshold=${threshold}`);
+            const response = await fetch(`/api/inventory/low-stock/?threshold=${threshold}`);
 
             if (!response.ok) {
                 throw new Error('低在庫データの取得に失敗しました');
@@ -560,12 +560,12 @@ class InventoryManager {
                 <div class="border-l-4 ${this.getAlertColor(item.alert_level)} bg-white p-4 rounded shadow-sm">
                     <div class="flex justify-between items-start">
                         <div>
-                            <h4 class="font-semibold">${item.material_name}</h4>
-                            <p class="text-sm text-gray-600">ロット: ${item.lot_number}</p>
-                            <p class="text-sm text-gray-600">置き場: ${item.location_name}</p>
+                            <h4 class="font-semibold">${item.name}${item.scope === 'group' ? '（グループ）' : ''}</h4>
+                            <p class="text-sm text-gray-600">ロット数: ${item.lot_count} / 重量: ${item.total_weight_kg}kg</p>
+                            <p class="text-sm text-gray-600">下限: ${item.min_quantity ?? '-'}本${item.min_weight_kg != null ? ` / ${item.min_weight_kg}kg` : ''}${item.source === 'default' ? '（既定値）' : ''}</p>
                         </div>
                         <div class="text-right">
-                            <div class="text-2xl font-bold ${this.getTextColor(item.alert_level)}">${item.current_quantity}</div>
+                            <div class="text-2xl font-bold ${this.getTextColor(item.alert_level)}">${item.total_quantity}</div>
                             <div class="text-sm text-gray-600">本</div>
                         </div>
                     </div>
@@ -633,22 +633,10 @@ class InventoryManager {
                 }
             });
 
-            const response = await fetch(`/api/inventory/export?${params}`);
-            if (!response.ok) {
-                throw new Error('エクスポートに失敗しました');
-            }
-
-            const blob = await response.blob();
-            const url = window.URL.createObjectURL(blob);
-            const a = document.createElement('a');
-            a.href = url;
-            a.download = `inventory_${new Date().toISOString().slice(0, 10)}.csv`;
-            document.body.appendChild(a);
-            a.click();
-            document.body.removeChild(a);
-            window.URL.revokeObjectURL(url);
+            // サーバー側で逐次出力されるため、Blobに溜めずブラウザのダウンロードに任せる
+            window.location.href = `/api/inventory/export/?${params}`;
 
-            this.showToast('在庫データをエクスポートしました', 'success');
+            this.showToast('在庫データのエクスポートを開始しました', 'success');
         } catch (error) {
             this.showToast(error.message, 'error');
         }
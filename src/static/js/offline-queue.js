@@ -0,0 +1,132 @@
+/**
+ * 入出庫のオフライン送信キュー（IndexedDB）
+ * 通信できない間の入出庫を端末に保留し、再接続時に /api/movements/replay/ へまとめて送る
+ * 操作ごとに Idempotency-Key を付けるため、同じ操作を何度送っても二重登録されない
+ *
+ * 使い方:
+ *   await OfflineQueue.enqueue({ kind: "out", item_id: 1, quantity: 2 });
+ *   OfflineQueue.on("flushed", (result) => { ... });   // succeeded, failed, results
+ */
+class OfflineQueue {
+    static DB_NAME = "matemane-offline";
+    static STORE = "movements";
+    static MAX_BATCH = 200;
+    static db = null;
+    static flushing = false;
+    static handlers = { flushed: [], change: [] };
+
+    static newKey() {
+        if (window.crypto && typeof window.crypto.randomUUID === "function") {
+            return window.crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+    }
+
+    static open() {
+        if (this.db) return Promise.resolve(this.db);
+        return new Promise((resolve, reject) => {
+            const request = indexedDB.open(this.DB_NAME, 1);
+            request.onupgradeneeded = () => {
+                request.result.createObjectStore(this.STORE, { keyPath: "idempotency_key" });
+            };
+            request.onsuccess = () => {
+                this.db = request.result;
+                resolve(this.db);
+            };
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    static async transaction(mode, fn) {
+        const db = await this.open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(this.STORE, mode);
+            const result = fn(tx.objectStore(this.STORE));
+            tx.oncomplete = () => resolve(result && "result" in result ? result.result : undefined);
+            tx.onerror = () => reject(tx.error);
+        });
+    }
+
+    /**
+     * 操作を保留（idempotency_key 未指定時は採番）
+     */
+    static async enqueue(operation) {
+        const entry = {
+            idempotency_key: operation.idempotency_key || this.newKey(),
+            queued_at: Date.now(),
+            ...operation,
+        };
+        await this.transaction("readwrite", (store) => store.put(entry));
+        this.emit("change", await this.count());
+        return entry;
+    }
+
+    static async list() {
+        const entries = await this.transaction("readonly", (store) => store.getAll());
+        return (entries || []).sort((a, b) => a.queued_at - b.queued_at);
+    }
+
+    static async count() {
+        return this.transaction("readonly", (store) => store.count());
+    }
+
+    static async remove(keys) {
+        if (!keys.length) return;
+        await this.transaction("readwrite", (store) => keys.forEach((key) => store.delete(key)));
+    }
+
+    /**
+     * 保留中の操作を送信し、結果が確定したもの（成功・業務エラー）をキューから削除
+     * 通信エラーやサーバーエラー（5xx）の操作は次回再送する
+     */
+    static async flush() {
+        if (this.flushing || !navigator.onLine) return null;
+        this.flushing = true;
+        try {
+            const entries = (await this.list()).slice(0, this.MAX_BATCH);
+            if (!entries.length) return null;
+
+            const operations = entries.map(({ queued_at, ...operation }) => operation);
+            const result = await APIClient.replayMovements(operations);
+            const settled = result.results
+                .filter((r) => r.status_code < 500)
+                .map((r) => r.idempotency_key);
+            await this.remove(settled);
+
+            this.emit("flushed", result);
+            this.emit("change", await this.count());
+            return result;
+        } catch (error) {
+            console.warn("保留中の入出庫の送信に失敗しました", error);
+            return null;
+        } finally {
+            this.flushing = false;
+        }
+    }
+
+    static on(name, handler) {
+        (this.handlers[name] || []).push(handler);
+    }
+
+    static emit(name, payload) {
+        (this.handlers[name] || []).forEach((handler) => {
+            try {
+                handler(payload);
+            } catch (error) {
+                console.error(error);
+            }
+        });
+    }
+
+    /**
+     * 通信エラー（サーバーに届かなかった）かどうか
+     */
+    static isNetworkError(error) {
+        return error instanceof TypeError || !navigator.onLine;
+    }
+}
+
+if (typeof indexedDB !== "undefined") {
+    window.addEventListener("online", () => OfflineQueue.flush());
+    window.addEventListener("load", () => OfflineQueue.flush());
+}
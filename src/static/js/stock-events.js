@@ -0,0 +1,76 @@
+/**
+ * 在庫変更イベント受信（Server-Sent Events）
+ * /api/events/ からの差分を受け取り、画面側に通知する
+ *
+ * 使い方:
+ *   StockEvents.on("change", (delta) => { ... });   // item_id, current_quantity, location_id など
+ *   StockEvents.on("resync", () => { ... });        // 差分を取りこぼしたため全件再取得が必要
+ */
+class StockEvents {
+    static source = null;
+    static handlers = { change: [], resync: [], open: [], error: [] };
+    static connected = false;
+
+    static EVENT_TYPES = [
+        "in", "out", "relocate", "movement_update", "movement_delete",
+        "inspection", "receive", "receive_update", "receive_delete",
+    ];
+
+    /**
+     * 接続開始（複数回呼ばれても1接続のみ）
+     */
+    static connect() {
+        if (this.source || typeof EventSource === "undefined") {
+            return;
+        }
+
+        this.source = new EventSource("/api/events/");
+
+        this.source.onopen = () => {
+            const reconnected = this.connected === false && this._everConnected;
+            this.connected = true;
+            this._everConnected = true;
+            this.emit("open");
+            // 切断中の変更は受け取れていないため再取得させる
+            if (reconnected) {
+                this.emit("resync");
+            }
+        };
+
+        this.source.onerror = () => {
+            this.connected = false;
+            this.emit("error");
+        };
+
+        this.EVENT_TYPES.forEach((type) => {
+            this.source.addEventListener(type, (e) => this.handleMessage(e));
+        });
+        this.source.addEventListener("resync", () => this.emit("resync"));
+    }
+
+    static handleMessage(e) {
+        try {
+            this.emit("change", JSON.parse(e.data));
+        } catch (error) {
+            console.warn("在庫イベントの解析に失敗しました", error);
+        }
+    }
+
+    static on(name, handler) {
+        this.connect();
+        (this.handlers[name] ||= []).push(handler);
+    }
+
+    static emit(name, payload) {
+        (this.handlers[name] || []).forEach((handler) => {
+            try {
+                handler(payload);
+            } catch (error) {
+                console.error("在庫イベント処理エラー", error);
+            }
+        });
+    }
+}
+
+// グローバルに利用可能にする
+window.StockEvents = StockEvents;
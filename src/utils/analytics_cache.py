@@ -0,0 +1,172 @@
+"""
+集計（/api/analytics）結果のメモリキャッシュ
+
+分析画面では同じ絞り込み条件（材料・グループ・購入月範囲・仕入先など）を何度も切り替えるため、
+「エンドポイント + 正規化した条件 + データ版数」をキーに集計結果を LRU で保持する。
+
+データ版数は movements / lots / items / materials（と材料グループ所属・材料別在庫集計）への
+書き込みがコミットされるたびに進めるため、書き込みがない間の同じ条件はメモリから返し、
+書き込み後は自然に再計算される（古い版数のエントリは LRU で追い出される）。
+DuckDB バックエンドで集計している場合は、DuckDB の更新回数を版数として使う。
+
+プロセス内の版数は他のワーカーや CLI スクリプト（履歴アーカイブ・発注 Excel 取込など）の書き込みを
+検知できないため、版数には DB から読む指紋（movements の最大ID・各テーブルの最終更新日時など）も含める。
+入出庫の修正・削除は在庫（items / material_stock）の更新日時に表れる。
+指紋で拾えない変更（更新日時のない列だけの書き換えなど）に備え、エントリは ANALYTICS_CACHE_TTL_SEC で期限切れにする。
+"""
+
+import functools
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, Callable, Optional
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.db.models import Item, Lot, Material, MaterialGroupMember, MaterialStock, Movement
+from src.utils import analytics_duckdb
+
+WATCHED_MODELS = (Movement, Lot, Item, Material, MaterialGroupMember, MaterialStock)
+_WATCHED_TABLES = {model.__tablename__ for model in WATCHED_MODELS}
+
+_entries: "OrderedDict[tuple, Any]" = OrderedDict()
+_lock = threading.Lock()
+_version = 0
+
+cache_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expired": 0}
+
+
+def _fingerprint(db: Session) -> tuple:
+    """他プロセスの書き込みも反映される DB 側の版数（1回の SELECT）"""
+    row = db.execute(select(
+        select(func.max(Movement.id)).scalar_subquery(),
+        select(func.max(Lot.updated_at)).scalar_subquery(),
+        select(func.max(Item.updated_at)).scalar_subquery(),
+        select(func.max(Material.updated_at)).scalar_subquery(),
+        select(func.max(MaterialStock.updated_at)).scalar_subquery(),
+        select(func.count(MaterialGroupMember.id)).scalar_subquery(),
+        select(func.max(MaterialGroupMember.id)).scalar_subquery(),
+    )).one()
+    return tuple(_normalize(value) for value in row)
+
+
+def data_version(db: Optional[Session] = None) -> tuple:
+    if analytics_duckdb.active():
+        return ("duckdb", analytics_duckdb.stats["refreshes"])
+    if db is None:
+        return ("db", _version)
+    return ("db", _version, *_fingerprint(db))
+
+
+def bump_version() -> None:
+    """集計対象のデータが変わったことを記録"""
+    global _version
+    with _lock:
+        _version += 1
+
+
+def _normalize(value):
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.strip() or None
+    return value
+
+
+def make_key(endpoint: str, filters: dict) -> tuple:
+    """未指定（None・空文字）の条件を除き、並びを揃えたキー"""
+    normalized = tuple(sorted(
+        (name, _normalize(value)) for name, value in filters.items()
+        if _normalize(value) is not None
+    ))
+    return (endpoint, normalized)
+
+
+def cached(endpoint: str) -> Callable:
+    """集計エンドポイント用デコレータ（db 以外の引数を条件としてキャッシュ）"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if settings.analytics_cache_size <= 0 or args:
+                return await func(*args, **kwargs)
+
+            version = data_version(kwargs.get("db"))
+            key = make_key(endpoint, {name: value for name, value in kwargs.items() if name != "db"}) + (version,)
+            with _lock:
+                entry = _entries.get(key)
+                if entry is not None and time.monotonic() - entry[0] > settings.analytics_cache_ttl_sec:
+                    del _entries[key]
+                    cache_stats["expired"] += 1
+                    entry = None
+                if entry is not None:
+                    _entries.move_to_end(key)
+                    cache_stats["hits"] += 1
+                    return entry[1]
+                cache_stats["misses"] += 1
+
+            # 計算前の版数で保存するため、計算中に書き込みがあった結果が次回以降に使われることはない
+            result = await func(*args, **kwargs)
+            with _lock:
+                _entries[key] = (time.monotonic(), result)
+                cache_stats["stores"] += 1
+                while len(_entries) > settings.analytics_cache_size:
+                    _entries.popitem(last=False)
+                    cache_stats["evictions"] += 1
+            return result
+        return wrapper
+    return decorator
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+def get_stats() -> dict:
+    lookups = cache_stats["hits"] + cache_stats["misses"]
+    return {
+        **cache_stats,
+        "hit_rate": round(cache_stats["hits"] / lookups, 3) if lookups else 0.0,
+        "size": len(_entries),
+        "max_size": settings.analytics_cache_size,
+        "ttl_sec": settings.analytics_cache_ttl_sec,
+        "version": list(data_version()),
+    }
+
+
+# ========================================
+# 書き込みの検知（ORM の変更・UPDATE/DELETE 文の両方）
+# ========================================
+
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, WATCHED_MODELS):
+            session.info["analytics_changed"] = True
+            return
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.local_table.name in _WATCHED_TABLES:
+        orm_execute_state.session.info["analytics_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _on_commit(session):
+    if session.info.pop("analytics_changed", False):
+        bump_version()
+
+
+@event.listens_for(Session, "after_rollback")
+def _on_rollback(session):
+    session.info.pop("analytics_changed", None)
@@ -0,0 +1,446 @@
+"""
+集計（/api/analytics）用の組み込み DuckDB バックエンド
+
+ANALYTICS_BACKEND=duckdb のとき、集計・グラフのエンドポイントを本番DB（MySQL）ではなく
+ローカルの DuckDB ファイル（ANALYTICS_DUCKDB_PATH）から返す。重量・金額の計算も SQL で行うため、
+年単位の期間でも現場の入出庫トランザクションと DB を取り合わない。
+
+DuckDB は差分 Parquet エクスポート（parquet_export）の出力とアーカイブ済みの入出庫履歴から
+ANALYTICS_DUCKDB_REFRESH_SEC 秒ごとに作り直す。本番DBからは差分の行と、削除を反映するための
+ID一覧のみを読む。サーバーがエクスポートも行うため、export_parquet スクリプトを別途定期実行しないこと。
+
+初回の作成が終わるまで（または duckdb が未インストールの場合）は MySQL で集計する。
+"""
+
+import logging
+import threading
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select
+
+from src.config import settings
+from src.utils import history_archive, parquet_export
+
+logger = logging.getLogger(__name__)
+
+_conn = None
+_ready = False
+_refresh_lock = threading.Lock()
+_stopping = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+stats = {"refreshes": 0, "last_refresh_ms": None, "last_refreshed_at": None, "errors": 0}
+
+# 集計で使うテーブル（material_group_members は小さいため毎回全件コピー）
+SNAPSHOT_TABLES = ("materials", "lots", "items")
+
+
+def _weight(quantity: str, material: str = "m", lot: str = "l") -> str:
+    """本数分の重量 kg（analytics._calculate_weight_kg と同じ計算・同じく小数3桁に丸める）"""
+    return f"""
+    ROUND({quantity} * CASE {material}.shape
+        WHEN 'round' THEN pi() * pow({material}.diameter_mm / 20.0, 2) * ({lot}.length_mm / 10.0)
+        WHEN 'hexagon' THEN (3 * sqrt(3) / 2) * pow({material}.diameter_mm / 20.0, 2) * ({lot}.length_mm / 10.0)
+        WHEN 'square' THEN pow({material}.diameter_mm / 10.0, 2) * ({lot}.length_mm / 10.0)
+        ELSE 0
+    END * {material}.current_density / 1000.0, 3)
+    """
+
+
+def _amount(quantity: str) -> str:
+    """本数分の金額（単価 → 入庫金額/本数 → 入庫金額/重量 の順）"""
+    return f"""
+    (CASE
+        WHEN l.received_unit_price IS NOT NULL THEN l.received_unit_price * {quantity}
+        WHEN l.received_amount IS NOT NULL AND l.initial_quantity > 0
+            THEN l.received_amount / l.initial_quantity * {quantity}
+        WHEN l.received_amount IS NOT NULL AND l.initial_weight_kg > 0
+            THEN l.received_amount / l.initial_weight_kg * {_weight(quantity)}
+        ELSE 0
+    END)
+    """
+
+
+def enabled() -> bool:
+    return settings.analytics_backend == "duckdb"
+
+
+def active() -> bool:
+    """DuckDB で集計できる状態か"""
+    return enabled() and _ready
+
+
+def _connect():
+    global _conn
+    if _conn is None:
+        import duckdb
+
+        path = Path(settings.analytics_duckdb_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _conn = duckdb.connect(str(path))
+    return _conn
+
+
+def _parquet_source(conn, table: str, alias: str) -> str:
+    files = list((Path(settings.parquet_export_dir) / table).glob("month=*/*.parquet"))
+    if files:
+        pattern = (Path(settings.parquet_export_dir) / table / "month=*" / "*.parquet").as_posix()
+        return f"read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)"
+    # まだ1行も書き出していないテーブルは空のテーブルとして扱う
+    conn.register(alias, parquet_export._schema(table).empty_table())
+    return f"(SELECT *, NULL::VARCHAR AS month FROM {alias})"
+
+
+def _live_ids(db, table: str):
+    import pyarrow as pa
+
+    model = parquet_export.TABLES[table][0]
+    ids = db.execute(select(model.__table__.c.id)).scalars().all()
+    return pa.table({"id": pa.array(ids, type=pa.int64())})
+
+
+def refresh() -> dict:
+    """差分を Parquet へ書き出し、DuckDB の集計用テーブルを作り直す"""
+    global _ready
+    import pyarrow as pa
+
+    from src.db import SessionLocal
+    from src.db.models import MaterialGroupMember
+
+    with _refresh_lock:
+        started = time.perf_counter()
+        with SessionLocal() as db:
+            parquet_export.export(db, list(SNAPSHOT_TABLES) + ["movements"])
+            live = {table: _live_ids(db, table) for table in SNAPSHOT_TABLES + ("movements",)}
+            members = db.execute(
+                select(MaterialGroupMember.group_id, MaterialGroupMember.material_id)
+            ).all()
+            db.rollback()
+
+        conn = _connect().cursor()
+        try:
+            for table, ids in live.items():
+                conn.register(f"live_{table}", ids)
+            conn.register("group_members_source", pa.table({
+                "group_id": pa.array([m.group_id for m in members], type=pa.int64()),
+                "material_id": pa.array([m.material_id for m in members], type=pa.int64()),
+            }))
+
+            conn.execute("BEGIN TRANSACTION")
+            for table in SNAPSHOT_TABLES:
+                # 更新のたびに版が追記されるため、id ごとに最新の版を使う（削除済みの行は除く）
+                source = _parquet_source(conn, table, f"empty_{table}")
+                conn.execute(f"""
+                    CREATE OR REPLACE TABLE {table} AS
+                    SELECT * EXCLUDE (_rn, _exported_at, month) FROM (
+                        SELECT *, row_number() OVER (PARTITION BY id ORDER BY _exported_at DESC) AS _rn
+                        FROM {source}
+                    ) WHERE _rn = 1 AND id IN (SELECT id FROM live_{table})
+                """)
+
+            source = _parquet_source(conn, "movements", "empty_movements")
+            archived = history_archive.archived_months("movements")
+            archive_sql = ""
+            if archived:
+                pattern = (Path(settings.archive_dir) / "movements" / "*.parquet").as_posix()
+                archive_sql = f"""
+                    UNION ALL
+                    SELECT id, item_id, movement_type, quantity, processed_at
+                    FROM read_parquet('{pattern}')
+                    WHERE id NOT IN (SELECT id FROM live_movements)
+                """
+            # 編集された入出庫履歴は新しい版が追記されるため、id ごとに最新の版を使う
+            conn.execute(f"""
+                CREATE OR REPLACE TABLE movements AS
+                SELECT id, item_id, movement_type, quantity, processed_at FROM (
+                    SELECT *, row_number() OVER (PARTITION BY id ORDER BY _exported_at DESC) AS _rn
+                    FROM {source}
+                ) WHERE _rn = 1 AND id IN (SELECT id FROM live_movements)
+                {archive_sql}
+            """)
+            conn.execute(
+                "CREATE OR REPLACE TABLE material_group_members AS SELECT * FROM group_members_source"
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        _ready = True
+        stats["refreshes"] += 1
+        stats["last_refresh_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        stats["last_refreshed_at"] = datetime.now().isoformat(timespec="seconds")
+        return dict(stats)
+
+
+def _run() -> None:
+    while not _stopping.is_set():
+        try:
+            refresh()
+        except Exception as e:
+            stats["errors"] += 1
+            logger.error(f"集計用 DuckDB の更新に失敗しました: {e}")
+        _stopping.wait(settings.analytics_duckdb_refresh_sec)
+
+
+def start() -> None:
+    """定期更新スレッドを開始（ANALYTICS_BACKEND=duckdb の場合のみ）"""
+    global _thread
+    if not enabled() or _thread is not None:
+        return
+    try:
+        import duckdb  # noqa: F401
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logger.error("ANALYTICS_BACKEND=duckdb には duckdb と pyarrow が必要です（MySQL で集計します）")
+        return
+    _stopping.clear()
+    _thread = threading.Thread(target=_run, name="analytics-duckdb", daemon=True)
+    _thread.start()
+
+
+def stop() -> None:
+    global _thread, _conn
+    _stopping.set()
+    if _thread is not None:
+        _thread.join(10)
+        _thread = None
+    with _refresh_lock:
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+
+# ========================================
+# 集計クエリ（/api/analytics と同じ条件・同じ形の値を返す）
+# ========================================
+
+def _query(sql: str, params: list) -> list:
+    conn = _connect().cursor()
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def _day_start(day: Optional[date]) -> Optional[datetime]:
+    return datetime.combine(day, datetime.min.time()) if day else None
+
+
+def _day_end(day: Optional[date]) -> Optional[datetime]:
+    return datetime.combine(day, datetime.max.time()) if day else None
+
+
+class _Filters:
+    """WHERE 句とパラメータを組み立てる"""
+
+    def __init__(self):
+        self.clauses: List[str] = []
+        self.params: list = []
+
+    def add(self, clause: str, value) -> "_Filters":
+        if value is not None and value != "":
+            self.clauses.append(clause)
+            self.params.append(value)
+        return self
+
+    def sql(self, prefix: str = "AND") -> str:
+        return "".join(f" {prefix} {clause}" for clause in self.clauses)
+
+
+def _lot_filters(
+    purchase_month: Optional[str] = None,
+    purchase_month_start: Optional[str] = None,
+    purchase_month_end: Optional[str] = None,
+    supplier: Optional[str] = None,
+) -> _Filters:
+    return (
+        _Filters()
+        .add("l.purchase_month = ?", purchase_month)
+        .add("l.purchase_month >= ?", purchase_month_start)
+        .add("l.purchase_month <= ?", purchase_month_end)
+        .add("l.supplier ILIKE '%' || ? || '%'", supplier)
+    )
+
+
+def _material_filters(material_name: Optional[str], material_group_id: Optional[int]) -> _Filters:
+    return (
+        _Filters()
+        .add("m.display_name ILIKE '%' || ? || '%'", material_name)
+        .add("m.id IN (SELECT material_id FROM material_group_members WHERE group_id = ?)", material_group_id)
+    )
+
+
+def summary(
+    start_date: Optional[date], end_date: Optional[date],
+    material_name: Optional[str], material_group_id: Optional[int],
+    purchase_month: Optional[str], purchase_month_start: Optional[str], purchase_month_end: Optional[str],
+    supplier: Optional[str], movement_type: Optional[str],
+) -> List[dict]:
+    """材料別集計（MaterialSummary の値の一覧）"""
+    materials = _material_filters(material_name, material_group_id)
+    lots = _lot_filters(purchase_month, purchase_month_start, purchase_month_end, supplier)
+    lots.add("l.received_date >= ?", _day_start(start_date)).add("l.received_date <= ?", _day_end(end_date))
+    moves = (
+        _Filters()
+        .add("mv.movement_type = ?", movement_type)
+        .add("mv.processed_at >= ?", _day_start(start_date))
+        .add("mv.processed_at <= ?", _day_end(end_date))
+    )
+
+    rows = _query(f"""
+        WITH m AS (
+            SELECT * FROM materials m WHERE m.is_active {materials.sql()}
+        ),
+        l AS (
+            SELECT l.id, l.material_id, l.received_amount, l.length_mm, m.shape, m.diameter_mm, m.current_density
+            FROM lots l JOIN m ON m.id = l.material_id
+            WHERE TRUE {lots.sql()}
+        ),
+        i AS (
+            SELECT i.id, i.current_quantity, l.material_id, l.length_mm, l.shape, l.diameter_mm, l.current_density
+            FROM items i JOIN l ON l.id = i.lot_id
+            WHERE i.is_active
+        ),
+        stock AS (
+            SELECT material_id,
+                   SUM(current_quantity) AS quantity,
+                   SUM(CASE WHEN current_quantity > 0 THEN {_weight("current_quantity", "l")} ELSE 0 END) AS weight
+            FROM i AS l GROUP BY material_id
+        ),
+        moved AS (
+            SELECT l.material_id,
+                   SUM(CASE WHEN mv.movement_type = 'in' THEN mv.quantity ELSE 0 END) AS in_quantity,
+                   SUM(CASE WHEN mv.movement_type = 'in' AND mv.quantity > 0 THEN {_weight("mv.quantity", "l")} ELSE 0 END) AS in_weight,
+                   SUM(CASE WHEN mv.movement_type = 'out' THEN mv.quantity ELSE 0 END) AS out_quantity,
+                   SUM(CASE WHEN mv.movement_type = 'out' AND mv.quantity > 0 THEN {_weight("mv.quantity", "l")} ELSE 0 END) AS out_weight
+            FROM movements mv JOIN i AS l ON l.id = mv.item_id
+            WHERE TRUE {moves.sql()}
+            GROUP BY l.material_id
+        ),
+        amount AS (
+            SELECT material_id, SUM(COALESCE(received_amount, 0)) AS amount FROM l GROUP BY material_id
+        )
+        SELECT m.id, m.display_name,
+               COALESCE(stock.quantity, 0), COALESCE(stock.weight, 0),
+               COALESCE(moved.in_quantity, 0), COALESCE(moved.in_weight, 0),
+               COALESCE(moved.out_quantity, 0), COALESCE(moved.out_weight, 0),
+               COALESCE(amount.amount, 0)
+        FROM m
+        LEFT JOIN stock ON stock.material_id = m.id
+        LEFT JOIN moved ON moved.material_id = m.id
+        LEFT JOIN amount ON amount.material_id = m.id
+        ORDER BY m.id
+    """, materials.params + lots.params + moves.params)
+
+    return [
+        {
+            "material_id": row[0],
+            "material_name": row[1],
+            "current_stock_quantity": int(row[2]),
+            "current_stock_weight_kg": round(float(row[3]), 3),
+            "total_in_quantity": int(row[4]),
+            "total_in_weight_kg": round(float(row[5]), 3),
+            "total_out_quantity": int(row[6]),
+            "total_out_weight_kg": round(float(row[7]), 3),
+            "total_amount": round(float(row[8]), 2),
+        }
+        for row in rows
+    ]
+
+
+def timeline(
+    start_date: Optional[date], end_date: Optional[date], material_id: Optional[int]
+) -> List[Tuple[date, str, int]]:
+    """日別・入出庫種別ごとの本数"""
+    filters = (
+        _Filters()
+        .add("mv.processed_at >= ?", _day_start(start_date))
+        .add("mv.processed_at <= ?", _day_end(end_date))
+        .add("l.material_id = ?", material_id)
+    )
+    return _query(f"""
+        SELECT CAST(mv.processed_at AS DATE) AS day, mv.movement_type, SUM(mv.quantity)
+        FROM movements mv
+        JOIN items i ON i.id = mv.item_id
+        JOIN lots l ON l.id = i.lot_id
+        WHERE TRUE {filters.sql()}
+        GROUP BY day, mv.movement_type
+        ORDER BY day
+    """, filters.params)
+
+
+def supplier_amount(
+    start_date: Optional[date], end_date: Optional[date],
+    purchase_month: Optional[str], purchase_month_start: Optional[str], purchase_month_end: Optional[str],
+) -> List[Tuple[str, float]]:
+    """仕入先別の入庫金額（上位10件）"""
+    filters = _lot_filters(purchase_month, purchase_month_start, purchase_month_end)
+    filters.add("l.received_date >= ?", _day_start(start_date)).add("l.received_date <= ?", _day_end(end_date))
+    return _query(f"""
+        SELECT l.supplier, COALESCE(SUM(l.received_amount), 0) AS total_amount
+        FROM lots l
+        WHERE l.supplier IS NOT NULL {filters.sql()}
+        GROUP BY l.supplier
+        ORDER BY total_amount DESC
+        LIMIT 10
+    """, filters.params)
+
+
+def purchase_month_amount(
+    purchase_month_start: Optional[str], purchase_month_end: Optional[str]
+) -> List[Tuple[str, float]]:
+    """購入月別の入庫金額"""
+    filters = _lot_filters(purchase_month_start=purchase_month_start, purchase_month_end=purchase_month_end)
+    return _query(f"""
+        SELECT l.purchase_month, COALESCE(SUM(l.received_amount), 0)
+        FROM lots l
+        WHERE l.purchase_month IS NOT NULL {filters.sql()}
+        GROUP BY l.purchase_month
+        ORDER BY l.purchase_month
+    """, filters.params)
+
+
+def inventory_amount(
+    material_name: Optional[str], material_group_id: Optional[int],
+    purchase_month: Optional[str], purchase_month_start: Optional[str], purchase_month_end: Optional[str],
+    supplier: Optional[str],
+) -> List[Tuple[str, float]]:
+    """材料別の在庫金額（金額が0の材料は除く）"""
+    materials = _material_filters(material_name, material_group_id)
+    lots = _lot_filters(purchase_month, purchase_month_start, purchase_month_end, supplier)
+    return _query(f"""
+        SELECT m.display_name, SUM({_amount("i.current_quantity")}) AS total_value
+        FROM materials m
+        JOIN lots l ON l.material_id = m.id
+        JOIN items i ON i.lot_id = l.id
+        WHERE m.is_active AND i.is_active AND i.current_quantity > 0 {materials.sql()} {lots.sql()}
+        GROUP BY m.id, m.display_name
+        HAVING total_value > 0
+        ORDER BY m.id
+    """, materials.params + lots.params)
+
+
+def outgoing_amount(
+    start_date: Optional[date], end_date: Optional[date], material_id: Optional[int],
+    purchase_month: Optional[str], purchase_month_start: Optional[str], purchase_month_end: Optional[str],
+) -> List[Tuple[date, float]]:
+    """日別の出庫金額"""
+    filters = _lot_filters(purchase_month, purchase_month_start, purchase_month_end)
+    filters.add("mv.processed_at >= ?", _day_start(start_date)).add("mv.processed_at <= ?", _day_end(end_date))
+    filters.add("l.material_id = ?", material_id)
+    return _query(f"""
+        SELECT CAST(mv.processed_at AS DATE) AS day, SUM({_amount("mv.quantity")})
+        FROM movements mv
+        JOIN items i ON i.id = mv.item_id
+        JOIN lots l ON l.id = i.lot_id
+        JOIN materials m ON m.id = l.material_id
+        WHERE mv.movement_type = 'out' AND mv.quantity > 0 {filters.sql()}
+        GROUP BY day
+        ORDER BY day
+    """, filters.params)
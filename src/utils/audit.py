@@ -0,0 +1,324 @@
+"""
+監査ログの非同期書き込み（write-behind）
+
+業務処理のトランザクションでは監査ログを INSERT せず、コミット後に record() で構造化イベントを渡す。
+イベントはスプールファイル（JSON Lines）に追記してから上限付きキューに積み、
+バックグラウンドスレッドが一定件数・一定間隔ごとに複数行 INSERT でまとめて書き込む。
+
+- スプールファイルには書き込み済み位置（チェックポイント）を別ファイルで記録し、
+  起動時に書き込みスレッドが未書き込み分を再投入するため、プロセスが落ちてもイベントは失われない
+  （書き込み直後・チェックポイント更新前に落ちた場合のみ、そのバッチが重複し得る）
+- キューが満杯の間はスプールへの追記のみ行い、書き込みスレッドがスプールから読み直して追いつく
+- 全件書き込み済みになった時点でスプールを空にする
+
+スプールファイルは1プロセス専用のため、複数ワーカーで起動する場合は AUDIT_SPOOL_PATH をワーカーごとに分けること。
+IPアドレス・ユーザーエージェントはミドルウェアで設定したリクエスト情報から取得する。
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert
+
+from src.config import settings
+
+logger = logging.getLogger(__name__)
+
+request_info: ContextVar[Optional[dict]] = ContextVar("audit_request_info", default=None)
+
+_queue: "queue.Queue[Tuple[dict, int]]" = queue.Queue(maxsize=max(settings.audit_queue_size, 1))
+_lock = threading.Lock()
+_wake = threading.Event()
+_stopping = threading.Event()
+_thread: Optional[threading.Thread] = None
+_spool = None
+_overflow_from: Optional[int] = None
+_checkpoint = 0
+
+stats = {"recorded": 0, "written": 0, "batches": 0, "overflow": 0, "replayed": 0, "errors": 0}
+
+
+def _spool_path() -> Path:
+    return Path(settings.audit_spool_path)
+
+
+def _checkpoint_path() -> Path:
+    return _spool_path().with_suffix(_spool_path().suffix + ".offset")
+
+
+def _open_spool():
+    global _spool
+    if _spool is None:
+        path = _spool_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _spool = open(path, "ab")
+    return _spool
+
+
+def _encode(values: Any) -> Optional[str]:
+    if values is None or isinstance(values, str):
+        return values
+    return json.dumps(jsonable_encoder(values), ensure_ascii=False)
+
+
+def set_request_info(ip_address: Optional[str], user_agent: Optional[str]):
+    """リクエスト元の情報を設定（ミドルウェアから呼び出す）"""
+    return request_info.set({"ip_address": ip_address, "user_agent": user_agent})
+
+
+class RequestInfoMiddleware:
+    """リクエスト元の IPアドレス・ユーザーエージェントを監査ログ用に保持する ASGI ミドルウェア"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        user_agent = dict(scope.get("headers") or []).get(b"user-agent", b"").decode("latin-1")
+        token = set_request_info(client[0] if client else None, user_agent or None)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_info.reset(token)
+
+
+def record(
+    action: str,
+    target_table: Optional[str] = None,
+    target_id: Optional[int] = None,
+    old_values: Any = None,
+    new_values: Any = None,
+    user_id: Optional[int] = 1,  # TODO: 認証実装後にユーザーIDを設定
+) -> None:
+    """監査イベントを記録（業務処理のコミット後に呼び出す）"""
+    global _overflow_from
+
+    info = request_info.get() or {}
+    row = {
+        "user_id": user_id,
+        "action": action,
+        "target_table": target_table,
+        "target_id": target_id,
+        "old_values": _encode(old_values),
+        "new_values": _encode(new_values),
+        "ip_address": (info.get("ip_address") or "")[:45] or None,
+        "user_agent": info.get("user_agent"),
+        "created_at": datetime.now().isoformat(),
+    }
+    line = (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+
+    with _lock:
+        spool = _open_spool()
+        start = spool.tell()
+        spool.write(line)
+        spool.flush()
+        stats["recorded"] += 1
+
+        if _overflow_from is None:
+            try:
+                _queue.put_nowait((row, spool.tell()))
+            except queue.Full:
+                _overflow_from = start
+                stats["overflow"] += 1
+                logger.warning("監査ログのキューが満杯のため、スプールファイルから書き込みます")
+        # 1バッチ分溜まったら待たずに書き込む（それまでは書き込み間隔ごとにまとめる）
+        if _overflow_from is not None or _queue.qsize() >= settings.audit_batch_size:
+            _wake.set()
+
+
+def _insert(rows: List[dict]) -> None:
+    from src.db import SessionLocal
+    from src.db.models import AuditLog
+
+    for row in rows:
+        if isinstance(row.get("created_at"), str):
+            row["created_at"] = datetime.fromisoformat(row["created_at"])
+    with SessionLocal() as db:
+        db.execute(insert(AuditLog), rows)
+        db.commit()
+
+
+def _save_checkpoint(offset: int) -> None:
+    global _checkpoint
+    _checkpoint = offset
+    path = _checkpoint_path()
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(str(offset), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _load_checkpoint() -> int:
+    try:
+        return int(_checkpoint_path().read_text(encoding="utf-8").strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _read_spool(start: int, end: Optional[int] = None) -> List[Tuple[dict, int]]:
+    """スプールの start〜end のイベントを (行, 終端位置) で返す"""
+    entries = []
+    path = _spool_path()
+    if not path.exists():
+        return entries
+    with open(path, "rb") as f:
+        f.seek(start)
+        while end is None or f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            if not line.endswith(b"\n"):
+                # 書き込み途中で落ちた末尾行は読み捨てる
+                break
+            try:
+                entries.append((json.loads(line), f.tell()))
+            except ValueError:
+                logger.warning("監査ログのスプールに読めない行があります（スキップ）")
+    return entries
+
+
+def _next_batch() -> List[Tuple[dict, int]]:
+    global _overflow_from
+
+    batch = []
+    while len(batch) < settings.audit_batch_size:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    if batch:
+        return batch
+
+    # キューが空で溢れ分がある場合は、スプールから読み直して追いつく（読み込み中は追記を止める）
+    with _lock:
+        if _overflow_from is None:
+            return []
+        start, _overflow_from = _overflow_from, None
+        return _read_spool(start, _spool.tell() if _spool else None)
+
+
+def _truncate_if_drained() -> None:
+    global _spool
+    with _lock:
+        if _overflow_from is not None or not _queue.empty():
+            return
+        if _spool is not None and _spool.tell() != _checkpoint:
+            return
+        if _spool is not None:
+            _spool.close()
+            _spool = None
+        _spool_path().write_bytes(b"")
+        _save_checkpoint(0)
+
+
+def flush() -> int:
+    """キューとスプールに溜まったイベントをすべて書き込み、書き込んだ件数を返す"""
+    written = 0
+    while True:
+        batch = _next_batch()
+        if not batch:
+            break
+        for start in range(0, len(batch), settings.audit_batch_size):
+            chunk = batch[start:start + settings.audit_batch_size]
+            _insert([row for row, _ in chunk])
+            _save_checkpoint(chunk[-1][1])
+            written += len(chunk)
+            stats["written"] += len(chunk)
+            stats["batches"] += 1
+    if written:
+        _truncate_if_drained()
+    return written
+
+
+def _replay(end: int) -> None:
+    try:
+        replay_spool(end)
+    except Exception as e:
+        logger.error(f"監査ログのスプール再投入に失敗しました: {e}")
+        _requeue_from_checkpoint()
+
+
+def _run(replay_end: int) -> None:
+    # 前回の未書き込み分は起動を待たせないよう書き込みスレッドで書き込む。
+    # 起動後に記録されたイベント（replay_end 以降）はキューから書き込むため重複しない
+    _replay(replay_end)
+    while not _stopping.is_set():
+        _wake.wait(settings.audit_flush_interval_sec)
+        _wake.clear()
+        try:
+            flush()
+        except Exception as e:
+            # 書き込めなかった分はスプールに残っているため、次回はスプールから読み直す
+            stats["errors"] += 1
+            logger.error(f"監査ログの書き込みに失敗しました: {e}")
+            _requeue_from_checkpoint()
+            _stopping.wait(settings.audit_flush_interval_sec)
+
+
+def _requeue_from_checkpoint() -> None:
+    """書き込み失敗時、チェックポイント以降をスプールから読み直すよう切り替える"""
+    global _overflow_from
+    with _lock:
+        while True:
+            try:
+                _queue.get_nowait()
+            except queue.Empty:
+                break
+        _overflow_from = _checkpoint
+
+
+def replay_spool(end: Optional[int] = None) -> int:
+    """起動時に前回書き込めなかったイベント（スプールの end まで）を書き込む"""
+    global _checkpoint
+    _checkpoint = _load_checkpoint()
+    entries = _read_spool(_checkpoint, end)
+    replayed = 0
+    for start in range(0, len(entries), settings.audit_batch_size):
+        chunk = entries[start:start + settings.audit_batch_size]
+        _insert([row for row, _ in chunk])
+        _save_checkpoint(chunk[-1][1])
+        replayed += len(chunk)
+    stats["replayed"] += replayed
+    _truncate_if_drained()
+    if replayed:
+        logger.info(f"監査ログのスプールから {replayed} 件を書き込みました")
+    return replayed
+
+
+def start() -> None:
+    """書き込みスレッドを開始（スレッド内で前回の未書き込み分を先に書き込む）"""
+    global _thread
+    if _thread is not None:
+        return
+    try:
+        replay_end = _spool_path().stat().st_size
+    except FileNotFoundError:
+        replay_end = 0
+    _stopping.clear()
+    _thread = threading.Thread(target=_run, args=(replay_end,), name="audit-writer", daemon=True)
+    _thread.start()
+
+
+def stop(timeout: float = 10.0) -> None:
+    """書き込みスレッドを停止し、残りを書き込む"""
+    global _thread
+    if _thread is None:
+        return
+    _stopping.set()
+    _wake.set()
+    _thread.join(timeout)
+    _thread = None
+    try:
+        flush()
+    except Exception as e:
+        logger.error(f"監査ログの書き込みに失敗しました（スプールに残し、次回起動時に書き込みます）: {e}")
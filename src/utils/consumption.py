@@ -0,0 +1,168 @@
+"""
+材料ごとの消費ペース（material_consumption）
+
+日別の出庫本数の指数移動平均（EWMA）を材料ごとに保持し、現在庫と合わせて
+「あと何日もつか」を入出庫履歴を読まずに返せるようにする。
+
+- 前日までの確定した日だけを反映する（当日分は翌日以降に反映）
+- 反映済みの日（through_date）より後の出庫だけを日別に集計して加算するため、
+  毎日の更新で読むのは前回以降の出庫のみ
+- 出庫のない日は 0本として減衰させる（半減期 CONSUMPTION_HALF_LIFE_DAYS 日）
+- 初回は CONSUMPTION_WARMUP_DAYS 日前から計算する
+
+過去の出庫を修正・削除した場合は `python -m src.scripts.rebuild_material_consumption` で作り直す
+（アーカイブ済みの月の出庫も含めて計算する）。
+"""
+
+import logging
+import math
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.db.models import Item, Lot, Material, MaterialConsumption, MaterialStock, Movement, MovementType
+from src.utils import history_archive
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+
+def _decay() -> float:
+    """1日あたりの減衰率（1 - α）"""
+    return 0.5 ** (1.0 / max(settings.consumption_half_life_days, 0.1))
+
+
+def _daily_out(db: Session, start: date, end: date) -> Dict[int, Dict[date, int]]:
+    """start〜end（両端含む）の材料別・日別の出庫本数"""
+    day = func.date(Movement.processed_at)
+    rows = db.query(
+        Lot.material_id, day.label("day"), func.sum(Movement.quantity)
+    ).select_from(Movement).join(
+        Item, Movement.item_id == Item.id
+    ).join(
+        Lot, Item.lot_id == Lot.id
+    ).filter(
+        Movement.movement_type == MovementType.OUT,
+        Movement.processed_at >= datetime.combine(start, datetime.min.time()),
+        Movement.processed_at < datetime.combine(end + timedelta(days=1), datetime.min.time()),
+    ).group_by(Lot.material_id, day).all()
+
+    result: Dict[int, Dict[date, int]] = defaultdict(lambda: defaultdict(int))
+    for material_id, day_value, quantity in rows:
+        if not isinstance(day_value, date):
+            day_value = date.fromisoformat(str(day_value))
+        result[material_id][day_value] += int(quantity or 0)
+
+    # 作り直しなどで期間がアーカイブ済みの月にかかる場合はアーカイブ分も加える
+    archived = history_archive.read(
+        "movements",
+        datetime.combine(start, datetime.min.time()),
+        datetime.combine(end, datetime.max.time()),
+    )
+    if archived is not None:
+        archived = archived[(archived["movement_type"] == MovementType.OUT.value) & archived["material_id"].notna()]
+        grouped = archived.groupby([archived["material_id"], archived["processed_at"].dt.date])["quantity"].sum()
+        for (material_id, day_value), quantity in grouped.items():
+            result[int(material_id)][day_value] += int(quantity)
+    return result
+
+
+def update(db: Session, today: Optional[date] = None) -> int:
+    """前日までの出庫を反映し、更新した材料数を返す（反映済みなら何もしない）"""
+    through = (today or date.today()) - timedelta(days=1)
+    default_from = through - timedelta(days=settings.consumption_warmup_days)
+    if (db.query(func.min(MaterialConsumption.through_date)).scalar() or default_from) >= through:
+        return 0
+
+    with _lock:
+        rows = {
+            row.material_id: row
+            for row in db.query(MaterialConsumption).with_for_update().all()
+        }
+        start = min((row.through_date for row in rows.values()), default=default_from)
+        if start >= through:
+            db.rollback()
+            return 0
+
+        decay = _decay()
+        daily = _daily_out(db, start + timedelta(days=1), through)
+
+        for material_id in rows.keys() | daily.keys():
+            row = rows.get(material_id)
+            if row is None:
+                row = MaterialConsumption(material_id=material_id, ewma_daily_out=0.0, through_date=start)
+                db.add(row)
+
+            ewma = row.ewma_daily_out or 0.0
+            last_day = row.through_date
+            for day, quantity in sorted(daily.get(material_id, {}).items()):
+                if day <= last_day:
+                    continue
+                # 出庫のなかった日の減衰を1回でまとめて掛けてから、その日の出庫を加える
+                ewma = ewma * decay ** (day - last_day).days + (1 - decay) * quantity
+                last_day = day
+                row.last_out_date = day
+            row.ewma_daily_out = ewma * decay ** (through - last_day).days
+            row.through_date = through
+
+        db.commit()
+        updated = len(rows.keys() | daily.keys())
+        logger.info(f"材料別の消費ペースを {through} まで反映しました: {updated}件")
+        return updated
+
+
+def rebuild(db: Session, today: Optional[date] = None) -> int:
+    """全材料の消費ペースを作り直す"""
+    with _lock:
+        db.query(MaterialConsumption).delete(synchronize_session=False)
+        db.commit()
+    return update(db, today)
+
+
+def forecast(db: Session, material_ids: Optional[List[int]] = None, today: Optional[date] = None) -> List[dict]:
+    """材料ごとの消費ペースと在庫日数（保存済みの値のみで計算）"""
+    today = today or date.today()
+    query = db.query(
+        Material.id,
+        Material.display_name,
+        Material.diameter_mm,
+        func.coalesce(MaterialStock.total_quantity, 0).label("stock"),
+        MaterialConsumption.ewma_daily_out,
+        MaterialConsumption.last_out_date,
+        MaterialConsumption.through_date,
+    ).select_from(Material).join(
+        MaterialConsumption, MaterialConsumption.material_id == Material.id
+    ).outerjoin(
+        MaterialStock, MaterialStock.material_id == Material.id
+    ).filter(Material.is_active == True)
+    if material_ids is not None:
+        query = query.filter(Material.id.in_(material_ids))
+
+    results = []
+    for row in query.all():
+        daily_out = float(row.ewma_daily_out or 0.0)
+        stock = int(row.stock or 0)
+        # 0.01本/日 未満は実質的に使われていないものとして日数を出さない
+        days_of_cover = round(stock / daily_out, 1) if daily_out >= 0.01 else None
+        stockout_date = None
+        if days_of_cover is not None and days_of_cover < 3650:
+            stockout_date = (today + timedelta(days=math.floor(days_of_cover))).isoformat()
+        results.append({
+            "material_id": row.id,
+            "material_name": row.display_name,
+            "diameter_mm": row.diameter_mm,
+            "current_stock_bars": stock,
+            "daily_out_bars": round(daily_out, 3),
+            "days_of_cover": days_of_cover,
+            "projected_stockout_date": stockout_date,
+            "last_out_date": row.last_out_date.isoformat() if row.last_out_date else None,
+            "through_date": row.through_date.isoformat() if row.through_date else None,
+        })
+    results.sort(key=lambda r: (r["days_of_cover"] is None, r["days_of_cover"] or 0))
+    return results
@@ -0,0 +1,94 @@
+"""
+在庫変更イベントのクライアント配信（SSE用）
+
+stock_events の通知を接続中の各クライアントのキューに振り分ける。
+キューはクライアントごとに上限があり、溢れた場合は溜まった差分を捨てて
+"resync"（全件再取得の指示）に置き換える。遅いクライアントがサーバーのメモリを圧迫しない。
+"""
+
+import asyncio
+import itertools
+import logging
+import threading
+from typing import Optional, Set
+
+from src.config import settings
+from src.utils import stock_events
+
+logger = logging.getLogger(__name__)
+
+# クライアントに送る項目（差分として必要な最小限）
+DELTA_FIELDS = (
+    "type", "at", "item_id", "lot_id", "lot_number", "material_id",
+    "location_id", "location_name", "current_quantity", "purchase_order_item_id",
+)
+
+
+class EventClient:
+    """1接続分の送信キュー"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue_size: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def push(self, event: dict):
+        """イベントループ上で呼ばれる"""
+        if self.queue.full():
+            # 溜まった差分は捨てて全件再取得を指示する
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"id": event["id"], "type": "resync"})
+            return
+        self.queue.put_nowait(event)
+
+    async def next_event(self, timeout: float) -> Optional[dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroker:
+    def __init__(self):
+        self._clients: Set[EventClient] = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def register(self) -> Optional[EventClient]:
+        """接続登録（上限超過時は None）"""
+        with self._lock:
+            if len(self._clients) >= settings.event_stream_max_clients:
+                return None
+            client = EventClient(asyncio.get_running_loop(), settings.event_stream_queue_size)
+            self._clients.add(client)
+            return client
+
+    def unregister(self, client: EventClient):
+        with self._lock:
+            self._clients.discard(client)
+
+    def publish(self, event: dict):
+        """全クライアントへ配信（どのスレッドから呼ばれても良い）"""
+        delta = {key: event[key] for key in DELTA_FIELDS if event.get(key) is not None}
+        delta["id"] = next(self._ids)
+        self.published += 1
+
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            try:
+                client.loop.call_soon_threadsafe(client.push, delta)
+            except RuntimeError:
+                # イベントループ終了済み
+                self.unregister(client)
+
+
+broker = EventBroker()
+stock_events.subscribe(broker.publish)
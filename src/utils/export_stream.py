@@ -0,0 +1,151 @@
+"""
+ストリーミングエクスポート（CSV / Excel）
+
+行を1件ずつ受け取る iterable から出力を逐次生成し、ファイル全体をメモリに載せない。
+行の取得側は Query.yield_per() によるサーバーサイドカーソルを想定している。
+Excel は openpyxl の write-only モードで一時ファイルに書き出し、チャンク単位で返す。
+"""
+
+import csv
+import enum
+import io
+import tempfile
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+EXPORT_FORMATS = ("csv", "xlsx")
+EXPORT_BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+# Excel 1シートあたりの最大行数（ヘッダー行を含む）
+XLSX_MAX_ROWS = 1_048_576
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def _normalize(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        # Excel はタイムゾーン付き日時を扱えない
+        return value.replace(tzinfo=None)
+    return value
+
+
+def iter_csv(
+    header: Sequence[str],
+    rows: Iterable[Sequence],
+    footer: Sequence[Sequence] = (),
+    bom: bool = True,
+) -> Iterator[bytes]:
+    """CSVをチャンク単位で生成（UTF-8、既定でBOM付き）"""
+    buffer = io.StringIO()
+    if bom:
+        buffer.write('\ufeff')
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+
+    for row in rows:
+        writer.writerow([_normalize(value) for value in row])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    for row in footer:
+        writer.writerow([_normalize(value) for value in row])
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_xlsx(
+    sheet_title: str,
+    header: Sequence[str],
+    rows: Iterable[Sequence],
+    column_widths: Optional[List[int]] = None,
+    footer: Sequence[Sequence] = (),
+) -> Iterator[bytes]:
+    """Excel（write-only モード）を一時ファイル経由でチャンク単位に生成（footer は太字）"""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Alignment, Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    header_font = Font(bold=True)
+    header_fill = PatternFill(start_color="DDDDDD", end_color="DDDDDD", fill_type="solid")
+    header_alignment = Alignment(horizontal="center")
+
+    def new_sheet(index: int):
+        ws = wb.create_sheet(title=sheet_title if index == 1 else f"{sheet_title}_{index}")
+        for col, width in enumerate(column_widths or [], start=1):
+            ws.column_dimensions[get_column_letter(col)].width = width
+        cells = []
+        for title in header:
+            cell = WriteOnlyCell(ws, value=title)
+            cell.font = header_font
+            cell.fill = header_fill
+            cell.alignment = header_alignment
+            cells.append(cell)
+        ws.append(cells)
+        return ws
+
+    sheet_index = 1
+    ws = new_sheet(sheet_index)
+    row_count = 1
+    for row in rows:
+        if row_count >= XLSX_MAX_ROWS:
+            sheet_index += 1
+            ws = new_sheet(sheet_index)
+            row_count = 1
+        ws.append([_normalize(value) for value in row])
+        row_count += 1
+
+    for row in footer:
+        cells = []
+        for value in row:
+            cell = WriteOnlyCell(ws, value=_normalize(value))
+            cell.font = header_font
+            cells.append(cell)
+        ws.append(cells)
+
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def streaming_export(
+    export_format: str,
+    filename_prefix: str,
+    sheet_title: str,
+    header: Sequence[str],
+    rows: Iterable[Sequence],
+    column_widths: Optional[List[int]] = None,
+    footer: Sequence[Sequence] = (),
+) -> StreamingResponse:
+    """形式に応じたストリーミングレスポンスを返す"""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="出力形式は csv または xlsx を指定してください")
+
+    if export_format == "xlsx":
+        body = iter_xlsx(sheet_title, header, rows, column_widths, footer)
+    else:
+        body = iter_csv(header, rows, footer)
+
+    filename = f"{filename_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
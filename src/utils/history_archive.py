@@ -0,0 +1,236 @@
+"""
+入出庫履歴・監査ログのアーカイブ（月別 Parquet）
+
+movements / audit_logs は追記のみで増え続けるため、指定月数より古い月を
+`<ARCHIVE_DIR>/<テーブル名>/YYYY-MM.parquet`（zstd 圧縮）へ書き出してから DB から削除する。
+ファイルを書き終えてから削除するため、途中で失敗しても履歴は失われない（再実行で続きから処理される）。
+
+アーカイブ済みの履歴を DB の履歴と合わせて扱うのは次の処理のみ（検索期間がアーカイブ済みの月に
+かかる場合だけ該当月のファイルを開く）:
+
+- 集計（/api/analytics の summary・timeline・出庫金額）と DuckDB 集計バックエンド
+- エクスポート（/api/exports/movements/・/api/exports/audit-logs/）
+- 材料別の消費ペースの再作成（consumption.rebuild）
+
+入出庫履歴一覧（GET /api/movements/）・ロットのトレーサビリティ・差分 Parquet エクスポートは
+DB のみを参照するため、アーカイブ済みの月は表示・出力されない。これらで過去分が必要な期間は
+保持月数（--months）を十分に取ること。
+
+Parquet の読み書きには pyarrow が必要（未インストール時はアーカイブ操作のみエラーになる）。
+"""
+
+import logging
+import os
+import re
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.db.models import AuditLog, Item, Lot, Movement
+
+logger = logging.getLogger(__name__)
+
+DELETE_CHUNK_SIZE = 1000
+_MONTH_FILE = re.compile(r"^(\d{4})-(\d{2})\.parquet$")
+
+
+def _movement_rows(db: Session, start: datetime, end: datetime) -> List[dict]:
+    # 集計でロット・材料を辿れるよう、アイテム経由のロット情報も一緒に保存する
+    rows = db.query(
+        Movement.id,
+        Movement.item_id,
+        Item.lot_id,
+        Lot.lot_number,
+        Lot.material_id,
+        Movement.movement_type,
+        Movement.quantity,
+        Movement.notes,
+        Movement.processed_by,
+        Movement.processed_at,
+    ).select_from(Movement).outerjoin(
+        Item, Movement.item_id == Item.id
+    ).outerjoin(
+        Lot, Item.lot_id == Lot.id
+    ).filter(
+        Movement.processed_at >= start,
+        Movement.processed_at < end
+    ).order_by(Movement.id).all()
+    return [
+        {**row._asdict(), "movement_type": row.movement_type.value if row.movement_type else None}
+        for row in rows
+    ]
+
+
+def _audit_rows(db: Session, start: datetime, end: datetime) -> List[dict]:
+    rows = db.query(AuditLog).filter(
+        AuditLog.created_at >= start,
+        AuditLog.created_at < end
+    ).order_by(AuditLog.id).all()
+    return [
+        {column.name: getattr(row, column.name) for column in AuditLog.__table__.columns}
+        for row in rows
+    ]
+
+
+TABLES = {
+    "movements": (Movement, Movement.processed_at, _movement_rows),
+    "audit_logs": (AuditLog, AuditLog.created_at, _audit_rows),
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "アーカイブの読み書きには pyarrow が必要です（pip install pyarrow）"
+        ) from e
+
+
+def _table_dir(table: str) -> Path:
+    return Path(settings.archive_dir) / table
+
+
+def _month_start(day) -> datetime:
+    return datetime(day.year, day.month, 1)
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def cutoff_for(keep_months: int, today: Optional[date] = None) -> datetime:
+    """直近 keep_months か月（当月を含む）より前の月初"""
+    return _add_months(_month_start(today or date.today()), -(keep_months - 1))
+
+
+def _write_month(table: str, month: datetime, rows: List[dict]) -> Path:
+    """月別ファイルへ書き込み（既存ファイルがあれば ID で重複を除いて追記）"""
+    import pandas as pd
+
+    path = _table_dir(table) / f"{month:%Y-%m}.parquet"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    frame = pd.DataFrame(rows)
+    if path.exists():
+        frame = pd.concat([pd.read_parquet(path), frame], ignore_index=True)
+        frame = frame.drop_duplicates(subset="id", keep="last").sort_values("id")
+
+    tmp = path.with_suffix(".parquet.tmp")
+    frame.to_parquet(tmp, engine="pyarrow", compression="zstd", index=False)
+    os.replace(tmp, path)
+    return path
+
+
+def archive(db: Session, table: str, keep_months: int, dry_run: bool = False) -> List[dict]:
+    """keep_months より古い月を Parquet に書き出して DB から削除し、月ごとの件数を返す"""
+    if table not in TABLES:
+        raise ValueError(f"アーカイブ対象外のテーブルです: {table}")
+    if keep_months < 1:
+        raise ValueError("保持月数は1以上を指定してください")
+    if not dry_run:
+        _require_pyarrow()
+
+    model, timestamp, load_rows = TABLES[table]
+    cutoff = cutoff_for(keep_months)
+    oldest = db.query(func.min(timestamp)).filter(timestamp < cutoff).scalar()
+    if oldest is None:
+        return []
+
+    results = []
+    month = _month_start(oldest)
+    while month < cutoff:
+        next_month = _add_months(month, 1)
+        if dry_run:
+            count = db.query(func.count(model.id)).filter(
+                timestamp >= month, timestamp < next_month
+            ).scalar() or 0
+            if count:
+                results.append({"month": f"{month:%Y-%m}", "rows": count, "path": None})
+            month = next_month
+            continue
+
+        rows = load_rows(db, month, next_month)
+        if rows:
+            path = _write_month(table, month, rows)
+            ids = [row["id"] for row in rows]
+            for start in range(0, len(ids), DELETE_CHUNK_SIZE):
+                db.query(model).filter(
+                    model.id.in_(ids[start:start + DELETE_CHUNK_SIZE])
+                ).delete(synchronize_session=False)
+            db.commit()
+            logger.info(f"{table} の {month:%Y-%m} 分 {len(rows)}件を {path} へアーカイブしました")
+            results.append({"month": f"{month:%Y-%m}", "rows": len(rows), "path": str(path)})
+        month = next_month
+    return results
+
+
+def archived_months(table: str) -> Dict[str, Path]:
+    """アーカイブ済みの月（YYYY-MM）とファイルパス"""
+    directory = _table_dir(table)
+    if not directory.is_dir():
+        return {}
+    months = {}
+    for path in directory.iterdir():
+        match = _MONTH_FILE.match(path.name)
+        if match:
+            months[f"{match.group(1)}-{match.group(2)}"] = path
+    return dict(sorted(months.items()))
+
+
+def _paths(table: str, start: Optional[datetime], end: Optional[datetime]) -> List[Path]:
+    first = f"{start:%Y-%m}" if start else None
+    last = f"{end:%Y-%m}" if end else None
+    return [
+        path for month, path in archived_months(table).items()
+        if (first is None or month >= first) and (last is None or month <= last)
+    ]
+
+
+def _filter_period(table: str, frame, start: Optional[datetime], end: Optional[datetime]):
+    import pandas as pd
+
+    _, timestamp, _ = TABLES[table]
+    if start is not None:
+        frame = frame[frame[timestamp.key] >= pd.Timestamp(start)]
+    if end is not None:
+        frame = frame[frame[timestamp.key] <= pd.Timestamp(end)]
+    return frame
+
+
+def read(table: str, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """期間にかかるアーカイブを DataFrame で返す（該当する月がなければ None）"""
+    paths = _paths(table, start, end)
+    if not paths:
+        return None
+
+    _require_pyarrow()
+    import pandas as pd
+
+    frame = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+    frame = _filter_period(table, frame, start, end)
+    return frame if not frame.empty else None
+
+
+def iter_rows(table: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Iterator[dict]:
+    """期間にかかるアーカイブを ID 順に1行ずつ dict で返す（1か月分ずつ読み込むためメモリは月単位）"""
+    paths = _paths(table, start, end)
+    if not paths:
+        return
+
+    _require_pyarrow()
+    import pandas as pd
+
+    for path in paths:
+        frame = _filter_period(table, pd.read_parquet(path), start, end).sort_values("id")
+        # 欠損値（NaN / NaT）は None に、日時は datetime に揃える
+        frame = frame.astype(object).where(frame.notna(), None)
+        for row in frame.to_dict("records"):
+            yield {
+                key: value.to_pydatetime() if isinstance(value, pd.Timestamp) else value
+                for key, value in row.items()
+            }
@@ -0,0 +1,150 @@
+"""
+入出庫APIの冪等性（Idempotency-Key）
+
+端末が同じ操作に同じキーを付けて再送した場合、2回目以降は処理をせず初回の結果を返す。
+キーは入出庫と同じトランザクションで登録するため、「在庫は減ったがキーが残らない」状態にならない。
+処理が失敗（例外）した場合はキーも残らないので、同じキーで再試行できる。
+保持期間（IDEMPOTENCY_KEY_TTL_HOURS）を過ぎたキーは定期的に削除する。
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.db.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 100
+PURGE_INTERVAL = 200
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+_new_keys_since_purge = 0
+
+
+def request_hash(payload) -> str:
+    return hashlib.sha256(
+        json.dumps(jsonable_encoder(payload), sort_keys=True, ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def _stored_result(record: IdempotencyKey, scope: str, payload_hash: str) -> dict:
+    if record.scope != scope or record.request_hash != payload_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="同じIdempotency-Keyで異なる内容が送信されました"
+        )
+    if record.response_body is None:
+        # キーは処理本体と同時にコミットされるため、見えている時点で処理自体は完了している
+        # （結果の保存前に中断した場合など）
+        return {"message": "この操作は処理済みです"}
+    return json.loads(record.response_body)
+
+
+def _find(db: Session, key: str) -> Optional[IdempotencyKey]:
+    record = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+    if record and record.expires_at and record.expires_at.replace(tzinfo=None) <= datetime.now():
+        db.delete(record)
+        db.commit()
+        return None
+    return record
+
+
+def execute(
+    db: Session,
+    key: Optional[str],
+    scope: str,
+    payload,
+    handler: Callable[[], dict],
+) -> Tuple[dict, bool]:
+    """キー付きで処理を実行し (レスポンス, 再送かどうか) を返す
+
+    handler は db のトランザクション内で処理してコミットする既存の処理関数。
+    """
+    global _new_keys_since_purge
+
+    if not key:
+        return handler(), False
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Keyは{MAX_KEY_LENGTH}文字以内で指定してください"
+        )
+
+    payload_hash = request_hash(payload)
+    record = _find(db, key)
+    if record:
+        return _stored_result(record, scope, payload_hash), True
+
+    # 処理本体と同じトランザクションでキーを登録（同じキーの同時実行は一意制約で片方だけ通る）
+    record = IdempotencyKey(
+        key=key,
+        scope=scope,
+        request_hash=payload_hash,
+        expires_at=datetime.now() + timedelta(hours=settings.idempotency_key_ttl_hours),
+    )
+    db.add(record)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        record = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+        if record is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="同じIdempotency-Keyの処理が実行中です"
+            )
+        return _stored_result(record, scope, payload_hash), True
+
+    try:
+        result = handler()
+    except Exception:
+        # キーの行ロックを持ったまま待たせないよう、すぐにロールバックする
+        db.rollback()
+        raise
+
+    body = jsonable_encoder(result)
+    if record not in db:
+        # 処理側でロールバックした（何も登録されなかった）場合はキーも残さない
+        return body, False
+    record.response_body = json.dumps(body, ensure_ascii=False)
+    db.commit()
+
+    _new_keys_since_purge += 1
+    if _new_keys_since_purge >= PURGE_INTERVAL:
+        _new_keys_since_purge = 0
+        purge_expired(db)
+
+    return body, False
+
+
+def to_response(result: dict, replayed: bool):
+    """再送の場合はヘッダーで区別できるようにする"""
+    if not replayed:
+        return result
+    return JSONResponse(content=result, headers={REPLAYED_HEADER: "true"})
+
+
+def purge_expired(db: Session) -> int:
+    """有効期限切れのキーを削除"""
+    try:
+        deleted = db.query(IdempotencyKey).filter(
+            IdempotencyKey.expires_at <= datetime.now()
+        ).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"期限切れIdempotency-Keyの削除に失敗しました: {e}")
+        return 0
+    if deleted:
+        logger.info(f"期限切れIdempotency-Keyを削除しました: {deleted}件")
+    return deleted
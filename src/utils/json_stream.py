@@ -0,0 +1,63 @@
+"""
+JSON配列のストリーミングレスポンス
+
+件数の多い一覧APIで、結果全件をORMオブジェクトとして保持してからシリアライズする代わりに、
+サーバーサイドカーソル（stream_results + yield_per）で取得した行を1件ずつJSON化して送る。
+ワーカーのメモリ使用量が件数に比例せず、先頭のバイトも早くクライアントに届く。
+
+注意: MySQL（pymysql）のサーバーサイドカーソル読み出し中は同じ接続で別クエリを発行できないため、
+ストリーミング対象のクエリでは selectinload や遅延ロードを使わず、必要な値は列・結合で取得すること。
+"""
+
+import json
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Query
+
+STREAM_BATCH_SIZE = 500
+CHUNK_SIZE = 64 * 1024
+
+
+def stream_query(query: Query, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Any]:
+    """サーバーサイドカーソルで batch_size 件ずつ取得しながら1行ずつ返す"""
+    return iter(query.execution_options(stream_results=True).yield_per(batch_size))
+
+
+def _encode(value: Any) -> str:
+    if isinstance(value, BaseModel):
+        return value.model_dump_json()
+    return json.dumps(jsonable_encoder(value), ensure_ascii=False)
+
+
+def iter_json_array(rows: Iterable[Any], serialize: Optional[Callable[[Any], Any]] = None) -> Iterator[bytes]:
+    """要素を1件ずつJSON化し、配列としてチャンク単位で返す"""
+    parts = ["["]
+    size = 1
+    first = True
+
+    for row in rows:
+        text = _encode(serialize(row) if serialize else row)
+        if first:
+            first = False
+        else:
+            text = "," + text
+        parts.append(text)
+        size += len(text)
+        if size >= CHUNK_SIZE:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+            size = 0
+
+    parts.append("]")
+    yield "".join(parts).encode("utf-8")
+
+
+def stream_json_array(
+    rows: Iterable[Any],
+    serialize: Optional[Callable[[Any], Any]] = None,
+) -> StreamingResponse:
+    """JSON配列のストリーミングレスポンス"""
+    return StreamingResponse(iter_json_array(rows, serialize), media_type="application/json")
@@ -0,0 +1,103 @@
+"""
+ラベル/現品票PDFのディスクキャッシュ
+
+キーは印字内容（種別・部数・各ラベルの項目・印刷日付）のハッシュ。
+印字内容が変われば別キーになるため古いPDFが返ることはないが、
+入出庫・置き場変更イベントで該当ロットのファイルを削除して容量を抑える。
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import date
+from pathlib import Path
+from typing import List, Optional
+
+from src.config import settings
+from src.utils import stock_events
+
+logger = logging.getLogger(__name__)
+
+cache_stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidated": 0}
+
+
+def _cache_dir() -> Path:
+    path = Path(settings.label_cache_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _lot_prefix(lot_number: str) -> str:
+    """ロット番号をファイル名に使える固定長の文字列にする"""
+    return hashlib.sha1(lot_number.encode("utf-8")).hexdigest()[:16]
+
+
+def content_key(kind: str, entries: List[dict], copies: int) -> str:
+    """印字内容のハッシュ（ETagにも使用）"""
+    payload = json.dumps(
+        {"kind": kind, "copies": copies, "entries": entries, "date": date.today().isoformat()},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _path_for(key: str, lot_number: Optional[str]) -> Path:
+    prefix = _lot_prefix(lot_number) if lot_number else "batch"
+    return _cache_dir() / f"{prefix}_{key}.pdf"
+
+
+def get(key: str, lot_number: Optional[str] = None) -> Optional[bytes]:
+    if not settings.label_cache_enabled:
+        return None
+    try:
+        data = _path_for(key, lot_number).read_bytes()
+    except FileNotFoundError:
+        cache_stats["misses"] += 1
+        return None
+    cache_stats["hits"] += 1
+    return data
+
+
+def put(key: str, pdf: bytes, lot_number: Optional[str] = None):
+    if not settings.label_cache_enabled:
+        return
+    path = _path_for(key, lot_number)
+    tmp_path = path.with_suffix(".tmp")
+    try:
+        tmp_path.write_bytes(pdf)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"ラベルPDFキャッシュの保存に失敗しました: {e}")
+        return
+    _prune()
+
+
+def _prune():
+    """上限件数を超えた分を古い順に削除"""
+    files = list(_cache_dir().glob("*.pdf"))
+    overflow = len(files) - settings.label_cache_max_files
+    if overflow <= 0:
+        return
+    files.sort(key=lambda p: p.stat().st_mtime)
+    for path in files[:overflow]:
+        path.unlink(missing_ok=True)
+
+
+def invalidate_lot(lot_number: str) -> int:
+    """指定ロットのキャッシュを削除"""
+    if not lot_number or not settings.label_cache_enabled:
+        return 0
+    removed = 0
+    for path in _cache_dir().glob(f"{_lot_prefix(lot_number)}_*.pdf"):
+        path.unlink(missing_ok=True)
+        removed += 1
+    cache_stats["invalidated"] += removed
+    return removed
+
+
+@stock_events.subscribe
+def _on_stock_changed(event: dict):
+    invalidate_lot(event.get("lot_number"))
@@ -0,0 +1,147 @@
+"""
+ラベル/現品票のPDFレンダリング
+
+DBやFastAPIに依存しないため、ワーカープロセス内でそのまま実行できる。
+入力は印字内容を表す dict（lot_number / rows / notes）のリスト。
+"""
+
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+from typing import List
+
+JAPANESE_FONT_NAME = 'HeiseiKakuGo-W5'
+
+
+@lru_cache(maxsize=1)
+def ensure_japanese_font() -> str:
+    """日本語フォント登録（reportlab は初回利用時に読み込む）"""
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+    pdfmetrics.registerFont(UnicodeCIDFont(JAPANESE_FONT_NAME))
+    return JAPANESE_FONT_NAME
+
+
+@lru_cache(maxsize=1)
+def get_label_layout() -> dict:
+    """ラベル/現品票で共有するフォント・スタイル・表スタイル（初回のみ生成）"""
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import TableStyle
+    from reportlab.lib import colors
+
+    font_name = ensure_japanese_font()
+    styles = getSampleStyleSheet()
+
+    header_style = TableStyle([
+        ('FONT', (1, 0), (1, 0), font_name),
+        ('FONTSIZE', (1, 0), (1, 0), 8),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ALIGN', (1, 0), (1, 0), 'LEFT'),
+    ])
+    body_commands = [
+        ('FONT', (0, 0), (-1, -1), font_name),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+    ]
+
+    return {
+        # 日本語対応スタイル
+        "jp": ParagraphStyle('Japanese', parent=styles['Normal'], fontName=font_name, fontSize=8, leading=10),
+        "label_title": ParagraphStyle('JapaneseTitle', parent=styles['Title'], fontName=font_name,
+                                      fontSize=12, leading=14, alignment=1),  # 中央揃え
+        "tag_title": ParagraphStyle('JapaneseTagTitle', parent=styles['Title'], fontName=font_name,
+                                    fontSize=14, leading=16, alignment=1),
+        "header": header_style,
+        "label_body": TableStyle(body_commands),
+        "tag_body": TableStyle(body_commands + [
+            ('ROWBACKGROUNDS', (0, 0), (-1, -1), [colors.white, colors.lightgrey])
+        ]),
+    }
+
+
+def create_a6_document(buffer: BytesIO):
+    """A6用ドキュメント（余白5mm）"""
+    from reportlab.lib.pagesizes import A6
+    from reportlab.lib.units import mm
+    from reportlab.platypus import SimpleDocTemplate
+
+    return SimpleDocTemplate(buffer, pagesize=A6, topMargin=5*mm, bottomMargin=5*mm, leftMargin=5*mm, rightMargin=5*mm)
+
+
+def _header_table(lot_number: str, qr_size_mm: int, col_widths: list):
+    """QRコードとLOT番号を並べたヘッダー"""
+    from reportlab.platypus import Table
+    from src.utils.qr import QrFlowable
+
+    header_table = Table([[QrFlowable(lot_number, qr_size_mm), "LOT: " + lot_number[:15] + ("..." if len(lot_number) > 15 else "")]],
+                         colWidths=col_widths)
+    header_table.setStyle(get_label_layout()["header"])
+    return header_table
+
+
+def build_a6_label_story(fields: dict, printed_at: str) -> list:
+    """A6材料管理ラベル1枚分のフロー要素"""
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Table, Paragraph, Spacer
+
+    layout = get_label_layout()
+    story = [
+        Paragraph("材料管理ラベル", layout["label_title"]),
+        Spacer(1, 5*mm),
+        _header_table(fields["lot_number"], 18, [20*mm, 70*mm]),
+        Spacer(1, 5*mm),
+    ]
+
+    table = Table(fields["rows"] + [["印刷日", printed_at]], colWidths=[20*mm, 70*mm])
+    table.setStyle(layout["label_body"])
+    story.append(table)
+
+    return story
+
+
+def build_a6_lot_tag_story(fields: dict, printed_at: str) -> list:
+    """A6現品票1枚分のフロー要素"""
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Table, Paragraph, Spacer
+
+    layout = get_label_layout()
+    story = [
+        Paragraph("現品票", layout["tag_title"]),
+        Spacer(1, 8*mm),
+        _header_table(fields["lot_number"], 20, [22*mm, 68*mm]),
+        Spacer(1, 5*mm),
+    ]
+
+    table = Table(fields["rows"] + [["印刷日", printed_at]], colWidths=[25*mm, 65*mm])
+    table.setStyle(layout["tag_body"])
+    story.append(table)
+    story.append(Spacer(1, 5*mm))
+
+    # 備考欄
+    if fields.get("notes"):
+        story.append(Paragraph("備考:", layout["jp"]))
+        story.append(Paragraph(fields["notes"], layout["jp"]))
+
+    return story
+
+
+def render_labels_pdf(kind: str, entries: List[dict], copies: int = 1) -> bytes:
+    """ラベル（kind="label"）または現品票（kind="lot_tag"）をA6複数ページのPDFにする"""
+    from reportlab.platypus import PageBreak
+
+    build_story = build_a6_label_story if kind == "label" else build_a6_lot_tag_story
+    printed_at = datetime.now().strftime("%m/%d %H:%M")
+
+    story = []
+    for fields in entries:
+        for _ in range(copies):
+            if story:
+                story.append(PageBreak())
+            story.extend(build_story(fields, printed_at))
+
+    buffer = BytesIO()
+    create_a6_document(buffer).build(story)
+    return buffer.getvalue()
@@ -0,0 +1,192 @@
+"""
+仕入先別の納入リードタイム統計（supplier_lead_times）
+
+発注日（purchase_orders.order_date）から入荷日（lots.received_date）までの日数を入荷ロットごとに求め、
+仕入先全体（material_id = NULL）と仕入先×材料ごとに平均・中央値・90パーセンタイル・納期遵守率を保持する。
+
+- 入庫登録・入庫内容の修正・ロット削除・発注ヘッダー編集のコミット後に、その仕入先の行だけを再計算する
+- 納期遵守は納期予定日（expected_delivery_date）のある発注のみを対象に、予定日以前の入荷を数える
+- 入荷日が発注日より前になっているロット（入力誤り）は除外する
+
+発注データを Excel から取り込み直した場合などは `python -m src.scripts.rebuild_supplier_lead_times` で作り直す。
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.db.models import Lot, Material, PurchaseOrder, PurchaseOrderItem, SupplierLeadTime
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+STATS = ("mean_days", "p50_days", "p90_days")
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value)).date()
+
+
+def _percentile(values: List[int], q: float) -> float:
+    """昇順の値の q パーセンタイル（線形補間）"""
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _samples(db: Session, suppliers: Optional[Iterable[str]] = None) -> Dict[Tuple[str, Optional[int]], list]:
+    """(仕入先, 材料ID) と (仕入先, None) ごとの (リードタイム日数, 納期内か, 入荷日) の一覧"""
+    query = db.query(
+        PurchaseOrder.supplier,
+        Lot.material_id,
+        PurchaseOrder.order_date,
+        PurchaseOrder.expected_delivery_date,
+        Lot.received_date,
+    ).select_from(Lot).join(
+        PurchaseOrderItem, Lot.purchase_order_item_id == PurchaseOrderItem.id
+    ).join(
+        PurchaseOrder, PurchaseOrderItem.purchase_order_id == PurchaseOrder.id
+    ).filter(
+        Lot.received_date.isnot(None)
+    )
+    if suppliers is not None:
+        query = query.filter(PurchaseOrder.supplier.in_(list(suppliers)))
+
+    samples: Dict[Tuple[str, Optional[int]], list] = defaultdict(list)
+    for supplier, material_id, order_date, expected_date, received_date in query.all():
+        ordered = _as_date(order_date)
+        received = _as_date(received_date)
+        days = (received - ordered).days
+        if days < 0:
+            continue
+        expected = _as_date(expected_date)
+        on_time = None if expected is None else received <= expected
+        samples[(supplier, None)].append((days, on_time, received))
+        samples[(supplier, material_id)].append((days, on_time, received))
+    return samples
+
+
+def _row(supplier: str, material_id: Optional[int], samples: list) -> SupplierLeadTime:
+    days = sorted(sample[0] for sample in samples)
+    judged = [sample[1] for sample in samples if sample[1] is not None]
+    return SupplierLeadTime(
+        supplier=supplier,
+        material_id=material_id,
+        sample_count=len(days),
+        mean_days=round(sum(days) / len(days), 2),
+        p50_days=round(_percentile(days, 50), 2),
+        p90_days=round(_percentile(days, 90), 2),
+        due_count=len(judged),
+        on_time_count=sum(judged),
+        last_received_date=max(sample[2] for sample in samples),
+    )
+
+
+def _replace(db: Session, suppliers: Optional[List[str]]) -> int:
+    samples = _samples(db, suppliers)
+    delete = db.query(SupplierLeadTime)
+    if suppliers is not None:
+        delete = delete.filter(SupplierLeadTime.supplier.in_(suppliers))
+    delete.delete(synchronize_session=False)
+    for (supplier, material_id), entries in samples.items():
+        db.add(_row(supplier, material_id, entries))
+    db.commit()
+    return len(samples)
+
+
+def refresh(db: Session, suppliers: Iterable[Optional[str]]) -> int:
+    """指定仕入先の統計を入荷履歴から再計算してコミット（入庫系の処理のコミット後に呼ぶ）"""
+    suppliers = sorted({s for s in suppliers if s})
+    if not suppliers:
+        return 0
+    with _lock:
+        return _replace(db, suppliers)
+
+
+def refresh_after_commit(db: Session, *suppliers: Optional[str]) -> None:
+    """入庫系 API 用。統計の更新に失敗しても入庫処理自体は成功として扱う"""
+    try:
+        refresh(db, suppliers)
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"リードタイム統計の更新に失敗しました（{', '.join(s for s in suppliers if s)}）: {e}")
+
+
+def rebuild(db: Session) -> int:
+    """全仕入先の統計を作り直し、作成した行数を返す"""
+    with _lock:
+        return _replace(db, None)
+
+
+def ensure_populated(db: Session) -> int:
+    """統計テーブルが空で入荷済みロットがある場合（導入直後）に全件作成する"""
+    if db.query(SupplierLeadTime.id).first() is not None:
+        return 0
+    if db.query(Lot.id).filter(Lot.purchase_order_item_id.isnot(None), Lot.received_date.isnot(None)).first() is None:
+        return 0
+    created = rebuild(db)
+    logger.info(f"リードタイム統計を作成しました: {created}件")
+    return created
+
+
+def to_dict(row: SupplierLeadTime, material_name: Optional[str] = None) -> dict:
+    return {
+        "supplier": row.supplier,
+        "material_id": row.material_id,
+        "material_name": material_name,
+        "sample_count": row.sample_count,
+        "mean_days": row.mean_days,
+        "p50_days": row.p50_days,
+        "p90_days": row.p90_days,
+        "due_count": row.due_count,
+        "on_time_count": row.on_time_count,
+        "on_time_ratio": round(row.on_time_count / row.due_count, 3) if row.due_count else None,
+        "last_received_date": row.last_received_date.isoformat() if row.last_received_date else None,
+    }
+
+
+def list_stats(
+    db: Session,
+    supplier: Optional[str] = None,
+    material_id: Optional[int] = None,
+    include_materials: bool = True,
+) -> List[dict]:
+    """保存済みの統計（仕入先全体の行 → 材料別の行の順）"""
+    query = db.query(SupplierLeadTime, Material.display_name).outerjoin(
+        Material, SupplierLeadTime.material_id == Material.id
+    )
+    if supplier:
+        query = query.filter(SupplierLeadTime.supplier == supplier)
+    if material_id is not None:
+        query = query.filter(SupplierLeadTime.material_id == material_id)
+    elif not include_materials:
+        query = query.filter(SupplierLeadTime.material_id.is_(None))
+
+    rows = [to_dict(row, name) for row, name in query.all()]
+    rows.sort(key=lambda r: (r["supplier"], r["material_id"] is not None, r["material_name"] or ""))
+    return rows
+
+
+def lookup(db: Session, stat: str = "p90_days") -> Dict[Tuple[str, Optional[int]], float]:
+    """(仕入先, 材料ID) → リードタイム日数。材料別の実績がない場合は (仕入先, None) を使う"""
+    if stat not in STATS:
+        raise ValueError(f"stat は {', '.join(STATS)} のいずれかを指定してください")
+    column = getattr(SupplierLeadTime, stat)
+    return {
+        (supplier, material_id): float(days)
+        for supplier, material_id, days in db.query(
+            SupplierLeadTime.supplier, SupplierLeadTime.material_id, column
+        ).all()
+    }
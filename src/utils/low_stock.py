@@ -0,0 +1,169 @@
+"""
+在庫不足判定（材料・グループ単位）
+
+材料別在庫集計（material_stock）の本数・重量を発注点（reorder_points）と比較する。
+発注点未設定の材料は既定の下限本数で判定する。
+結果はキャッシュし、入出庫などの在庫変更イベント・発注点や材料の変更で破棄する。
+在庫変更イベントは同じプロセス内にしか届かないため、他のワーカーでの変更に備えて LOW_STOCK_CACHE_TTL_SEC で期限切れにする。
+"""
+
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.db.models import Material, MaterialGroup, MaterialGroupMember, MaterialStock, ReorderPoint
+from src.utils import stock_events
+
+logger = logging.getLogger(__name__)
+
+ALERT_LEVEL_ORDER = {"危険": 0, "注意": 1, "警告": 2}
+
+_cache: Dict[Optional[int], Tuple[float, List[dict]]] = {}
+cache_stats = {"hits": 0, "builds": 0}
+
+
+def invalidate():
+    _cache.clear()
+
+
+def _material_totals(db: Session) -> Dict[int, dict]:
+    """材料ごとの在庫本数・重量・ロット数（材料別在庫集計から取得）"""
+    rows = db.query(
+        Material.id,
+        Material.display_name,
+        MaterialStock.total_quantity,
+        MaterialStock.total_weight_kg,
+        MaterialStock.lot_count,
+    ).join(
+        MaterialStock, MaterialStock.material_id == Material.id
+    ).filter(
+        Material.is_active == True
+    ).all()
+
+    return {
+        material_id: {
+            "name": name,
+            "total_quantity": int(quantity or 0),
+            "total_weight_kg": round(float(weight or 0), 3),
+            "lot_count": int(lot_count or 0),
+        }
+        for material_id, name, quantity, weight, lot_count in rows
+    }
+
+
+def _alert_level(total_quantity: int, total_weight_kg: float, min_quantity: Optional[int], min_weight_kg: Optional[float]) -> Optional[str]:
+    """下限を下回っていれば警告レベルを返す"""
+    below_quantity = min_quantity is not None and total_quantity <= min_quantity
+    below_weight = min_weight_kg is not None and total_weight_kg <= min_weight_kg
+    if not (below_quantity or below_weight):
+        return None
+    if total_quantity == 0:
+        return "危険"
+    if (below_quantity and total_quantity <= min_quantity / 2) or (below_weight and total_weight_kg <= min_weight_kg / 2):
+        return "注意"
+    return "警告"
+
+
+def _build_alerts(db: Session, default_threshold: Optional[int]) -> List[dict]:
+    totals = _material_totals(db)
+    points = db.query(ReorderPoint).filter(ReorderPoint.is_active == True).all()
+
+    group_ids = [p.group_id for p in points if p.group_id is not None]
+    group_members: Dict[int, List[int]] = defaultdict(list)
+    group_names: Dict[int, str] = {}
+    if group_ids:
+        for group_id, material_id in db.query(MaterialGroupMember.group_id, MaterialGroupMember.material_id).filter(
+            MaterialGroupMember.group_id.in_(group_ids)
+        ).all():
+            group_members[group_id].append(material_id)
+        group_names = dict(db.query(MaterialGroup.id, MaterialGroup.group_name).filter(MaterialGroup.id.in_(group_ids)).all())
+
+    material_point_ids = {p.material_id for p in points if p.material_id is not None}
+    if material_point_ids - totals.keys():
+        # 在庫アイテムが1件もない材料も発注点があれば0本として判定する
+        for material_id, name in db.query(Material.id, Material.display_name).filter(
+            Material.id.in_(material_point_ids - totals.keys()),
+            Material.is_active == True
+        ).all():
+            totals[material_id] = {"name": name, "total_quantity": 0, "total_weight_kg": 0.0, "lot_count": 0}
+
+    covered_materials = set(material_point_ids)
+    alerts = []
+
+    for point in points:
+        if point.material_id is not None:
+            summary = totals.get(point.material_id)
+            if summary is None:
+                continue
+            scope = {"scope": "material", "material_id": point.material_id, "group_id": None, "name": summary["name"]}
+        elif point.group_id is not None:
+            members = group_members.get(point.group_id, [])
+            covered_materials.update(members)
+            member_totals = [totals[m] for m in members if m in totals]
+            summary = {
+                "total_quantity": sum(t["total_quantity"] for t in member_totals),
+                "total_weight_kg": round(sum(t["total_weight_kg"] for t in member_totals), 3),
+                "lot_count": sum(t["lot_count"] for t in member_totals),
+            }
+            scope = {"scope": "group", "material_id": None, "group_id": point.group_id, "name": group_names.get(point.group_id, "")}
+        else:
+            continue
+
+        level = _alert_level(summary["total_quantity"], summary["total_weight_kg"], point.min_quantity, point.min_weight_kg)
+        if level:
+            alerts.append({
+                **scope,
+                "total_quantity": summary["total_quantity"],
+                "total_weight_kg": summary["total_weight_kg"],
+                "lot_count": summary["lot_count"],
+                "min_quantity": point.min_quantity,
+                "min_weight_kg": point.min_weight_kg,
+                "alert_level": level,
+                "source": "reorder_point",
+            })
+
+    # 発注点未設定の材料は既定の下限本数で判定
+    if default_threshold is not None:
+        for material_id, summary in totals.items():
+            if material_id in covered_materials:
+                continue
+            level = _alert_level(summary["total_quantity"], summary["total_weight_kg"], default_threshold, None)
+            if level:
+                alerts.append({
+                    "scope": "material",
+                    "material_id": material_id,
+                    "group_id": None,
+                    "name": summary["name"],
+                    "total_quantity": summary["total_quantity"],
+                    "total_weight_kg": summary["total_weight_kg"],
+                    "lot_count": summary["lot_count"],
+                    "min_quantity": default_threshold,
+                    "min_weight_kg": None,
+                    "alert_level": level,
+                    "source": "default",
+                })
+
+    alerts.sort(key=lambda a: (ALERT_LEVEL_ORDER[a["alert_level"]], a["total_quantity"], a["name"]))
+    return alerts
+
+
+def get_low_stock_alerts(db: Session, default_threshold: Optional[int] = None) -> List[dict]:
+    """在庫不足アラート一覧（キャッシュあり）"""
+    entry = _cache.get(default_threshold)
+    if entry is not None and time.monotonic() - entry[0] < settings.low_stock_cache_ttl_sec:
+        cache_stats["hits"] += 1
+        return entry[1]
+
+    alerts = _build_alerts(db, default_threshold)
+    _cache[default_threshold] = (time.monotonic(), alerts)
+    cache_stats["builds"] += 1
+    return alerts
+
+
+@stock_events.subscribe
+def _on_stock_changed(event: dict):
+    invalidate()
@@ -0,0 +1,181 @@
+"""
+材料ごとの在庫集計（material_stock）
+
+「材料Xの在庫は何本・何kg・何ロット・何か所か」を items の SUM 集計ではなく
+material_stock の主キー読み取りで返せるよう、在庫を変更する処理と同じトランザクションで更新する。
+
+- 入出庫（本数の増減）: 差分を UPDATE 1文で加算するため、同じ材料への同時更新でも集計がずれない
+- 置き場変更: 置き場数のみ再計算
+- 検品合格・入庫内容の修正・ロット削除: 対象材料を items から再計算
+
+集計対象は有効なアイテム（is_active）。ロット数・置き場数は在庫本数が1本以上のものを数える。
+万一ずれた場合は `python -m src.scripts.reconcile_material_stock` で items から作り直せる。
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import Session
+
+from src.db.models import Item, Lot, Material, MaterialStock
+from src.utils.weight import weight_per_piece_kg, weight_per_piece_kg_expr
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ("total_quantity", "total_weight_kg", "lot_count", "location_count")
+
+
+def _aggregate(db: Session, material_ids: Optional[Iterable[int]] = None) -> Dict[int, dict]:
+    """items から材料ごとの集計値を求める"""
+    in_stock = Item.current_quantity > 0
+    query = db.query(
+        Lot.material_id,
+        func.coalesce(func.sum(Item.current_quantity), 0),
+        func.coalesce(func.sum(Item.current_quantity * weight_per_piece_kg_expr()), 0.0),
+        func.count(case((in_stock, Item.id))),
+        func.count(func.distinct(case((in_stock, Item.location_id)))),
+    ).select_from(Item).join(
+        Lot, Item.lot_id == Lot.id
+    ).join(
+        Material, Lot.material_id == Material.id
+    ).filter(
+        Item.is_active == True
+    )
+    if material_ids is not None:
+        query = query.filter(Lot.material_id.in_(list(material_ids)))
+
+    return {
+        material_id: {
+            "total_quantity": int(quantity or 0),
+            "total_weight_kg": round(float(weight or 0), 3),
+            "lot_count": int(lot_count or 0),
+            "location_count": int(location_count or 0),
+        }
+        for material_id, quantity, weight, lot_count, location_count in query.group_by(Lot.material_id).all()
+    }
+
+
+def _empty() -> dict:
+    return {"total_quantity": 0, "total_weight_kg": 0.0, "lot_count": 0, "location_count": 0}
+
+
+def refresh(db: Session, material_ids: Iterable[int]) -> None:
+    """指定材料の集計を items から再計算して保存（コミットは呼び出し側）"""
+    material_ids = sorted({m for m in material_ids if m is not None})
+    if not material_ids:
+        return
+
+    db.flush()
+    totals = _aggregate(db, material_ids)
+    existing = {
+        row.material_id: row
+        for row in db.query(MaterialStock).filter(
+            MaterialStock.material_id.in_(material_ids)
+        ).order_by(MaterialStock.material_id).with_for_update().all()
+    }
+
+    for material_id in material_ids:
+        values = totals.get(material_id, _empty())
+        row = existing.get(material_id)
+        if row is None:
+            db.add(MaterialStock(material_id=material_id, **values))
+        else:
+            for field, value in values.items():
+                setattr(row, field, value)
+    db.flush()
+
+
+def _refresh_location_count(db: Session, material_id: int) -> None:
+    count = db.query(func.count(func.distinct(Item.location_id))).join(
+        Lot, Item.lot_id == Lot.id
+    ).filter(
+        Lot.material_id == material_id,
+        Item.is_active == True,
+        Item.current_quantity > 0
+    ).scalar()
+    db.execute(
+        update(MaterialStock).where(MaterialStock.material_id == material_id).values(
+            location_count=int(count or 0)
+        ).execution_options(synchronize_session=False)
+    )
+
+
+def apply_quantity_change(db: Session, item: Item, old_quantity: int, new_quantity: int) -> None:
+    """アイテムの本数変更を材料の集計に差分で反映"""
+    if not item.is_active or old_quantity == new_quantity:
+        return
+
+    lot = item.lot
+    delta = new_quantity - old_quantity
+    lot_delta = int(new_quantity > 0) - int(old_quantity > 0)
+
+    result = db.execute(
+        update(MaterialStock).where(MaterialStock.material_id == lot.material_id).values(
+            total_quantity=MaterialStock.total_quantity + delta,
+            total_weight_kg=MaterialStock.total_weight_kg + round(delta * weight_per_piece_kg(lot), 3),
+            lot_count=MaterialStock.lot_count + lot_delta,
+        ).execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        refresh(db, [lot.material_id])
+    elif lot_delta:
+        _refresh_location_count(db, lot.material_id)
+
+
+def apply_relocation(db: Session, item: Item) -> None:
+    """置き場変更を反映（本数は変わらないため置き場数のみ）"""
+    if item.is_active and item.current_quantity > 0:
+        db.flush()
+        _refresh_location_count(db, item.lot.material_id)
+
+
+def get(db: Session, material_id: int) -> dict:
+    """材料の集計値（未集計の材料は0）"""
+    row = db.get(MaterialStock, material_id)
+    if row is None:
+        return _empty()
+    values = {field: getattr(row, field) for field in COUNTER_FIELDS}
+    values["total_weight_kg"] = round(values["total_weight_kg"] or 0.0, 3)
+    return values
+
+
+def reconcile(db: Session, apply: bool = True) -> List[dict]:
+    """全材料の集計を items から作り直し、ずれていた材料の一覧を返す"""
+    totals = _aggregate(db)
+    rows = {row.material_id: row for row in db.query(MaterialStock).with_for_update().all()}
+
+    drift = []
+    for material_id in sorted(totals.keys() | rows.keys()):
+        expected = totals.get(material_id, _empty())
+        row = rows.get(material_id)
+        actual = {field: getattr(row, field) for field in COUNTER_FIELDS} if row else None
+        if actual is not None and all(
+            abs(actual[field] - expected[field]) < 0.01 for field in COUNTER_FIELDS
+        ):
+            continue
+        drift.append({"material_id": material_id, "stored": actual, "expected": expected})
+        if not apply:
+            continue
+        if row is None:
+            db.add(MaterialStock(material_id=material_id, **expected))
+        else:
+            for field, value in expected.items():
+                setattr(row, field, value)
+
+    if apply:
+        db.commit()
+    else:
+        db.rollback()
+    return drift
+
+
+def ensure_populated(db: Session) -> int:
+    """集計テーブルが空で在庫アイテムがある場合（導入直後）に全件作成する"""
+    if db.query(MaterialStock.material_id).first() is not None:
+        return 0
+    if db.query(Item.id).first() is None:
+        return 0
+    created = len(reconcile(db))
+    logger.info(f"材料別在庫集計を作成しました: {created}件")
+    return created
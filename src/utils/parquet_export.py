@@ -0,0 +1,259 @@
+"""
+分析用の差分 Parquet エクスポート
+
+本番DBに重い集計を投げずに済むよう、主要テーブルを月別パーティションの Parquet
+（`<PARQUET_EXPORT_DIR>/<テーブル名>/month=YYYY-MM/part-*.parquet`）へ書き出す。
+前回どこまで書き出したか（ウォーターマーク）を `_watermarks.json` に保存し、毎回その続きだけを追記する。
+
+- movements: id をウォーターマークにする（月は processed_at）。movements には更新日時がないため、
+  入出庫履歴の編集は監査ログ（入出庫履歴編集）を audit_logs.id のウォーターマークで追い、
+  編集された行を新しい版として追記する
+- その他: 更新されるため (updated_at, id) をウォーターマークにし、変更された行を新しい版として追記する（月は created_at）。
+  同じ id の行が複数の版で出力されるため、分析側では id ごとに `_exported_at` が最新の行を使う
+
+コミット前のトランザクションの行を取りこぼさないよう、直近 PARQUET_EXPORT_SETTLE_SEC 秒以内の行は次回に回す。
+行の削除（入出庫履歴の削除を含む）は反映されないため、分析側では現存する id で絞り込む。
+DBへの負荷を抑えるため、キーセットページングで CHUNK_SIZE 件ずつ読み込む。
+"""
+
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, and_, func, or_, select
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.db.models import AuditLog, Item, Lot, Material, Movement, PurchaseOrder, PurchaseOrderItem
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 5000
+WATERMARK_FILE = "_watermarks.json"
+MOVEMENT_EDIT_ACTION = "入出庫履歴編集"
+
+# テーブル名: (モデル, パーティションに使う日時列, 更新日時でのウォーターマークを使うか)
+TABLES = {
+    "movements": (Movement, "processed_at", False),
+    "lots": (Lot, "created_at", True),
+    "items": (Item, "created_at", True),
+    "materials": (Material, "created_at", True),
+    "purchase_orders": (PurchaseOrder, "created_at", True),
+    "purchase_order_items": (PurchaseOrderItem, "created_at", True),
+}
+
+
+def _export_dir() -> Path:
+    return Path(settings.parquet_export_dir)
+
+
+def load_watermarks() -> Dict[str, dict]:
+    try:
+        return json.loads((_export_dir() / WATERMARK_FILE).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_watermarks(watermarks: Dict[str, dict]) -> None:
+    path = _export_dir() / WATERMARK_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(watermarks, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _plain(value):
+    return value.value if isinstance(value, Enum) else value
+
+
+def _fetch_chunk(db: Session, table: str, watermark: dict, settled_before: datetime) -> List[dict]:
+    model, _, by_updated_at = TABLES[table]
+    columns = model.__table__.columns
+    query = select(model.__table__)
+
+    if by_updated_at:
+        last_updated = watermark.get("updated_at")
+        last_id = watermark.get("id", 0)
+        query = query.where(columns.updated_at <= settled_before)
+        if last_updated:
+            last_updated = datetime.fromisoformat(last_updated)
+            query = query.where(or_(
+                columns.updated_at > last_updated,
+                and_(columns.updated_at == last_updated, columns.id > last_id)
+            ))
+        query = query.order_by(columns.updated_at, columns.id)
+    else:
+        query = query.where(columns.id > watermark.get("id", 0)).order_by(columns.id)
+
+    rows = [
+        {key: _plain(value) for key, value in row._mapping.items()}
+        for row in db.execute(query.limit(CHUNK_SIZE))
+    ]
+    if not by_updated_at:
+        # id 順で確定前の行に達したら、それ以降は次回（id の若い行が後からコミットされる場合に備える）
+        for index, row in enumerate(rows):
+            if row["processed_at"] is None or row["processed_at"] > settled_before:
+                return rows[:index]
+    return rows
+
+
+def _schema(table: str):
+    """テーブル定義から Parquet のスキーマを作る（パートごとに型がぶれないよう固定する）"""
+    import pyarrow as pa
+
+    model, _, _ = TABLES[table]
+    fields = []
+    for column in model.__table__.columns:
+        if isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    fields.append(pa.field("_exported_at", pa.timestamp("us")))
+    return pa.schema(fields)
+
+
+def _write_parts(table: str, rows: List[dict], run_id: str, sequence: int) -> int:
+    """行を月別パーティションに書き出し、書き出したファイル数を返す"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    _, partition_column, _ = TABLES[table]
+    schema = _schema(table)
+    exported_at = datetime.now()
+
+    by_month: Dict[str, List[dict]] = {}
+    for row in rows:
+        timestamp = row[partition_column]
+        month = f"{timestamp:%Y-%m}" if timestamp else "unknown"
+        by_month.setdefault(month, []).append({**row, "_exported_at": exported_at})
+
+    for month, part in sorted(by_month.items()):
+        directory = _export_dir() / table / f"month={month}"
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"part-{run_id}-{sequence:05d}.parquet"
+        tmp = path.with_suffix(".parquet.tmp")
+        pq.write_table(pa.Table.from_pylist(part, schema=schema), tmp, compression="zstd")
+        os.replace(tmp, path)
+    return len(by_month)
+
+
+def export_table(db: Session, table: str, watermarks: Dict[str, dict], run_id: str) -> dict:
+    """1テーブル分の差分を書き出し、ウォーターマークを更新する"""
+    _, _, by_updated_at = TABLES[table]
+    settled_before = datetime.now() - timedelta(seconds=settings.parquet_export_settle_sec)
+    watermark = dict(watermarks.get(table) or {})
+
+    exported = files = sequence = 0
+    while True:
+        rows = _fetch_chunk(db, table, watermark, settled_before)
+        if not rows:
+            break
+        files += _write_parts(table, rows, run_id, sequence)
+        sequence += 1
+        exported += len(rows)
+
+        last = rows[-1]
+        watermark["id"] = last["id"]
+        if by_updated_at:
+            watermark["updated_at"] = last["updated_at"].isoformat()
+        watermarks[table] = watermark
+        _save_watermarks(watermarks)
+        if len(rows) < CHUNK_SIZE:
+            break
+
+    if exported:
+        logger.info(f"{table} の {exported}件を Parquet に書き出しました")
+    return {"table": table, "rows": exported, "files": files, "watermark": watermark}
+
+
+def _last_movement_edit_id(db: Session) -> int:
+    return db.query(func.max(AuditLog.id)).filter(
+        AuditLog.target_table == "movements",
+        AuditLog.action == MOVEMENT_EDIT_ACTION,
+    ).scalar() or 0
+
+
+def export_movement_edits(db: Session, watermarks: Dict[str, dict], run_id: str) -> dict:
+    """前回以降に編集された入出庫履歴を新しい版として書き出す（監査ログの id をウォーターマークにする）"""
+    watermark = watermarks.setdefault("movements", {})
+    last_audit_id = watermark.get("edit_audit_id", 0)
+    exported_until = watermark.get("id", 0)
+
+    exported = files = sequence = 0
+    while True:
+        edits = db.query(AuditLog.id, AuditLog.target_id).filter(
+            AuditLog.target_table == "movements",
+            AuditLog.action == MOVEMENT_EDIT_ACTION,
+            AuditLog.id > last_audit_id,
+        ).order_by(AuditLog.id).limit(CHUNK_SIZE).all()
+        if not edits:
+            break
+
+        # 未書き出しの行は通常の差分で現在の値が書き出されるため対象外
+        movement_ids = sorted({target_id for _, target_id in edits if target_id and target_id <= exported_until})
+        if movement_ids:
+            table = Movement.__table__
+            rows = [
+                {key: _plain(value) for key, value in row._mapping.items()}
+                for row in db.execute(select(table).where(table.c.id.in_(movement_ids)).order_by(table.c.id))
+            ]
+            if rows:
+                files += _write_parts("movements", rows, f"{run_id}-edit", sequence)
+                sequence += 1
+                exported += len(rows)
+
+        last_audit_id = edits[-1][0]
+        watermark["edit_audit_id"] = last_audit_id
+        _save_watermarks(watermarks)
+        if len(edits) < CHUNK_SIZE:
+            break
+
+    if exported:
+        logger.info(f"編集された movements の {exported}件を Parquet に書き出しました")
+    return {"table": "movements", "rows": exported, "files": files, "watermark": watermark}
+
+
+def export(db: Session, tables: Optional[List[str]] = None, rebuild: bool = False) -> List[dict]:
+    """指定テーブル（省略時は全テーブル）の差分を書き出す。rebuild では既存の出力を削除して全件出し直す"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError("Parquet の書き出しには pyarrow が必要です（pip install pyarrow）") from e
+
+    tables = tables or list(TABLES)
+    unknown = [table for table in tables if table not in TABLES]
+    if unknown:
+        raise ValueError(f"エクスポート対象外のテーブルです: {', '.join(unknown)}")
+
+    watermarks = load_watermarks()
+    if rebuild:
+        for table in tables:
+            shutil.rmtree(_export_dir() / table, ignore_errors=True)
+            watermarks.pop(table, None)
+        _save_watermarks(watermarks)
+
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    results = []
+    for table in tables:
+        if table == "movements" and "edit_audit_id" not in watermarks.get(table, {}):
+            # 初回（全件書き出し）はその時点の値を書き出すため、それまでの編集は追わない
+            watermarks.setdefault(table, {})["edit_audit_id"] = _last_movement_edit_id(db)
+        result = export_table(db, table, watermarks, run_id)
+        if table == "movements":
+            result["rows"] += export_movement_edits(db, watermarks, run_id)["rows"]
+        results.append(result)
+        # 読み取りのみのため、テーブルごとにトランザクションを閉じてスナップショットを解放する
+        db.rollback()
+    return results
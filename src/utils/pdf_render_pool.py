@@ -0,0 +1,163 @@
+"""
+ラベルPDFのレンダリングをイベントループ外（プロセスプール）で実行する
+
+- 同時実行（待ち含む）件数が上限を超えた場合は 503 を返す
+- 1ジョブごとのタイムアウトを超えた場合は 504 を返す
+  （実行中のジョブは止められないため、件数はジョブの終了時に減らす）
+- レンダリング時間を render_stats に記録する
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from fastapi import HTTPException, status
+
+from src.config import settings
+from src.utils.label_render import render_labels_pdf, ensure_japanese_font
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_thread_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+render_stats = {
+    "jobs": 0,
+    "pages": 0,
+    "rejected": 0,
+    "timeouts": 0,
+    "failures": 0,
+    "total_ms": 0.0,
+    "max_ms": 0.0,
+    "last_ms": 0.0,
+}
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    """プロセスプール取得（ワーカー数0の場合はスレッドで実行する）"""
+    global _executor
+    if settings.label_render_workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.label_render_workers,
+                initializer=ensure_japanese_font,
+            )
+        return _executor
+
+
+def _submit(kind: str, entries: List[dict], copies: int) -> Future:
+    global _thread_executor
+    executor: Optional[Executor] = _get_executor()
+    if executor is None:
+        with _executor_lock:
+            if _thread_executor is None:
+                _thread_executor = ThreadPoolExecutor(thread_name_prefix="label-render")
+            executor = _thread_executor
+    return executor.submit(render_labels_pdf, kind, entries, copies)
+
+
+def _release(future: Optional[Future] = None):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def warm_up():
+    """ワーカープロセスを起動しておく（起動直後の初回印刷の待ちを減らす）"""
+    executor = _get_executor()
+    if executor is not None:
+        executor.submit(ensure_japanese_font)
+
+
+def shutdown():
+    global _thread_executor
+    _reset_executor()
+    with _executor_lock:
+        if _thread_executor is not None:
+            _thread_executor.shutdown(wait=False, cancel_futures=True)
+        _thread_executor = None
+
+
+async def render_pdf(kind: str, entries: List[dict], copies: int = 1) -> bytes:
+    """ラベル/現品票PDFを生成（イベントループをブロックしない）"""
+    global _in_flight
+
+    with _in_flight_lock:
+        rejected = _in_flight >= settings.label_render_queue_limit
+        if not rejected:
+            _in_flight += 1
+    if rejected:
+        render_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="ラベル印刷が混み合っています。しばらくしてから再度お試しください"
+        )
+
+    started = time.perf_counter()
+    future = None
+    try:
+        future = _submit(kind, entries, copies)
+        # タイムアウト後もプロセスプールではジョブが動き続けるため、終了（または取消）時に件数を減らす
+        future.add_done_callback(_release)
+        pdf = await asyncio.wait_for(
+            asyncio.wrap_future(future),
+            timeout=settings.label_render_timeout_sec,
+        )
+    except asyncio.TimeoutError:
+        render_stats["timeouts"] += 1
+        logger.warning(f"ラベルPDF生成タイムアウト: kind={kind} 件数={len(entries)} 部数={copies}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="ラベルPDFの生成がタイムアウトしました"
+        )
+    except BrokenProcessPool:
+        render_stats["failures"] += 1
+        logger.error("ラベル印刷ワーカーが異常終了したため再起動します")
+        _reset_executor()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="ラベルPDFの生成に失敗しました"
+        )
+    except Exception:
+        render_stats["failures"] += 1
+        raise
+    finally:
+        if future is None:
+            _release()
+
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+    render_stats["jobs"] += 1
+    render_stats["pages"] += len(entries) * copies
+    render_stats["total_ms"] += elapsed_ms
+    render_stats["last_ms"] = elapsed_ms
+    render_stats["max_ms"] = max(render_stats["max_ms"], elapsed_ms)
+    return pdf
+
+
+def get_render_stats() -> dict:
+    jobs = render_stats["jobs"]
+    return {
+        **render_stats,
+        "total_ms": round(render_stats["total_ms"], 1),
+        "avg_ms": round(render_stats["total_ms"] / jobs, 1) if jobs else 0.0,
+        "in_flight": _in_flight,
+        "workers": settings.label_render_workers,
+        "queue_limit": settings.label_render_queue_limit,
+    }
@@ -0,0 +1,91 @@
+from functools import lru_cache
+from hashlib import sha1
+from io import BytesIO
+from typing import Tuple
+
+import qrcode
+from reportlab.lib.units import mm
+from reportlab.platypus.flowables import Flowable
+
+# QRコードのキャッシュ件数
+QR_CACHE_SIZE = 512
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def qr_module_runs(data: str) -> Tuple[int, Tuple[Tuple[int, int, int], ...]]:
+    """QRコードのセル数と、黒セルを横方向に連結した (行, 開始列, 長さ) の一覧"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+
+    runs = []
+    for row_index, row in enumerate(matrix):
+        col = 0
+        while col < len(row):
+            if not row[col]:
+                col += 1
+                continue
+            start = col
+            while col < len(row) and row[col]:
+                col += 1
+            runs.append((row_index, start, col - start))
+    return len(matrix), tuple(runs)
+
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def render_qr_png(data: str, size_mm: int) -> bytes:
+    """QRコードPNG生成（同一 (データ, サイズ) は再エンコードしない）"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    qr_image = qr.make_image(fill_color="black", back_color="white")
+    qr_buffer = BytesIO()
+    qr_image.save(qr_buffer, format='PNG')
+    return qr_buffer.getvalue()
+
+
+class QrFlowable(Flowable):
+    """ベクター描画のQRコード
+
+    PDF内では1つのフォームXObjectとして出力し、同じデータのQRコードは同一PDF内で再利用する。
+    """
+
+    def __init__(self, data: str, size_mm: int = 20):
+        super().__init__()
+        self.data = data
+        self.width = self.height = size_mm * mm
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        canv = self.canv
+        form_name = "qr_" + sha1(self.data.encode("utf-8")).hexdigest()
+
+        if not canv.hasForm(form_name):
+            modules, runs = qr_module_runs(self.data)
+            canv.beginForm(form_name, lowerx=0, lowery=0, upperx=modules, uppery=modules)
+            path = canv.beginPath()
+            for row, col, length in runs:
+                path.rect(col, modules - row - 1, length, 1)
+            canv.setFillColorRGB(0, 0, 0)
+            canv.drawPath(path, stroke=0, fill=1)
+            canv.endForm()
+
+        modules, _ = qr_module_runs(self.data)
+        scale = self.width / modules
+        canv.saveState()
+        canv.scale(scale, scale)
+        canv.doForm(form_name)
+        canv.restoreState()
@@ -0,0 +1,323 @@
+"""
+発注提案（材料ごとの不足見込みと推奨発注本数）
+
+全材料の今日から指定日数分の在庫推移を「材料 × 日」の配列でまとめて計算する。
+
+  在庫推移 = 現在庫 + 入荷予定の累計 − 使用予定の累計
+
+- 使用予定: 生産中シートの日別使用本数（材質＆材料径 = 材料の表示名・別名）。
+  シートに載っていない材料は出庫実績の消費ペース（material_consumption）を毎日使うものとする
+- 入荷予定: 入庫待ちの発注は納期予定日に入荷するものとし、納期未設定は発注日 + リードタイム、
+  納期を過ぎたものと検品待ちのロットは今日入荷するものとする
+- 安全在庫: 材料単位の発注点（下限重量は現在庫の1本あたり重量で本数に換算）
+- 推奨発注本数: 期間中の在庫の最小値を安全在庫まで戻す本数
+- 発注期限: 在庫が安全在庫を下回る日 − 直近の仕入先のリードタイム（supplier_lead_times）
+
+入力は種類ごとに1回ずつまとめて読み込み、材料ごとのクエリは行わない。
+結果はキャッシュし、在庫変更イベント・発注点の変更・発注の取込で破棄する（REORDER_CACHE_TTL_SEC 秒で再計算）。
+"""
+
+import logging
+import math
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.db.models import (
+    InspectionStatus, Item, Lot, Material, MaterialAlias, MaterialConsumption, MaterialStock,
+    PurchaseOrder, PurchaseOrderItem, PurchaseOrderItemStatus, PurchaseOrderStatus, OrderType, ReorderPoint,
+)
+from src.utils import consumption, lead_time, stock_events
+
+logger = logging.getLogger(__name__)
+
+_cache: Dict[tuple, Tuple[float, dict]] = {}
+_plan_cache: dict = {}
+cache_stats = {"hits": 0, "builds": 0}
+
+
+def invalidate():
+    _cache.clear()
+
+
+def _schedule_mtime() -> Optional[float]:
+    try:
+        return Path(settings.production_schedule_path).stat().st_mtime
+    except OSError:
+        return None
+
+
+def _schedule_rows(mtime: Optional[float]) -> List[Tuple[str, Optional[str], int]]:
+    """生産中シートの (材料仕様, 使用日, 本数)。ファイルが更新されるまで読み込み結果を使い回す"""
+    if mtime is None:
+        return []
+    if _plan_cache.get("mtime") != mtime:
+        from src.api.material_management import _load_material_plan
+
+        try:
+            summaries = _load_material_plan()
+        except (FileNotFoundError, RuntimeError) as e:
+            logger.warning(f"生産スケジュールExcelの読み込みに失敗しました: {e}")
+            return []
+        _plan_cache["rows"] = [(s.material_spec, s.usage_date, s.total_bars) for s in summaries]
+        _plan_cache["mtime"] = mtime
+    return _plan_cache["rows"]
+
+
+def _name_index(db: Session) -> Dict[str, int]:
+    """材料の表示名・別名 → 材料ID（同名の材料は ID の小さい方）"""
+    index: Dict[str, int] = {}
+    for material_id, alias_name in db.query(MaterialAlias.material_id, MaterialAlias.alias_name).all():
+        index.setdefault(alias_name, material_id)
+    names: Dict[str, int] = {}
+    for material_id, display_name in db.query(Material.id, Material.display_name).filter(
+        Material.is_active == True
+    ).order_by(Material.id.desc()).all():
+        names[display_name] = material_id
+    index.update(names)
+    return index
+
+
+def _latest_suppliers(db: Session) -> Dict[int, str]:
+    """材料ごとの直近の入荷ロットの仕入先"""
+    latest = db.query(
+        Lot.material_id, func.max(Lot.id).label("lot_id")
+    ).filter(Lot.supplier.isnot(None)).group_by(Lot.material_id).subquery()
+    return dict(db.query(latest.c.material_id, Lot.supplier).join(Lot, Lot.id == latest.c.lot_id).all())
+
+
+def _lead_days(leads: Dict[Tuple[str, Optional[int]], float], supplier: Optional[str], material_id: int) -> float:
+    for key in ((supplier, material_id), (supplier, None)):
+        if key in leads:
+            return leads[key]
+    return float(settings.reorder_default_lead_days)
+
+
+def _days_from(value, today: date) -> int:
+    if isinstance(value, datetime):
+        value = value.date()
+    elif isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return (value - today).days
+
+
+def _day_index(value, today: date) -> int:
+    """今日からの日数（過去・未設定は今日）"""
+    if value is None:
+        return 0
+    return max(_days_from(value, today), 0)
+
+
+def build(
+    db: Session,
+    horizon_days: int,
+    lead_time_stat: str = "p90_days",
+    use_consumption_pace: bool = True,
+    only_shortfall: bool = True,
+    today: Optional[date] = None,
+    schedule_mtime: Optional[float] = None,
+) -> dict:
+    """発注提案を計算する（キャッシュなし）"""
+    import numpy as np
+
+    today = today or date.today()
+    horizon = max(int(horizon_days), 1)
+
+    materials = db.query(
+        Material.id,
+        Material.display_name,
+        Material.diameter_mm,
+        func.coalesce(MaterialStock.total_quantity, 0),
+        func.coalesce(MaterialStock.total_weight_kg, 0.0),
+    ).outerjoin(
+        MaterialStock, MaterialStock.material_id == Material.id
+    ).filter(Material.is_active == True).order_by(Material.id).all()
+
+    count = len(materials)
+    ids = [row[0] for row in materials]
+    position = {material_id: i for i, material_id in enumerate(ids)}
+    stock = np.array([row[3] for row in materials], dtype=float)
+    stock_weight = np.array([row[4] for row in materials], dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kg_per_bar = np.where(stock > 0, stock_weight / np.maximum(stock, 1), np.nan)
+
+    names = _name_index(db)
+    leads = lead_time.lookup(db, lead_time_stat)
+    suppliers = _latest_suppliers(db)
+
+    # 使用予定（材料 × 日）
+    demand = np.zeros((count, horizon))
+    scheduled = np.zeros(count, dtype=bool)
+    rows, days, bars = [], [], []
+    for spec, usage_date, total_bars in _schedule_rows(schedule_mtime):
+        i = position.get(names.get(spec))
+        if i is None:
+            continue
+        scheduled[i] = True
+        day = _day_index(usage_date, today)
+        if day < horizon:
+            rows.append(i)
+            days.append(day)
+            bars.append(total_bars)
+    np.add.at(demand, (np.array(rows, dtype=np.int64), np.array(days, dtype=np.int64)), np.array(bars, dtype=float))
+
+    pace = np.zeros(count)
+    if use_consumption_pace:
+        consumption.update(db, today)
+        for material_id, daily_out in db.query(MaterialConsumption.material_id, MaterialConsumption.ewma_daily_out).all():
+            i = position.get(material_id)
+            if i is not None and not scheduled[i]:
+                pace[i] = daily_out or 0.0
+        demand += pace[:, None]
+
+    # 入荷予定（材料 × 日）と未入庫の発注残（期間外を含む）
+    arrivals = np.zeros((count, horizon))
+    open_po = np.zeros(count)
+    rows, days, bars = [], [], []
+    open_items = db.query(
+        PurchaseOrderItem.item_name,
+        PurchaseOrderItem.order_type,
+        PurchaseOrderItem.ordered_quantity,
+        PurchaseOrderItem.received_quantity,
+        PurchaseOrderItem.ordered_weight_kg,
+        PurchaseOrderItem.received_weight_kg,
+        PurchaseOrder.supplier,
+        PurchaseOrder.order_date,
+        PurchaseOrder.expected_delivery_date,
+    ).join(
+        PurchaseOrder, PurchaseOrderItem.purchase_order_id == PurchaseOrder.id
+    ).filter(
+        PurchaseOrderItem.status == PurchaseOrderItemStatus.PENDING,
+        PurchaseOrder.status != PurchaseOrderStatus.CANCELLED,
+    ).all()
+    for name, order_type, ordered_qty, received_qty, ordered_kg, received_kg, supplier, order_date, expected in open_items:
+        i = position.get(names.get(name))
+        if i is None:
+            continue
+        if order_type == OrderType.WEIGHT:
+            # 重量指定の発注は現在庫の1本あたり重量で本数に換算（在庫がない材料は換算できないため数えない）
+            remaining_kg = max((ordered_kg or 0) - (received_kg or 0), 0)
+            remaining = math.floor(remaining_kg / kg_per_bar[i]) if kg_per_bar[i] > 0 else 0
+        else:
+            remaining = max((ordered_qty or 0) - (received_qty or 0), 0)
+        if remaining <= 0:
+            continue
+        open_po[i] += remaining
+        if expected is not None:
+            day = _day_index(expected, today)
+        else:
+            day = max(_days_from(order_date, today) + math.ceil(_lead_days(leads, supplier, ids[i])), 0)
+        if day < horizon:
+            rows.append(i)
+            days.append(day)
+            bars.append(remaining)
+
+    # 入庫済み・検品待ちのロット（検品完了まで在庫に含まれない）
+    awaiting = db.query(Lot.material_id, func.sum(Lot.initial_quantity)).filter(
+        Lot.purchase_order_item_id.isnot(None),
+        Lot.inspection_status == InspectionStatus.PENDING,
+        ~db.query(Item.id).filter(Item.lot_id == Lot.id).exists(),
+    ).group_by(Lot.material_id).all()
+    inspection = np.zeros(count)
+    for material_id, quantity in awaiting:
+        i = position.get(material_id)
+        if i is not None and quantity:
+            inspection[i] += quantity
+            rows.append(i)
+            days.append(0)
+            bars.append(quantity)
+    np.add.at(arrivals, (np.array(rows, dtype=np.int64), np.array(days, dtype=np.int64)), np.array(bars, dtype=float))
+
+    # 安全在庫（材料単位の発注点）
+    safety = np.zeros(count)
+    for material_id, min_quantity, min_weight_kg in db.query(
+        ReorderPoint.material_id, ReorderPoint.min_quantity, ReorderPoint.min_weight_kg
+    ).filter(ReorderPoint.is_active == True, ReorderPoint.material_id.isnot(None)).all():
+        i = position.get(material_id)
+        if i is None:
+            continue
+        by_weight = math.ceil(min_weight_kg / kg_per_bar[i]) if min_weight_kg and kg_per_bar[i] > 0 else 0
+        safety[i] = max(min_quantity or 0, by_weight)
+
+    # 在庫推移と不足の判定（全材料を一括計算）
+    balance = stock[:, None] + np.cumsum(arrivals, axis=1) - np.cumsum(demand, axis=1)
+    below = balance < safety[:, None] - 1e-9
+    short = below.any(axis=1)
+    first_short = below.argmax(axis=1)
+    projected_min = balance.min(axis=1)
+    shortfall = np.maximum(safety - projected_min, 0.0)
+    suggested = np.ceil(shortfall - 1e-9).astype(np.int64)
+    lead_days = np.array([_lead_days(leads, suppliers.get(material_id), material_id) for material_id in ids])
+    order_by = first_short - np.ceil(lead_days).astype(np.int64)
+
+    suggestions = []
+    for i in (np.flatnonzero(short) if only_shortfall else range(count)):
+        material_id, material_name, diameter_mm = materials[i][:3]
+        shortage_date = today + timedelta(days=int(first_short[i])) if short[i] else None
+        order_by_date = today + timedelta(days=int(order_by[i])) if short[i] else None
+        suggestions.append({
+            "material_id": material_id,
+            "material_name": material_name,
+            "diameter_mm": diameter_mm,
+            "current_stock_bars": int(stock[i]),
+            "awaiting_inspection_bars": int(inspection[i]),
+            "open_po_bars": int(open_po[i]),
+            "incoming_bars": int(round(arrivals[i].sum())),
+            "demand_bars": round(float(demand[i].sum()), 1),
+            "demand_source": "schedule" if scheduled[i] else ("consumption" if pace[i] > 0 else None),
+            "safety_stock_bars": int(safety[i]),
+            "projected_min_bars": round(float(projected_min[i]), 1),
+            "first_shortage_date": shortage_date.isoformat() if shortage_date else None,
+            "shortfall_bars": round(float(shortfall[i]), 1),
+            "suggested_order_bars": int(suggested[i]),
+            "supplier": suppliers.get(material_id),
+            "lead_time_days": round(float(lead_days[i]), 1),
+            "order_by_date": order_by_date.isoformat() if order_by_date else None,
+            "urgent": bool(short[i] and order_by[i] <= 0),
+        })
+    suggestions.sort(key=lambda s: (s["order_by_date"] is None, s["order_by_date"] or "", -s["shortfall_bars"]))
+
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "horizon_days": horizon,
+        "lead_time_stat": lead_time_stat,
+        "schedule_loaded": schedule_mtime is not None and bool(_plan_cache.get("rows")),
+        "materials_evaluated": count,
+        "suggestions": suggestions,
+    }
+
+
+def get_report(
+    db: Session,
+    horizon_days: Optional[int] = None,
+    lead_time_stat: str = "p90_days",
+    use_consumption_pace: bool = True,
+    only_shortfall: bool = True,
+) -> dict:
+    """発注提案（キャッシュあり）"""
+    horizon_days = horizon_days or settings.reorder_horizon_days
+    schedule_mtime = _schedule_mtime()
+    key = (horizon_days, lead_time_stat, use_consumption_pace, only_shortfall, date.today(), schedule_mtime)
+
+    entry = _cache.get(key)
+    if entry is not None and time.monotonic() - entry[0] < settings.reorder_cache_ttl_sec:
+        cache_stats["hits"] += 1
+        return entry[1]
+
+    report = build(
+        db, horizon_days, lead_time_stat, use_consumption_pace, only_shortfall,
+        schedule_mtime=schedule_mtime,
+    )
+    _cache[key] = (time.monotonic(), report)
+    cache_stats["builds"] += 1
+    return report
+
+
+@stock_events.subscribe
+def _on_stock_changed(event: dict):
+    invalidate()
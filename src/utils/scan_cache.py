@@ -0,0 +1,91 @@
+"""
+QRスキャン（ロット番号検索）結果のメモリキャッシュ
+
+スキャンのたびにロット・材料・置き場を結合して重量を計算し直さないよう、
+シリアライズ済みのレスポンス（JSONバイト列）をロット番号ごとに LRU で保持する。
+入出庫・置き場変更・検品・入庫修正などの在庫変更イベントで該当ロットを破棄する。
+イベントは同一プロセス内のみのため、他のワーカー（プロセス）での更新に備えて
+SCAN_CACHE_TTL_SEC 秒を過ぎたエントリは使わずに読み直す。
+
+DB読み取り中に破棄が起きた場合に古い結果を保存しないよう、世代番号で確認してから保存する。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from src.config import settings
+from src.utils import stock_events
+
+_entries: "OrderedDict[str, Tuple[int, bytes, float]]" = OrderedDict()
+_item_lots: Dict[int, str] = {}
+_lock = threading.Lock()
+_generation = 0
+
+cache_stats = {"hits": 0, "misses": 0, "expired": 0, "invalidated": 0}
+
+
+def resolve(lot_number: str, loader: Callable[[], Optional[Tuple[int, bytes]]]) -> Optional[bytes]:
+    """キャッシュがあれば返し、なければ loader（(アイテムID, JSON) または None を返す）で取得して保存"""
+    if settings.scan_cache_size <= 0:
+        loaded = loader()
+        return loaded[1] if loaded else None
+
+    with _lock:
+        entry = _entries.get(lot_number)
+        if entry is not None and time.monotonic() - entry[2] >= settings.scan_cache_ttl_sec:
+            _entries.pop(lot_number)
+            _item_lots.pop(entry[0], None)
+            cache_stats["expired"] += 1
+            entry = None
+        if entry is not None:
+            _entries.move_to_end(lot_number)
+            cache_stats["hits"] += 1
+            return entry[1]
+        cache_stats["misses"] += 1
+        generation = _generation
+
+    loaded = loader()
+    if loaded is None:
+        return None
+
+    item_id, body = loaded
+    with _lock:
+        if generation == _generation:
+            _entries[lot_number] = (item_id, body, time.monotonic())
+            _item_lots[item_id] = lot_number
+            while len(_entries) > settings.scan_cache_size:
+                _, (evicted_item_id, _, _) = _entries.popitem(last=False)
+                _item_lots.pop(evicted_item_id, None)
+    return body
+
+
+def invalidate(lot_number: Optional[str] = None, item_id: Optional[int] = None) -> None:
+    """ロット番号・アイテムIDに該当するキャッシュを破棄（どちらも未指定なら全件）"""
+    global _generation
+    with _lock:
+        _generation += 1
+        if lot_number is None and item_id is None:
+            cache_stats["invalidated"] += len(_entries)
+            _entries.clear()
+            _item_lots.clear()
+            return
+
+        # ロット番号が変更された場合に備え、アイテムIDから旧ロット番号のキャッシュも破棄
+        keys = {lot_number, _item_lots.pop(item_id, None) if item_id is not None else None}
+        for key in keys - {None}:
+            entry = _entries.pop(key, None)
+            if entry is not None:
+                _item_lots.pop(entry[0], None)
+                cache_stats["invalidated"] += 1
+
+
+@stock_events.subscribe
+def _on_stock_changed(event: dict):
+    lot_number = event.get("lot_number")
+    item_id = event.get("item_id")
+    if lot_number is None and item_id is None:
+        invalidate()
+    else:
+        invalidate(lot_number, item_id)
@@ -0,0 +1,55 @@
+"""
+在庫数の更新（同時更新対策）
+
+在庫数は Python 側で読み取って書き戻さず、条件付きの UPDATE 1文で加減算する。
+
+  UPDATE items SET current_quantity = current_quantity + :delta
+   WHERE id = :id AND current_quantity >= :required
+
+複数端末・複数ワーカーから同じアイテムを同時に出庫しても、在庫がマイナスになったり
+更新が失われたりしない。更新した行はコミットまでロックされるため、直後に読み直した値が確定値になる。
+材料別の在庫集計（material_stock）にも同じトランザクションで差分を反映する。
+"""
+
+from typing import Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from src.db.models import Item
+from src.utils import material_stock
+
+
+class InsufficientStockError(Exception):
+    """減算すると在庫がマイナスになる"""
+
+    def __init__(self, current_quantity: int, requested: int):
+        self.current_quantity = current_quantity
+        self.requested = requested
+        super().__init__(f"在庫が不足しています。現在庫: {current_quantity}本, 要求: {requested}本")
+
+
+def adjust_item_quantity(db: Session, item: Item, delta: int) -> Tuple[int, int]:
+    """アイテムの在庫数を delta だけ増減し、(変更前, 変更後) を返す
+
+    減算で在庫がマイナスになる場合はトランザクションをロールバックして InsufficientStockError を送出する。
+    item オブジェクトの current_quantity も確定値に更新される。
+    """
+    stmt = update(Item).where(Item.id == item.id)
+    if delta < 0:
+        stmt = stmt.where(Item.current_quantity >= -delta)
+    stmt = stmt.values(current_quantity=Item.current_quantity + delta).execution_options(
+        synchronize_session=False
+    )
+
+    result = db.execute(stmt)
+    if result.rowcount == 0:
+        current = db.query(Item.current_quantity).filter(Item.id == item.id).scalar()
+        # 条件に合わなかった UPDATE もロックを保持するため、待たせないようすぐに解放する
+        db.rollback()
+        raise InsufficientStockError(current or 0, -delta)
+
+    db.refresh(item, attribute_names=["current_quantity"])
+    old_quantity = item.current_quantity - delta
+    material_stock.apply_quantity_change(db, item, old_quantity, item.current_quantity)
+    return old_quantity, item.current_quantity
@@ -0,0 +1,47 @@
+"""
+在庫変更イベント（同一プロセス内の通知）
+
+入出庫・置き場変更などのコミット後に publish し、キャッシュ破棄などの後処理を subscribe 側で行う。
+"""
+
+import logging
+from datetime import datetime
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+_listeners: List[Callable[[dict], None]] = []
+
+
+def subscribe(listener: Callable[[dict], None]) -> Callable[[dict], None]:
+    """イベント受信関数を登録（デコレータとしても使用可）"""
+    if listener not in _listeners:
+        _listeners.append(listener)
+    return listener
+
+
+def publish(event_type: str, **payload) -> dict:
+    """イベント通知（受信側の例外は記録のみで呼び出し元には伝えない）"""
+    event = {"type": event_type, "at": datetime.now().isoformat(), **payload}
+    for listener in list(_listeners):
+        try:
+            listener(event)
+        except Exception as e:
+            logger.warning(f"在庫変更イベントの処理に失敗しました: {event_type} {e}")
+    return event
+
+
+def publish_item_change(event_type: str, item, **extra) -> dict:
+    """アイテム単位の在庫変更イベント"""
+    lot = item.lot
+    return publish(
+        event_type,
+        item_id=item.id,
+        lot_id=lot.id if lot else None,
+        lot_number=lot.lot_number if lot else None,
+        material_id=lot.material_id if lot else None,
+        location_id=item.location_id,
+        location_name=item.location.name if item.location else None,
+        current_quantity=item.current_quantity,
+        **extra,
+    )
@@ -0,0 +1,55 @@
+"""
+重量計算（1本あたり）
+
+初期入力重量（initial_weight_kg / initial_quantity）があればそれを優先し、
+なければ断面形状・寸法・長さ・比重から算出する。
+SQL集計用に同じ計算式の SQLAlchemy 式も提供する。
+"""
+
+from sqlalchemy import and_, case
+
+from src.db.models import Lot, Material, MaterialShape
+
+HEXAGON_AREA_FACTOR = 3 * (3 ** 0.5) / 2
+
+
+def volume_per_piece_cm3(shape: MaterialShape, diameter_mm: float, length_mm: float) -> float:
+    """1本あたりの体積（cm³）"""
+    length_cm = length_mm / 10
+    if shape == MaterialShape.ROUND:
+        radius_cm = (diameter_mm / 2) / 10
+        return 3.14159 * (radius_cm ** 2) * length_cm
+    if shape == MaterialShape.HEXAGON:
+        side_cm = (diameter_mm / 2) / 10
+        return HEXAGON_AREA_FACTOR * (side_cm ** 2) * length_cm
+    if shape == MaterialShape.SQUARE:
+        side_cm = diameter_mm / 10
+        return (side_cm ** 2) * length_cm
+    return 0
+
+
+def weight_per_piece_kg(lot: Lot, material: Material = None) -> float:
+    """ロットの1本あたり重量（kg）"""
+    if lot.initial_weight_kg and lot.initial_quantity and lot.initial_quantity > 0:
+        return lot.initial_weight_kg / lot.initial_quantity
+    material = material or lot.material
+    volume_cm3 = volume_per_piece_cm3(material.shape, material.diameter_mm, lot.length_mm)
+    return (volume_cm3 * material.current_density) / 1000
+
+
+def weight_per_piece_kg_expr():
+    """weight_per_piece_kg と同じ計算のSQL式（Lot・Material を結合したクエリで使用）"""
+    length_cm = Lot.length_mm / 10.0
+    half_cm = Material.diameter_mm / 20.0
+    side_cm = Material.diameter_mm / 10.0
+
+    volume_cm3 = case(
+        (Material.shape == MaterialShape.ROUND, 3.14159 * half_cm * half_cm * length_cm),
+        (Material.shape == MaterialShape.HEXAGON, HEXAGON_AREA_FACTOR * half_cm * half_cm * length_cm),
+        (Material.shape == MaterialShape.SQUARE, side_cm * side_cm * length_cm),
+        else_=0.0,
+    )
+    return case(
+        (and_(Lot.initial_weight_kg > 0, Lot.initial_quantity > 0), Lot.initial_weight_kg / Lot.initial_quantity),
+        else_=volume_cm3 * Material.current_density / 1000.0,
+    )